@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+
+from django.conf import settings
+
+# Cache hits whose last-used time is written in one statement rather than one each.
+TOUCH_BATCH_SIZE = 256
+
+
+class ParseCache:
+    """Persistent cache of extracted component records keyed by file content.
+
+    Records are stored as compressed JSON in a SQLite database. Once the stored
+    records exceed ``max_bytes`` the least recently used entries are evicted.
+    The last-used times of hits are written in batches, before each eviction
+    and when the cache is closed, so that a lookup is a single read.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # key -> time of the hits not written yet.
+        self.touched = {}
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            'key TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)')
+        self.total_bytes = self._stored_bytes()
+
+    @staticmethod
+    def make_key(data, language, version):
+        digest = hashlib.sha256(data).hexdigest()
+        return f'{language}:{version}:{digest}'
+
+    def get(self, key):
+        row = self.conn.execute('SELECT data FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.touched[key] = time.time()
+        if len(self.touched) >= TOUCH_BATCH_SIZE:
+            self._write_touched()
+        return json.loads(zlib.decompress(row[0]))
+
+    def set(self, key, records):
+        data = zlib.compress(json.dumps(records, separators=(',', ':')).encode('utf-8'))
+        with self.conn:
+            self.conn.execute('BEGIN')
+            row = self.conn.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+            self.conn.execute(
+                'INSERT OR REPLACE INTO entries (key, data, size, last_used) VALUES (?, ?, ?, ?)',
+                (key, data, len(data), time.time())
+            )
+        # Replacing an entry only adds the difference in size.
+        self.total_bytes += len(data) - (row[0] if row else 0)
+        self.touched.pop(key, None)
+        if self.total_bytes > self.max_bytes:
+            self._evict()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'bytes': self.total_bytes,
+        }
+
+    def close(self):
+        self._write_touched()
+        self.conn.close()
+
+    def _write_touched(self):
+        if self.touched:
+            self.conn.executemany('UPDATE entries SET last_used = ? WHERE key = ?',
+                                  [(used, key) for key, used in self.touched.items()])
+            self.touched = {}
+
+    def _stored_bytes(self):
+        return self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    def _evict(self):
+        self._write_touched()
+        # Other processes may share the database, so recount before evicting.
+        self.total_bytes = self._stored_bytes()
+        if self.total_bytes <= self.max_bytes:
+            return
+        # Evict down to 90% of the limit so that eviction isn't repeated on every write.
+        target = self.max_bytes * 0.9
+        freed = 0
+        keys = []
+        rows = self.conn.execute('SELECT key, size FROM entries ORDER BY last_used').fetchall()
+        for key, size in rows:
+            if self.total_bytes - freed <= target:
+                break
+            keys.append((key,))
+            freed += size
+        self.conn.executemany('DELETE FROM entries WHERE key = ?', keys)
+        self.total_bytes -= freed
+
+
+def get_parse_cache():
+    path = getattr(settings, 'ANALYSIS_CACHE_PATH', None)
+    if not path:
+        return None
+    return ParseCache(path, max_bytes=getattr(settings, 'ANALYSIS_CACHE_MAX_BYTES', 256 * 1024 * 1024))
@@ -1,14 +1,151 @@
 import ast
+import importlib
+import os
+import threading
+import time
 
-import javalang
-from kopyt import Parser
+from django.conf import settings
 
-from ..models import Component
+from . import fallback
+from .records import ComponentRecord
+from .references import References, module_parts
+
+# Bump whenever the extracted component records change so that cached
+# results from older analyzers are no longer used.
+ANALYZER_VERSION = 4
+
+# Analyzers by file extension: the language and the module extracting the
+# components of a source with its ``analyze(source, file, deadline)``. Modules
+# are imported on first use, so a process only loads the parsers (javalang,
+# kopyt) of the languages it actually analyzes. Python uses the ast module.
+ANALYZERS = {
+    '.py': ('python', None),
+    '.java': ('java', '.java_analyzer'),
+    '.kt': ('kotlin', '.kotlin_analyzer'),
+}
+
+LANGUAGES = {extension: language for extension, (language, _) in ANALYZERS.items()}
+
+_MODULES = {language: module for language, module in ANALYZERS.values() if module}
+
+# Compound statements whose bodies may contain class or function definitions.
+PYTHON_BLOCKS = (
+    ast.If, ast.For, ast.AsyncFor, ast.While, ast.Try, ast.TryStar, ast.With, ast.AsyncWith,
+    ast.Match, ast.match_case, ast.ExceptHandler,
+)
+
+_PYTHON_DEFINITIONS = {ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef}
+
+RECORD_FIELDS = ('type', 'name', 'full_name', 'lineno', 'docstring', 'parameters', 'references')
+
+# Cache keys being parsed by a thread of this process. Another thread about to
+# parse the same content, e.g. a file vendored by several codebases of a
+# batch, waits for the records to be cached instead of parsing it again.
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+def _python_chain(node):
+    """Return the names of a dotted expression such as ``a.b.c``, the first being None when it isn't a name."""
+    names = []
+    while isinstance(node, ast.Attribute):
+        names.append(node.attr)
+        node = node.value
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'super':
+        names.append('super')
+    else:
+        names.append(node.id if isinstance(node, ast.Name) else None)
+    return names[::-1]
+
+
+def _python_imports(node, package, imports):
+    """Add the names bound by the import statements of ``node``'s body to ``imports``, qualified."""
+    for child in ast.iter_child_nodes(node):
+        if isinstance(child, ast.Import):
+            for alias in child.names:
+                if alias.asname:
+                    imports[alias.asname] = alias.name
+                else:
+                    root = alias.name.split('.')[0]
+                    imports[root] = root
+        elif isinstance(child, ast.ImportFrom):
+            parts = package[:len(package) - child.level + 1] if child.level else []
+            if child.module:
+                parts = parts + [child.module]
+            for alias in child.names:
+                if alias.name != '*':
+                    imports[alias.asname or alias.name] = '.'.join(parts + [alias.name])
+        elif isinstance(child, PYTHON_BLOCKS):
+            _python_imports(child, package, imports)
+
+
+def _python_references(definition, imports, package):
+    """Collect the references of a class or function, leaving out those of the definitions nested in it."""
+    references = References(imports)
+    if isinstance(definition, ast.ClassDef):
+        for base in definition.bases:
+            references.base(_python_chain(base))
+    local_imports = None
+    stack = definition.body[::-1]
+    while stack:
+        node = stack.pop()
+        # Checked by class rather than isinstance, this being the hot loop of Python analysis.
+        kind = node.__class__
+        if kind is ast.Call:
+            references.call(_python_chain(node.func))
+        elif kind is ast.Name:
+            references.name(node.id)
+        elif kind in _PYTHON_DEFINITIONS:
+            continue
+        elif kind is ast.Import or kind is ast.ImportFrom:
+            if local_imports is None:
+                local_imports = references.imports = dict(imports)
+            _python_imports(ast.Module(body=[node], type_ignores=[]), package, local_imports)
+        # Much faster than ast.iter_child_nodes. Values that aren't nodes have no fields.
+        fields = getattr(kind, '_fields', None)
+        if fields:
+            for field in reversed(fields):
+                value = getattr(node, field, None)
+                if value.__class__ is list:
+                    stack.extend(reversed(value))
+                elif value is not None:
+                    stack.append(value)
+    return references.to_dict()
+
+
+class ParseBudgetExceeded(Exception):
+    pass
+
+
+class Deadline:
+    def __init__(self, seconds):
+        self.expires = time.monotonic() + seconds if seconds else None
+
+    def check(self):
+        if self.expires is not None and time.monotonic() > self.expires:
+            raise ParseBudgetExceeded()
+
+
+def load_analyzer(language):
+    """Import and return the analyzer module of ``language``."""
+    return importlib.import_module(_MODULES[language], __package__)
 
 
 class CodeAnalyzer:
-    def __init__(self, temp_dir=None):
+    def __init__(self, temp_dir=None, cache=None, parse_timeout=None, max_parse_bytes=None):
         self.temp_dir = temp_dir
+        self.cache = cache
+        if parse_timeout is None:
+            parse_timeout = getattr(settings, 'ANALYSIS_PARSE_TIMEOUT', 5.0)
+        if max_parse_bytes is None:
+            max_parse_bytes = getattr(settings, 'ANALYSIS_PARSE_MAX_BYTES', 512 * 1024)
+        self.parse_timeout = parse_timeout
+        self.max_parse_bytes = max_parse_bytes
+        # Why the last Java or Kotlin file went through the fallback extractor
+        # ('size', 'timeout' or 'error'), or None when it was fully parsed.
+        self.last_fallback = None
+        # Whether the last file was found in the cache ('hit' or 'miss'), or None without a cache.
+        self.last_cache = None
 
     def trim_path(self, path):
         if self.temp_dir and path.startswith(self.temp_dir):
@@ -16,148 +153,112 @@ class CodeAnalyzer:
         return path
 
     def analyze(self, file_path):
-        if file_path.endswith('.py'):
-            return self._analyze_python(file_path)
-        elif file_path.endswith('.java'):
-            return self._analyze_java(file_path)
-        elif file_path.endswith('.kt'):
-            return self._analyze_kotlin(file_path)
-        return []
-
-    def _analyze_python(self, file_path):
-        with open(file_path, 'r', encoding='utf-8') as f:
-            source = f.read()
-        tree = ast.parse(source, filename=file_path)
-        components = []
-        parent_map = {}
-        for parent in ast.walk(tree):
-            for child in ast.iter_child_nodes(parent):
-                parent_map[child] = parent
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef):
-                doc = ast.get_docstring(node)
-                full_name = node.name
-                components.append(Component(
-                    type='class',
-                    name=node.name,
-                    docstring=doc,
-                    file=self.trim_path(file_path),
-                    lineno=node.lineno,
-                    full_name=full_name
-                ))
-            elif isinstance(node, ast.FunctionDef):
-                doc = ast.get_docstring(node)
-                parent_class = None
-                parent = parent_map.get(node)
-                while parent:
-                    if isinstance(parent, ast.ClassDef):
-                        parent_class = parent.name
-                        break
-                    parent = parent_map.get(parent)
-                if parent_class:
-                    full_name = f"{parent_class}.{node.name}"
-                else:
-                    full_name = node.name
-                # Get parameter names
-                params = [arg.arg for arg in node.args.args]
-                components.append(Component(
-                    type='function',
-                    name=node.name,
-                    docstring=doc,
-                    file=self.trim_path(file_path),
-                    lineno=node.lineno,
-                    full_name=full_name,
-                    parameters=params
-                ))
-        return components
+        if os.path.splitext(file_path)[1] not in LANGUAGES:
+            return []
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        return self.analyze_source(file_path, data)
 
-    def _analyze_java(self, file_path):
-        with open(file_path, 'r', encoding='utf-8') as f:
-            source = f.read()
-        components = []
+    def analyze_source(self, file_path, data):
+        language = LANGUAGES.get(os.path.splitext(file_path)[1])
+        self.last_fallback = None
+        self.last_cache = None
+        if language is None:
+            return []
+        if self.cache is None:
+            return self._analyze_source(language, file_path, data)
+        key = self.cache.make_key(data, language, ANALYZER_VERSION)
+        records = self.cache.get(key)
+        if records is None:
+            with _in_flight_lock:
+                parsing = _in_flight.get(key)
+                if parsing is None:
+                    _in_flight[key] = threading.Event()
+            if parsing is not None:
+                parsing.wait()
+                records = self.cache.get(key)
+        self.last_cache = 'miss' if records is None else 'hit'
+        if records is not None:
+            file = self.trim_path(file_path)
+            return [ComponentRecord(file=file, **record) for record in records]
         try:
-            tree = javalang.parse.parse(source)
-            for path, node in tree:
-                if isinstance(node, javalang.tree.ClassDeclaration):
-                    components.append(Component(
-                        type='class',
-                        name=node.name,
-                        docstring=None,
-                        file=self.trim_path(file_path),
-                        lineno=node.position.line if node.position else 1,
-                        full_name=node.name
-                    ))
-                elif isinstance(node, javalang.tree.MethodDeclaration):
-                    parent_class = None
-                    for ancestor in path:
-                        if isinstance(ancestor, javalang.tree.ClassDeclaration):
-                            parent_class = ancestor.name
-                            break
-                    if parent_class:
-                        full_name = f"{parent_class}.{node.name}"
-                    else:
-                        full_name = node.name
-
-                    parameters = []
-                    for param in node.parameters:
-                        param_type = str(param.type.name)
-                        if param.type.dimensions:
-                            param_type += '[]' * len(param.type.dimensions)
-                        parameters.append(f"{param_type} {param.name}")
-                    components.append(Component(
-                        type='function',
-                        name=node.name,
-                        docstring=None,
-                        file=self.trim_path(file_path),
-                        lineno=node.position.line if node.position else 1,
-                        full_name=full_name,
-                        parameters=parameters
-                    ))
-        except Exception:
-            pass
-        return components
+            components = self._analyze_source(language, file_path, data)
+            if self.last_fallback is not None:
+                # Don't cache approximate results: the file may be parsed fully with a larger budget.
+                return components
+            self.cache.set(key, [{field: getattr(c, field) for field in RECORD_FIELDS} for c in components])
+            return components
+        finally:
+            if parsing is None:
+                with _in_flight_lock:
+                    _in_flight.pop(key).set()
 
-    def _analyze_kotlin(self, file_path):
-        with open(file_path, 'r', encoding='utf-8') as f:
-            source = f.read()
-        components = []
+    def _analyze_source(self, language, file_path, data):
+        # Same newline handling as reading the file in text mode.
+        source = data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+        if language == 'python':
+            return self._analyze_python(file_path, source)
+        if self.max_parse_bytes and len(data) > self.max_parse_bytes:
+            return self._analyze_fallback(language, file_path, source, 'size')
+        deadline = Deadline(self.parse_timeout)
         try:
-            parser = Parser(source)
-            kt_tree = parser.parse()
-            for decl in kt_tree.declarations:
-                if decl.__class__.__name__ == 'ClassDeclaration':
-                    name = decl.name
-                    lineno = decl.position.line if hasattr(decl, 'position') and decl.position else 1
-                    components.append(Component(
-                        type='class',
-                        name=name,
-                        docstring=None,
-                        file=self.trim_path(file_path),
-                        lineno=lineno,
-                        full_name=name
-                    ))
-                    if hasattr(decl, 'body') and hasattr(decl.body, 'members'):
-                        for member in decl.body.members:
-                            if member.__class__.__name__ == 'FunctionDeclaration':
-                                func_name = member.name
-                                func_lineno = member.position.line if hasattr(member, 'position') and member.position else 1
-                                parameters = []
-                                if hasattr(member, 'parameters'):
-                                    for param in member.parameters:
-                                        param_name = getattr(param, 'name', None)
-                                        param_type = getattr(param, 'type', None)
-                                        if hasattr(param_type, 'name'):
-                                            param_type = param_type.name
-                                        parameters.append(f"{param_name}: {param_type}")
-                                components.append(Component(
-                                    type='function',
-                                    name=func_name,
-                                    docstring=None,
-                                    file=self.trim_path(file_path),
-                                    lineno=func_lineno,
-                                    full_name=f"{name}.{func_name}",
-                                    parameters=parameters
-                                ))
+            return load_analyzer(language).analyze(source, self.trim_path(file_path), deadline)
+        except ParseBudgetExceeded:
+            reason = 'timeout'
         except Exception:
-            pass
+            reason = 'error'
+        return self._analyze_fallback(language, file_path, source, reason)
+
+    def _analyze_fallback(self, language, file_path, source, reason):
+        self.last_fallback = reason
+        file = self.trim_path(file_path)
+        return [
+            ComponentRecord(type=type, name=name, file=file, full_name=full_name, lineno=lineno,
+                            parameters=parameters)
+            for type, name, full_name, lineno, parameters in fallback.extract(source, language)
+        ]
+
+    def _analyze_python(self, file_path, source):
+        tree = ast.parse(source, filename=file_path)
+        file = self.trim_path(file_path)
+        package = module_parts(file)
+        if os.path.splitext(os.path.basename(file))[0] != '__init__':
+            package = package[:-1]
+        imports = {}
+        _python_imports(tree, package, imports)
+        components = []
+        self._visit_python_scope(tree, (), file, components, imports, package)
         return components
+
+    def _visit_python_scope(self, node, scope, file, components, imports, package):
+        # Only statements can hold definitions, so expressions are never entered.
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.ClassDef):
+                qualname = scope + (child.name,)
+                components.append(ComponentRecord(
+                    type='class',
+                    name=child.name,
+                    docstring=ast.get_docstring(child),
+                    file=file,
+                    lineno=child.lineno,
+                    full_name='.'.join(qualname),
+                    references=_python_references(child, imports, package)
+                ))
+                self._visit_python_scope(child, qualname, file, components, imports, package)
+            elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                qualname = scope + (child.name,)
+                args = child.args
+                params = [arg.arg for arg in args.posonlyargs + args.args + args.kwonlyargs]
+                components.append(ComponentRecord(
+                    type='function',
+                    name=child.name,
+                    docstring=ast.get_docstring(child),
+                    file=file,
+                    lineno=child.lineno,
+                    full_name='.'.join(qualname),
+                    parameters=params,
+                    references=_python_references(child, imports, package)
+                ))
+                self._visit_python_scope(child, qualname, file, components, imports, package)
+            elif isinstance(child, PYTHON_BLOCKS):
+                self._visit_python_scope(child, scope, file, components, imports, package)
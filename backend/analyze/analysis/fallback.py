@@ -0,0 +1,252 @@
+import re
+
+# A quick scan of Java and Kotlin sources used when the full parsers fail or
+# run out of budget. It only tracks braces and a few keywords, so it recovers
+# class and method names, line numbers and parameters from any file in a
+# single pass, at the cost of occasionally missing or mislabelling a method.
+
+# Comments and string literals are blanked out first so their contents can't
+# open a class or unbalance the braces. Kotlin raw strings come before the
+# ordinary string pattern.
+NOISE_RE = re.compile(r'//[^\n]*|/\*.*?\*/|"""(?:.|\n)*?"""|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'', re.DOTALL)
+
+TOKEN_RE = re.compile(r'[A-Za-z_$][\w$]*|\.\.\.|->|[{}()<>\[\];,.:?@=]')
+
+CLASS_KEYWORDS = {
+    'java': {'class', 'interface', 'enum', 'record'},
+    'kotlin': {'class', 'interface', 'object'},
+}
+
+# Keywords that can be followed by '(' without being a method name.
+CONTROL_KEYWORDS = {'if', 'for', 'while', 'switch', 'catch', 'synchronized', 'return', 'new', 'throw', 'when', 'try'}
+
+JAVA_MODIFIERS = {
+    'public', 'protected', 'private', 'static', 'final', 'abstract', 'native', 'synchronized', 'transient',
+    'volatile', 'strictfp', 'default',
+}
+
+
+def _blank(match):
+    # Keep the newlines so that line numbers stay right.
+    return re.sub(r'[^\n]', ' ', match.group(0))
+
+
+def _tokens(source):
+    """Return ``(token, line)`` pairs of the source without its comments and literals."""
+    source = NOISE_RE.sub(_blank, source)
+    tokens = []
+    line = 1
+    position = 0
+    for match in TOKEN_RE.finditer(source):
+        line += source.count('\n', position, match.start())
+        position = match.start()
+        tokens.append((match.group(0), line))
+    return tokens
+
+
+def _split_parameters(tokens):
+    """Split the tokens between a method's parentheses into one list per parameter."""
+    parameters = [[]]
+    depth = 0
+    for token in tokens:
+        if token in '<([':
+            depth += 1
+        elif token in '>)]':
+            depth -= 1
+        elif token == ',' and depth == 0:
+            parameters.append([])
+            continue
+        parameters[-1].append(token)
+    return [p for p in parameters if p]
+
+
+def _strip_annotations(tokens):
+    result = []
+    i = 0
+    while i < len(tokens):
+        if tokens[i] == '@':
+            # Skip the annotation name and any arguments in parentheses.
+            i += 2
+            while i < len(tokens) and tokens[i] == '.':
+                i += 2
+            if i < len(tokens) and tokens[i] == '(':
+                depth = 0
+                while i < len(tokens):
+                    depth += {'(': 1, ')': -1}.get(tokens[i], 0)
+                    i += 1
+                    if depth == 0:
+                        break
+            continue
+        result.append(tokens[i])
+        i += 1
+    return result
+
+
+def _base_type(tokens):
+    """Return the type without its generic arguments, e.g. ``Map`` for ``Map<K, V>``."""
+    depth = 0
+    base = []
+    for token in tokens:
+        if token == '<':
+            depth += 1
+        elif token == '>':
+            depth -= 1
+        elif depth == 0 and token not in ('?', '...'):
+            base.append(token)
+    return ''.join(base)
+
+
+def _java_parameter(tokens):
+    tokens = [t for t in _strip_annotations(tokens) if t != 'final']
+    if len(tokens) < 2:
+        return None
+    name = tokens[-1]
+    type_tokens = tokens[:-1]
+    dimensions = 0
+    while type_tokens and type_tokens[-1] == ']':
+        type_tokens = type_tokens[:-2]
+        dimensions += 1
+    return f'{_base_type(type_tokens)}' + '[]' * dimensions + f' {name}'
+
+
+def _kotlin_parameter(tokens):
+    tokens = _strip_annotations(tokens)
+    if ':' not in tokens:
+        return None
+    colon = tokens.index(':')
+    name = tokens[colon - 1]
+    type_tokens = tokens[colon + 1:]
+    if '=' in type_tokens:
+        type_tokens = type_tokens[:type_tokens.index('=')]
+    return f'{name}: {_base_type(type_tokens)}'
+
+
+def _closing(tokens, start, opening, closing):
+    """Return the index of the token closing the bracket opened at ``start``."""
+    depth = 0
+    for i in range(start, len(tokens)):
+        if tokens[i][0] == opening:
+            depth += 1
+        elif tokens[i][0] == closing:
+            depth -= 1
+            if depth == 0:
+                return i
+    return len(tokens) - 1
+
+
+def _owner(scopes, language):
+    """Return the name methods declared directly in the innermost of ``scopes`` are qualified with.
+
+    Returns '' for a method named on its own, and None for one the full parser
+    doesn't report: only methods of top-level Kotlin classes are.
+    """
+    if language == 'kotlin':
+        return scopes[0][1] if len(scopes) == 1 and scopes[0][0] == 'class' else None
+    # Like javalang's analyzer, qualify with the outermost class, interfaces and enums not counting.
+    for keyword, name, _ in scopes:
+        if keyword == 'class':
+            return name
+    return ''
+
+
+def extract(source, language):
+    """Return ``(type, name, full_name, lineno, parameters)`` tuples for the classes and methods of ``source``.
+
+    Reports the same kinds of components, named the same way, as the full
+    parsers: only classes, not interfaces, enums, records or objects, and in
+    Kotlin only top-level classes and their methods.
+    """
+    tokens = _tokens(source)
+    class_keywords = CLASS_KEYWORDS[language]
+    components = []
+    # Declarations whose body is open, as (keyword, name, brace depth inside their body).
+    scopes = []
+    pending_class = None
+    depth = 0
+    i = 0
+    while i < len(tokens):
+        token, line = tokens[i]
+        previous = tokens[i - 1][0] if i else ''
+        if token == '{':
+            depth += 1
+            if pending_class is not None:
+                scopes.append(pending_class + (depth,))
+                pending_class = None
+        elif token == '}':
+            if scopes and scopes[-1][2] == depth:
+                scopes.pop()
+            depth -= 1
+            pending_class = None
+        elif pending_class is not None and (token == ';' or token in ('fun', 'val', 'var')):
+            # The pending class has no body, e.g. ``class Empty;`` or a Kotlin data class.
+            pending_class = None
+        elif (token in class_keywords and previous not in ('.', '::', '@') and i + 1 < len(tokens)
+              and TOKEN_RE.fullmatch(tokens[i + 1][0]) and tokens[i + 1][0][0].isalpha()
+              and tokens[i + 1][0] not in class_keywords):
+            name = tokens[i + 1][0]
+            keyword = 'enum' if language == 'kotlin' and previous == 'enum' else token
+            if keyword == 'class' and (language == 'java' or not scopes):
+                components.append(('class', name, name, line, None))
+            pending_class = (keyword, name)
+            i += 2
+            # Skip type parameters and a primary constructor or record header, whose
+            # ``val`` parameters would otherwise look like the end of the declaration.
+            if i < len(tokens) and tokens[i][0] == '<':
+                i = _closing(tokens, i, '<', '>') + 1
+            if i < len(tokens) and tokens[i][0] == '(':
+                i = _closing(tokens, i, '(', ')') + 1
+            continue
+        elif scopes and scopes[-1][2] == depth:
+            method = _method(tokens, i, language)
+            if method is not None:
+                name, line, parameters, end = method
+                owner = _owner(scopes, language)
+                if owner is not None:
+                    full_name = f'{owner}.{name}' if owner else name
+                    components.append(('function', name, full_name, line, parameters))
+                i = end
+                continue
+        i += 1
+    return components
+
+
+def _method(tokens, i, language):
+    """Match a method declaration starting at ``tokens[i]`` in a class body.
+
+    Returns its name, line, parameters and the index of the token after its
+    parameter list, or None.
+    """
+    if language == 'kotlin':
+        if tokens[i][0] != 'fun':
+            return None
+        j = i + 1
+        if j < len(tokens) and tokens[j][0] == '<':
+            j = _closing(tokens, j, '<', '>') + 1
+        # Skip an extension receiver such as ``String.`` in ``fun String.shout()``.
+        while j + 1 < len(tokens) and tokens[j + 1][0] in ('.', '<', '?'):
+            if tokens[j + 1][0] == '<':
+                j = _closing(tokens, j + 1, '<', '>') + 1
+            else:
+                j += 2
+        if j + 1 >= len(tokens) or tokens[j + 1][0] != '(':
+            return None
+        name_index = j
+        parse_parameter = _kotlin_parameter
+    else:
+        token = tokens[i][0]
+        if i + 1 >= len(tokens) or tokens[i + 1][0] != '(' or token in CONTROL_KEYWORDS:
+            return None
+        if not TOKEN_RE.fullmatch(token) or not (token[0].isalpha() or token[0] in '_$'):
+            return None
+        previous = tokens[i - 1][0] if i else ''
+        # A return type comes right before the name; constructors have none.
+        if not (previous in ('>', ']') or (previous[:1].isalpha() or previous[:1] in '_$')):
+            return None
+        if previous in JAVA_MODIFIERS or previous in CONTROL_KEYWORDS or previous == 'throws':
+            return None
+        name_index = i
+        parse_parameter = _java_parameter
+    end = _closing(tokens, name_index + 1, '(', ')')
+    inner = [t for t, _ in tokens[name_index + 2:end]]
+    parameters = [p for p in (parse_parameter(t) for t in _split_parameters(inner)) if p]
+    return tokens[name_index][0], tokens[name_index][1], parameters, end + 1
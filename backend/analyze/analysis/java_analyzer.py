@@ -0,0 +1,131 @@
+import javalang
+
+from .records import ComponentRecord
+from .references import References
+
+
+def _within(tokens, deadline):
+    for token in tokens:
+        deadline.check()
+        yield token
+
+
+class _JavaTokens(javalang.util.LookAheadListIterator):
+    # The parser backtracks by moving through these tokens again, so checking
+    # here also bounds the time spent parsing, not just tokenizing.
+    def __init__(self, tokens, deadline):
+        super().__init__(tokens)
+        self.deadline = deadline
+
+    def __next__(self):
+        self.deadline.check()
+        return super().__next__()
+
+
+class _JavaParser(javalang.parser.Parser):
+    def __init__(self, source, deadline):
+        self.tokens = _JavaTokens(_within(javalang.tokenizer.tokenize(source), deadline), deadline)
+        self.tokens.set_default(javalang.parser.EndOfInput(None))
+        self.debug = False
+
+
+def _type_chain(node):
+    names = []
+    while node is not None:
+        names.append(node.name)
+        node = node.sub_type
+    return names
+
+
+def _imports(tree):
+    imports = {}
+    for declaration in tree.imports:
+        if not declaration.wildcard:
+            imports[declaration.path.rsplit('.', 1)[-1]] = declaration.path
+    return imports
+
+
+def _parent(path):
+    # Paths also hold the lists of nodes, e.g. the selectors of ``this.stop()``.
+    for ancestor in reversed(path):
+        if not isinstance(ancestor, list):
+            return ancestor
+
+
+def _add_reference(references, path, node):
+    if isinstance(node, javalang.tree.MethodInvocation):
+        if node.qualifier:
+            references.call(node.qualifier.split('.') + [node.member])
+        elif node.qualifier == '' and node.member in references.imports:
+            # A statically imported method.
+            references.call([node.member])
+        elif node.qualifier == '' or isinstance(_parent(path), javalang.tree.This):
+            references.call(['this', node.member])
+        else:
+            # Called on the result of another expression.
+            references.call([None, node.member])
+    elif isinstance(node, javalang.tree.SuperMethodInvocation):
+        references.call(['super', node.member])
+    elif isinstance(node, javalang.tree.ClassCreator):
+        references.call(_type_chain(node.type))
+    elif isinstance(node, javalang.tree.ReferenceType) and node.name in references.imports:
+        references.name(node.name)
+
+
+def analyze(source, file, deadline):
+    components = []
+    tree = _JavaParser(source, deadline).parse()
+    imports = _imports(tree)
+    # The references of each class and method, by the id of its node.
+    references = {}
+    for path, node in tree:
+        if isinstance(node, javalang.tree.ClassDeclaration):
+            node_references = references[id(node)] = References(imports)
+            for base in [node.extends] + (node.implements or []):
+                if base is not None:
+                    node_references.base(_type_chain(base))
+            components.append(ComponentRecord(
+                type='class',
+                name=node.name,
+                docstring=None,
+                file=file,
+                lineno=node.position.line if node.position else 1,
+                full_name=node.name
+            ))
+        elif isinstance(node, javalang.tree.MethodDeclaration):
+            references[id(node)] = References(imports)
+            parent_class = None
+            for ancestor in path:
+                if isinstance(ancestor, javalang.tree.ClassDeclaration):
+                    parent_class = ancestor.name
+                    break
+            if parent_class:
+                full_name = f"{parent_class}.{node.name}"
+            else:
+                full_name = node.name
+
+            parameters = []
+            for param in node.parameters:
+                param_type = str(param.type.name)
+                if param.type.dimensions:
+                    param_type += '[]' * len(param.type.dimensions)
+                parameters.append(f"{param_type} {param.name}")
+            components.append(ComponentRecord(
+                type='function',
+                name=node.name,
+                docstring=None,
+                file=file,
+                lineno=node.position.line if node.position else 1,
+                full_name=full_name,
+                parameters=parameters
+            ))
+        elif path:
+            # Attribute the reference to the innermost class or method it's in.
+            for ancestor in reversed(path):
+                owner = references.get(id(ancestor))
+                if owner is not None:
+                    _add_reference(owner, path, node)
+                    break
+    for component, node_references in zip(components, references.values()):
+        component.references = node_references.to_dict()
+    return components
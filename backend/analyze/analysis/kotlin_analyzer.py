@@ -0,0 +1,130 @@
+import re
+
+from kopyt import Parser
+from kopyt.lexer import Lexer
+from kopyt.parser import PeekableIterator
+
+from .records import ComponentRecord
+from .references import RECEIVERS, References
+
+# Where the name of a supertype ends, e.g. in ``Base(x)`` or ``List<String>``.
+TYPE_END_RE = re.compile(r'[(<\s]')
+
+
+class _KotlinTokens(PeekableIterator):
+    def __init__(self, lexer, deadline):
+        super().__init__(lexer, default=lexer.eof)
+        self.deadline = deadline
+
+    def __next__(self):
+        self.deadline.check()
+        return super().__next__()
+
+
+class _KotlinParser(Parser):
+    def __init__(self, source, deadline):
+        self.tokens = _KotlinTokens(Lexer(source, yield_comments=False), deadline)
+
+
+def _nodes(node):
+    # kopyt nodes are dataclasses; visit them all, in source order.
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (list, tuple)):
+            stack.extend(reversed(node))
+            continue
+        fields = getattr(node, '__dataclass_fields__', None)
+        if fields is None:
+            continue
+        yield node
+        stack.extend(getattr(node, name) for name in reversed(fields) if name != 'position')
+
+
+def _add_calls(references, expression):
+    primary = expression.expression
+    kind = primary.__class__.__name__
+    if kind == 'SimpleIdentifier':
+        chain = [primary.value]
+    elif kind == 'ThisExpression':
+        chain = ['this']
+    elif kind == 'SuperExpression':
+        chain = ['super']
+    else:
+        chain = [None]
+    for suffix in expression.suffixes:
+        kind = suffix.__class__.__name__
+        if kind == 'NavigationSuffix':
+            chain.append(suffix.suffix if isinstance(suffix.suffix, str) else None)
+            continue
+        if kind == 'CallSuffix':
+            name = chain[0]
+            if len(chain) == 1 and name and name not in RECEIVERS and name not in references.imports \
+                    and not name[:1].isupper():
+                # Most likely a method of the class, a constructor being capitalized.
+                references.call(['this', name])
+            else:
+                references.call(chain)
+        # Anything after is called on the result of the expression.
+        chain = [None]
+
+
+def _references(function, imports):
+    references = References(imports)
+    for node in _nodes(function.body):
+        kind = node.__class__.__name__
+        if kind == 'PostfixUnaryExpression':
+            _add_calls(references, node)
+        elif kind == 'SimpleIdentifier':
+            references.name(node.value)
+    return references.to_dict()
+
+
+def analyze(source, file, deadline):
+    components = []
+    kt_tree = _KotlinParser(source, deadline).parse()
+    imports = {}
+    for declaration in kt_tree.imports:
+        if not getattr(declaration, 'wildcard', False):
+            imports[declaration.alias or declaration.name.rsplit('.', 1)[-1]] = declaration.name
+    for decl in kt_tree.declarations:
+        if decl.__class__.__name__ == 'ClassDeclaration':
+            name = decl.name
+            lineno = decl.position.line if hasattr(decl, 'position') and decl.position else 1
+            references = References(imports)
+            for supertype in getattr(decl, 'supertypes', None) or []:
+                base = TYPE_END_RE.split(str(getattr(supertype, 'delegate', supertype)), 1)[0]
+                references.base(base.split('.'))
+            components.append(ComponentRecord(
+                type='class',
+                name=name,
+                docstring=None,
+                file=file,
+                lineno=lineno,
+                full_name=name,
+                references=references.to_dict()
+            ))
+            if hasattr(decl, 'body') and hasattr(decl.body, 'members'):
+                for member in decl.body.members:
+                    if member.__class__.__name__ == 'FunctionDeclaration':
+                        func_name = member.name
+                        func_lineno = member.position.line if hasattr(member, 'position') and member.position else 1
+                        parameters = []
+                        if hasattr(member, 'parameters'):
+                            for param in member.parameters:
+                                param_name = getattr(param, 'name', None)
+                                param_type = getattr(param, 'type', None)
+                                if hasattr(param_type, 'name'):
+                                    param_type = param_type.name
+                                parameters.append(f"{param_name}: {param_type}")
+                        components.append(ComponentRecord(
+                            type='function',
+                            name=func_name,
+                            docstring=None,
+                            file=file,
+                            lineno=func_lineno,
+                            full_name=f"{name}.{func_name}",
+                            parameters=parameters,
+                            references=_references(member, imports)
+                        ))
+    return components
@@ -0,0 +1,160 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing.util import Finalize
+
+from django.conf import settings
+
+from .cache import get_parse_cache
+from ..metrics import registry
+from .code_analyzer import LANGUAGES, CodeAnalyzer, load_analyzer
+
+_worker_analyzer = None
+
+# The pre-warmed pool shared by every analysis when ANALYSIS_WARM_POOL is set.
+_warm_pool = None
+_warm_pool_lock = threading.Lock()
+
+
+def _init_worker(temp_dir):
+    global _worker_analyzer
+    _worker_analyzer = CodeAnalyzer(temp_dir=temp_dir, cache=get_parse_cache())
+    if _worker_analyzer.cache is not None:
+        # Workers leave through multiprocessing rather than atexit, so the cache is closed by its finalizers,
+        # writing the last-used times of the hits not written yet.
+        Finalize(_worker_analyzer.cache, _worker_analyzer.cache.close, exitpriority=10)
+
+
+def _init_warm_worker():
+    _init_worker(None)
+    # Parsers are imported lazily; a warm worker loads them all up front.
+    for language in set(LANGUAGES.values()) - {'python'}:
+        load_analyzer(language)
+
+
+def _ready():
+    return os.getpid()
+
+
+def _analyze_one(analyzer, file):
+    # Returns the components with the reason the fallback extractor was used,
+    # if it was, and whether they came from the parse cache. A file that fails
+    # to parse has None instead of failing the run.
+    try:
+        if isinstance(file, tuple):
+            components = analyzer.analyze_source(*file)
+        else:
+            components = analyzer.analyze(file)
+        return components, analyzer.last_fallback, analyzer.last_cache
+    except Exception:
+        return None, None, analyzer.last_cache
+
+
+def _record(file, result):
+    # Recorded here rather than in the workers, whose registries are never rendered.
+    components, fallback, cache = result
+    path = file[0] if isinstance(file, tuple) else file
+    language = LANGUAGES.get(os.path.splitext(path)[1], 'other')
+    registry.inc('analysis_files_total', language=language)
+    if cache is not None:
+        registry.inc('analysis_parse_cache_lookups_total', language=language, result=cache)
+    if components is None:
+        registry.inc('analysis_parse_failures_total', language=language)
+        return []
+    if fallback is not None:
+        registry.inc('analysis_parse_fallbacks_total', language=language, reason=fallback)
+    registry.inc('analysis_components_total', len(components), language=language)
+    return components
+
+
+def _analyze_in_worker(file):
+    return _analyze_one(_worker_analyzer, file)
+
+
+def _analyze_in_warm_worker(temp_dir, file):
+    # Warm workers outlive any one codebase, so its directory comes with each file.
+    _worker_analyzer.temp_dir = temp_dir
+    return _analyze_one(_worker_analyzer, file)
+
+
+def get_warm_pool(workers=None):
+    """Return the shared pool of analysis workers, starting it on first use.
+
+    Its workers are started right away with the parsers of every language
+    already imported, so the first large codebase doesn't wait for them.
+    """
+    global _warm_pool
+    with _warm_pool_lock:
+        if _warm_pool is None:
+            if workers is None:
+                workers = getattr(settings, 'ANALYSIS_WORKERS', None) or os.cpu_count() or 1
+            _warm_pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_warm_worker)
+            # Each task submitted while no worker is idle starts another one.
+            for _ in range(workers):
+                _warm_pool.submit(_ready)
+        return _warm_pool
+
+
+def start_warm_pool():
+    """Start the warm pool when ANALYSIS_WARM_POOL is set.
+
+    Called by the WSGI and ASGI entrypoints, so only processes serving
+    requests start one, not management commands or the autoreloader.
+    """
+    if getattr(settings, 'ANALYSIS_WARM_POOL', False):
+        get_warm_pool()
+
+
+def shutdown_warm_pool():
+    global _warm_pool
+    with _warm_pool_lock:
+        if _warm_pool is not None:
+            _warm_pool.shutdown()
+            _warm_pool = None
+
+
+def iter_analyze_files(files, temp_dir=None, workers=None, threshold=None):
+    """Yield the components of each file, spreading files across a process pool for large codebases.
+
+    Each entry of ``files`` is either a path on disk or a ``(path, bytes)`` pair
+    of source read from elsewhere, such as a zip archive.
+
+    One list of components is yielded per file, in the order of ``files``
+    regardless of how the work was scheduled. Codebases with fewer than
+    ``threshold`` files, or a pool of a single worker, are analyzed serially
+    in the calling process. With ``ANALYSIS_WARM_POOL`` the shared warm pool
+    is used instead of starting one per call. A file that fails to parse
+    yields no components.
+    """
+    if workers is None:
+        workers = getattr(settings, 'ANALYSIS_WORKERS', None) or os.cpu_count() or 1
+    if threshold is None:
+        threshold = getattr(settings, 'ANALYSIS_PARALLEL_THRESHOLD', 200)
+    files = list(files)
+    if workers <= 1 or len(files) < threshold:
+        analyzer = CodeAnalyzer(temp_dir=temp_dir, cache=get_parse_cache())
+        try:
+            for file in files:
+                yield _record(file, _analyze_one(analyzer, file))
+        finally:
+            if analyzer.cache is not None:
+                analyzer.cache.close()
+        return
+    chunksize = max(1, len(files) // (workers * 4))
+    if getattr(settings, 'ANALYSIS_WARM_POOL', False):
+        results = get_warm_pool().map(partial(_analyze_in_warm_worker, temp_dir), files, chunksize=chunksize)
+        for file, result in zip(files, results):
+            yield _record(file, result)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(temp_dir,)) as executor:
+        for file, result in zip(files, executor.map(_analyze_in_worker, files, chunksize=chunksize)):
+            yield _record(file, result)
+
+
+def analyze_files(files, temp_dir=None, workers=None, threshold=None):
+    """Analyze files and return all their components in the order of ``files``."""
+    components = []
+    for analyzed in iter_analyze_files(files, temp_dir=temp_dir, workers=workers, threshold=threshold):
+        components += analyzed
+    return components
@@ -0,0 +1,47 @@
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class ComponentRecord:
+    """A class or function found by the analyzers.
+
+    Analysis produces these lightweight records rather than unsaved
+    ``Component`` model instances; use ``to_model`` when persisting.
+    """
+    type: str
+    name: str
+    file: str
+    full_name: str
+    lineno: int
+    docstring: str = None
+    parameters: list = None
+    # What the component calls, inherits and imports, as found by the
+    # analyzers (see ``references.References``), or None.
+    references: dict = None
+
+    @classmethod
+    def from_model(cls, component):
+        return cls(
+            type=component.type,
+            name=component.name,
+            file=component.file,
+            full_name=component.full_name,
+            lineno=component.lineno,
+            docstring=component.docstring,
+            parameters=component.parameters,
+            references=component.references
+        )
+
+    def to_model(self, **fields):
+        from ..models import Component
+        return Component(
+            type=self.type,
+            name=self.name,
+            file=self.file,
+            full_name=self.full_name,
+            lineno=self.lineno,
+            docstring=self.docstring,
+            parameters=self.parameters,
+            references=self.references,
+            **fields
+        )
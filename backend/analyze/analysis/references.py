@@ -0,0 +1,73 @@
+import posixpath
+
+# Receivers that refer to the instance or class a method is defined in.
+SELF_NAMES = {'self', 'cls', 'this'}
+RECEIVERS = SELF_NAMES | {'super'}
+
+KINDS = ('calls', 'bases', 'imports')
+
+
+def module_parts(file):
+    """Return the dotted module path of ``file`` as a list, e.g. ``['pkg', 'util']`` for ``pkg/util.py``."""
+    parts = posixpath.splitext(file.replace('\\', '/'))[0].split('/')
+    if parts[-1] == '__init__':
+        parts.pop()
+    return [part for part in parts if part]
+
+
+class References:
+    """Collects what one component refers to while its source is walked.
+
+    ``imports`` is the symbol table of the file, mapping the names bound by
+    its import statements to the qualified names they import. Calls and base
+    classes are recorded as dotted names, qualified through that table when
+    they start with an imported name. ``self.m`` stands for a method of the
+    enclosing class, ``super.m`` for a method of its base classes and ``*.m``
+    for a method called on an object of unknown type; the cross-reference
+    index resolves them later, once every component of the codebase is known.
+    """
+
+    def __init__(self, imports):
+        self.imports = imports
+        # Dicts keep the order references were found in, without duplicates.
+        self.found = {kind: {} for kind in KINDS}
+
+    def _qualify(self, chain):
+        root = chain[0]
+        if root in SELF_NAMES and len(chain) == 2:
+            return 'self.' + chain[1]
+        if root == 'super' and len(chain) == 2:
+            return 'super.' + chain[1]
+        if root is None or root in RECEIVERS:
+            return '*.' + chain[-1]
+        if root in self.imports:
+            self.found['imports'][self.imports[root]] = None
+            return '.'.join([self.imports[root]] + chain[1:])
+        if len(chain) == 1 or root[:1].isupper():
+            return '.'.join(chain)
+        # A method of a local variable or attribute, whose type isn't known.
+        return '*.' + chain[-1]
+
+    def call(self, chain):
+        """Record a call of ``chain``, the names of a dotted call such as ``['os', 'path', 'join']``."""
+        # A bare ``super()`` or ``this(...)`` isn't a call of a component.
+        if chain and chain[-1] and not (len(chain) == 1 and chain[0] in RECEIVERS):
+            self.found['calls'][self._qualify(chain)] = None
+
+    def base(self, chain):
+        """Record a base class, named by ``chain``; unlike a call, it is a type even when it isn't capitalized."""
+        if chain and chain[-1]:
+            if chain[0] in self.imports:
+                name = self._qualify(chain)
+            else:
+                name = '.'.join(chain)
+            self.found['bases'][name] = None
+
+    def name(self, name):
+        """Record the use of ``name``, which counts as an import when the file imports it."""
+        if name in self.imports:
+            self.found['imports'][self.imports[name]] = None
+
+    def to_dict(self):
+        references = {kind: list(found) for kind, found in self.found.items() if found}
+        return references or None
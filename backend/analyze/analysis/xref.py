@@ -0,0 +1,308 @@
+import posixpath
+import struct
+import sys
+from array import array
+from collections import defaultdict
+
+from .references import module_parts
+
+# Each relation is stored in both directions.
+INVERSES = {'calls': 'called_by', 'bases': 'subclasses', 'overrides': 'overridden_by', 'imports': 'imported_by'}
+
+RELATIONS = tuple(relation for pair in INVERSES.items() for relation in pair)
+
+_MAGIC = b'XREF'
+_VERSION = 1
+_HEADER = struct.Struct('<4sHI')
+_LENGTH = struct.Struct('<I')
+
+# Deepest class hierarchy walked when looking up an inherited method.
+_MAX_DEPTH = 32
+
+
+def _csr(size, sources, targets):
+    """Return the ``(offsets, targets)`` arrays of edges, grouped by source with a counting sort."""
+    offsets = array('i', bytes(4 * (size + 1)))
+    for source in sources:
+        offsets[source + 1] += 1
+    for symbol in range(size):
+        offsets[symbol + 1] += offsets[symbol]
+    grouped = array('i', bytes(4 * len(targets)))
+    position = offsets[:-1]
+    for source, target in zip(sources, targets):
+        grouped[position[source]] = target
+        position[source] += 1
+    return offsets, grouped
+
+
+def module_names(file):
+    """Return every dotted suffix of the module path of ``file``: the files of a repository may live under e.g. src/."""
+    parts = module_parts(file)
+    return ['.'.join(parts[start:]) for start in range(len(parts))]
+
+
+class CrossReferenceIndex:
+    """Which components of a codebase call, inherit, override and import which.
+
+    Components are identified by integer symbols, their position in analysis
+    order. Each relation is stored as adjacency lists in two flat arrays: the
+    neighbors of symbol ``s`` are ``targets[offsets[s]:offsets[s + 1]]``, so a
+    lookup is two array reads and the index takes 4 bytes per edge plus 4 per
+    symbol for each relation.
+    """
+
+    def __init__(self, names, relations):
+        self.names = names
+        # relation -> (offsets, targets)
+        self.relations = relations
+
+    def __len__(self):
+        return len(self.names)
+
+    def neighbors(self, symbol, relation):
+        """Return the symbols related to ``symbol`` by ``relation``, one of ``RELATIONS``."""
+        offsets, targets = self.relations[relation]
+        return targets[offsets[symbol]:offsets[symbol + 1]].tolist()
+
+    def edges(self, relation):
+        return len(self.relations[relation][1])
+
+    def to_bytes(self):
+        names = '\n'.join(self.names).encode('utf-8')
+        chunks = [_HEADER.pack(_MAGIC, _VERSION, len(self.names)), _LENGTH.pack(len(names)), names]
+        for relation in RELATIONS:
+            offsets, targets = self.relations[relation]
+            if sys.byteorder == 'big':
+                offsets, targets = array('i', offsets), array('i', targets)
+                offsets.byteswap()
+                targets.byteswap()
+            chunks += [_LENGTH.pack(len(targets)), offsets.tobytes(), targets.tobytes()]
+        return b''.join(chunks)
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = memoryview(data)
+        magic, version, size = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError('Not a cross-reference index')
+        position = _HEADER.size
+        length, = _LENGTH.unpack_from(data, position)
+        position += _LENGTH.size
+        names = bytes(data[position:position + length]).decode('utf-8').split('\n') if size else []
+        position += length
+        relations = {}
+        for relation in RELATIONS:
+            length, = _LENGTH.unpack_from(data, position)
+            position += _LENGTH.size
+            arrays = []
+            for count in (size + 1, length):
+                values = array('i')
+                values.frombytes(data[position:position + 4 * count])
+                if sys.byteorder == 'big':
+                    values.byteswap()
+                arrays.append(values)
+                position += 4 * count
+            relations[relation] = tuple(arrays)
+        return cls(names, relations)
+
+
+class SymbolTable:
+    """The components an index is built from, held in memory with the lookups resolution needs.
+
+    Only the file, type, full name and references of each component are
+    kept. ``store.ComponentStore`` offers the same methods backed by a
+    database on disk, for codebases too large for this table.
+    """
+
+    def __init__(self):
+        self.files = []
+        self.types = []
+        self.full_names = []
+        self.references = []
+        self.bases = {}
+        self.by_file = None
+
+    def __len__(self):
+        return len(self.full_names)
+
+    def add(self, components):
+        """Add the components of one file; the first component added gets symbol 0, the next 1 and so on."""
+        for component in components:
+            self.files.append(component.file)
+            self.types.append(component.type)
+            self.full_names.append(component.full_name)
+            self.references.append(component.references)
+
+    def prepare(self):
+        self.by_file = {}
+        self.by_full_name = defaultdict(list)
+        self.by_directory = defaultdict(list)
+        self.by_method = defaultdict(list)
+        self.modules = defaultdict(set)
+        for symbol, (file, full_name) in enumerate(zip(self.files, self.full_names)):
+            self.by_file.setdefault((file, full_name), symbol)
+            self.by_full_name[full_name].append(symbol)
+            self.by_directory[posixpath.dirname(file), full_name].append(symbol)
+            if self.types[symbol] == 'function':
+                self.by_method[full_name.rsplit('.', 1)[-1]].append(symbol)
+        for file in dict.fromkeys(self.files):
+            for module in module_names(file):
+                self.modules[module].add(file)
+
+    def components(self):
+        """Yield ``(symbol, file, type, full_name, references)`` for every component, in symbol order."""
+        return zip(range(len(self)), self.files, self.types, self.full_names, self.references)
+
+    def component(self, symbol):
+        return self.files[symbol], self.types[symbol], self.full_names[symbol]
+
+    def find(self, file, full_name):
+        """Return the first component named ``full_name`` in ``file``, or None."""
+        return self.by_file.get((file, full_name))
+
+    # The lookups below return at most two symbols: resolution only needs to
+    # know whether a name is unique.
+
+    def in_directory(self, directory, full_name):
+        return self.by_directory.get((directory, full_name), ())[:2]
+
+    def named(self, full_name):
+        return self.by_full_name.get(full_name, ())[:2]
+
+    def methods(self, name):
+        return self.by_method.get(name, ())[:2]
+
+    def module_files(self, module):
+        return self.modules.get(module, ())
+
+    def set_bases(self, symbol, bases):
+        self.bases[symbol] = bases
+
+    def get_bases(self, symbol):
+        return self.bases.get(symbol, ())
+
+    def names(self):
+        return self.full_names
+
+
+class CrossReferenceBuilder:
+    """Resolves the references of the components of a codebase into a ``CrossReferenceIndex``.
+
+    Components are added to ``symbols``, a ``SymbolTable`` unless given, in
+    analysis order. A reference is resolved to a component of the codebase
+    by, in order: the module part of a qualified name, the file of the
+    component, its directory (a Java or Kotlin package) and finally a full
+    name that is unique in the codebase. References to anything outside the
+    codebase are dropped.
+    """
+
+    def __init__(self, symbols=None):
+        self.symbols = SymbolTable() if symbols is None else symbols
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def add(self, components):
+        self.symbols.add(components)
+
+    def build(self):
+        symbols = self.symbols
+        symbols.prepare()
+        sources = {relation: array('i') for relation in INVERSES}
+        targets = {relation: array('i') for relation in INVERSES}
+
+        def add(relation, source, found):
+            for target in dict.fromkeys(found):
+                if target is not None:
+                    sources[relation].append(source)
+                    targets[relation].append(target)
+
+        # Bases first, since calls of inherited methods go through them.
+        for component in symbols.components():
+            references = component[4]
+            if references and references.get('bases'):
+                found = dict.fromkeys(self._resolve(component, ref) for ref in references['bases'])
+                bases = [s for s in found if s is not None and s != component[0]]
+                symbols.set_bases(component[0], bases)
+                add('bases', component[0], bases)
+        for component in symbols.components():
+            symbol, file, kind, full_name, references = component
+            if references:
+                add('calls', symbol, (self._resolve(component, ref) for ref in references.get('calls', ())))
+                add('imports', symbol, (self._resolve(component, ref) for ref in references.get('imports', ())))
+            owner = self._owner(file, full_name) if kind == 'function' else None
+            if owner is not None:
+                scope, _, name = full_name.rpartition('.')
+                # Methods only, not functions nested in them.
+                if scope == symbols.component(owner)[2]:
+                    add('overrides', symbol, [self._inherited(owner, name, skip_self=True)])
+
+        size = len(symbols)
+        relations = {}
+        for relation, inverse in INVERSES.items():
+            relations[relation] = _csr(size, sources[relation], targets[relation])
+            relations[inverse] = _csr(size, targets[relation], sources[relation])
+        return CrossReferenceIndex(list(symbols.names()), relations)
+
+    def _owner(self, file, full_name):
+        """Return the symbol of the innermost class enclosing ``full_name`` in ``file``, or None."""
+        while '.' in full_name:
+            full_name = full_name.rsplit('.', 1)[0]
+            owner = self.symbols.find(file, full_name)
+            if owner is not None and self.symbols.component(owner)[1] == 'class':
+                return owner
+        return None
+
+    def _inherited(self, cls, name, skip_self=False, depth=0):
+        """Return the method ``name`` of class ``cls``, or of the nearest of its bases defining it."""
+        if not skip_self:
+            file, _, full_name = self.symbols.component(cls)
+            method = self.symbols.find(file, f'{full_name}.{name}')
+            if method is not None:
+                return method
+        if depth < _MAX_DEPTH:
+            for base in self.symbols.get_bases(cls):
+                method = self._inherited(base, name, depth=depth + 1)
+                if method is not None:
+                    return method
+        return None
+
+    def _unique(self, symbols):
+        return symbols[0] if len(symbols) == 1 else None
+
+    def _resolve(self, component, reference):
+        symbol, file, kind, full_name = component[:4]
+        head, _, name = reference.partition('.')
+        if head in ('self', 'super'):
+            owner = self._owner(file, full_name) if kind == 'function' else symbol
+            if owner is not None:
+                method = self._inherited(owner, name, skip_self=head == 'super')
+                if method is not None:
+                    return method
+            # A bare call in Java or Kotlin that isn't a method of the class.
+            return self._resolve_name(file, name) if head == 'self' else None
+        if head == '*':
+            return self._unique(self.symbols.methods(name))
+        parts = reference.split('.')
+        for end in range(len(parts), 0, -1):
+            files = self.symbols.module_files('.'.join(parts[:end]))
+            if not files:
+                continue
+            # A Python module holds the rest of the name; a Java or Kotlin file, a class of its own name.
+            names = ['.'.join(parts[end - 1:])]
+            if end < len(parts):
+                names.insert(0, '.'.join(parts[end:]))
+            for name in names:
+                found = [s for s in (self.symbols.find(f, name) for f in files) if s is not None]
+                if found:
+                    return self._unique(found)
+        return self._resolve_name(file, reference)
+
+    def _resolve_name(self, file, full_name):
+        found = self.symbols.find(file, full_name)
+        if found is not None:
+            return found
+        found = self.symbols.in_directory(posixpath.dirname(file), full_name)
+        if found:
+            return self._unique(found)
+        return self._unique(self.symbols.named(full_name))
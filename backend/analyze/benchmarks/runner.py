@@ -0,0 +1,132 @@
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+from django.test.utils import override_settings
+
+from ..analysis.parallel import analyze_files
+from ..core.codebase import CodebaseExtractor
+from ..pipeline import analyze_codebase
+from ..questions.question_generator import RuleBasedQuestionGenerator
+from ..summarization.summarizer import ComponentSummarizer
+from .synthetic import SyntheticCodebase
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+SIZES = {
+    'small': {'files': 60, 'classes': 3, 'methods': 8},
+    'medium': {'files': 300, 'classes': 5, 'methods': 10},
+    'large': {'files': 1500, 'classes': 5, 'methods': 20},
+}
+
+STAGES = ('extract', 'analyze', 'summarize', 'generate', 'end_to_end')
+
+# Differences below these are timer and allocator noise rather than regressions.
+NOISE = {'seconds': 0.02, 'peak_bytes': 64 * 1024}
+
+
+def measure(func, repeat=3):
+    """Return the fastest of ``repeat`` timed calls of ``func`` and the peak memory of one more.
+
+    Memory is traced in a separate call because tracing slows Python code down
+    several times. Only the current process is traced, not worker processes.
+    """
+    seconds = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'seconds': round(seconds, 4), 'peak_bytes': peak}
+
+
+def run_benchmarks(codebase, repeat=3, stages=STAGES):
+    """Benchmark each pipeline stage, and the whole pipeline, on a synthetic ``codebase``."""
+    results = {}
+    work_dir = tempfile.mkdtemp()
+    try:
+        archive = codebase.zip(os.path.join(work_dir, 'codebase.zip'))
+        temp_dir = os.path.join(work_dir, 'codebase')
+        with zipfile.ZipFile(archive) as zf:
+            zf.extractall(temp_dir)
+        files = sorted(os.path.join(temp_dir, name) for name, _ in codebase.sources())
+
+        def extract():
+            extractor = CodebaseExtractor(archive)
+            extractor.extract()
+            extractor.cleanup()
+
+        def analyze():
+            return analyze_files(files, temp_dir=temp_dir, workers=1)
+
+        def end_to_end():
+            extractor = CodebaseExtractor(archive)
+            try:
+                analyze_codebase(*extractor.extract())
+            finally:
+                extractor.cleanup()
+
+        # Parsed results must not come from the parse cache of an earlier run.
+        with override_settings(ANALYSIS_CACHE_PATH=None):
+            components = analyze()
+            summaries = ComponentSummarizer.summarize(components)
+            benchmarks = {
+                'extract': extract,
+                'analyze': analyze,
+                'summarize': lambda: ComponentSummarizer.summarize(components),
+                'generate': lambda: RuleBasedQuestionGenerator.generate(summaries),
+                'end_to_end': end_to_end,
+            }
+            for stage in stages:
+                results[stage] = measure(benchmarks[stage], repeat=repeat)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        'options': codebase.options(),
+        'components': len(components),
+        'python': platform.python_version(),
+        'results': results,
+    }
+
+
+def compare(report, baseline, tolerance=0.5):
+    """Return a message for every stage that is slower or uses more memory than ``baseline`` allows."""
+    regressions = []
+    for stage, result in report['results'].items():
+        expected = baseline['results'].get(stage)
+        if not expected:
+            continue
+        for metric in ('seconds', 'peak_bytes'):
+            limit = max(expected[metric] * (1 + tolerance), expected[metric] + NOISE[metric])
+            if result[metric] > limit:
+                regressions.append(f'{stage} {metric}: {result[metric]} > {expected[metric]} (+{tolerance:.0%})')
+    return regressions
+
+
+def load_baseline(path=BASELINE_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(baseline, path=BASELINE_PATH):
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def synthetic_codebase(size='small', **options):
+    return SyntheticCodebase(**{**SIZES[size], **{k: v for k, v in options.items() if v is not None}})
@@ -0,0 +1,126 @@
+import io
+import os
+import random
+import zipfile
+
+# Word list for the generated identifiers and docstrings.
+WORDS = (
+    'account', 'buffer', 'cache', 'client', 'config', 'data', 'event', 'filter', 'handler', 'index', 'item',
+    'job', 'key', 'layer', 'model', 'node', 'order', 'parser', 'queue', 'record', 'request', 'result',
+    'session', 'stream', 'task', 'token', 'user', 'value', 'worker', 'writer',
+)
+
+EXTENSIONS = {
+    'python': '.py',
+    'java': '.java',
+    'kotlin': '.kt',
+}
+
+
+class SyntheticCodebase:
+    """Deterministically generates Python, Java and Kotlin source files.
+
+    The same options and ``seed`` always produce the same files, so benchmark
+    runs on different machines or commits analyze identical inputs. Files are
+    spread over the ``languages`` in turn.
+    """
+
+    def __init__(self, files=100, classes=5, methods=10, docstring_words=12, languages=('python', 'java', 'kotlin'),
+                 seed=0):
+        self.files = files
+        self.classes = classes
+        self.methods = methods
+        self.docstring_words = docstring_words
+        self.languages = tuple(languages)
+        self.seed = seed
+
+    def options(self):
+        return {
+            'files': self.files,
+            'classes': self.classes,
+            'methods': self.methods,
+            'docstring_words': self.docstring_words,
+            'languages': list(self.languages),
+            'seed': self.seed,
+        }
+
+    def sources(self):
+        """Yield ``(relative path, bytes)`` for every generated file."""
+        rng = random.Random(self.seed)
+        for i in range(self.files):
+            language = self.languages[i % len(self.languages)]
+            package = f'pkg{i // 50}'
+            name = f'{rng.choice(WORDS)}_{i}'
+            if language != 'python':
+                name = ''.join(part.capitalize() for part in name.split('_'))
+            source = getattr(self, f'_{language}')(rng, i)
+            yield f'{package}/{name}{EXTENSIONS[language]}', source.encode('utf-8')
+
+    def write(self, dest):
+        """Write the files under ``dest`` and return their paths."""
+        paths = []
+        for name, data in self.sources():
+            path = os.path.join(dest, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+            paths.append(path)
+        return paths
+
+    def zip(self, dest=None):
+        """Write the files to a zip archive at ``dest``, or return the archive bytes."""
+        target = dest or io.BytesIO()
+        with zipfile.ZipFile(target, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for name, data in self.sources():
+                zf.writestr(name, data)
+        return dest if dest else target.getvalue()
+
+    def _docstring(self, rng):
+        return ' '.join(rng.choice(WORDS) for _ in range(self.docstring_words)).capitalize() + '.'
+
+    def _params(self, rng):
+        return [f'{rng.choice(WORDS)}{k}' for k in range(rng.randint(0, 3))]
+
+    def _python(self, rng, index):
+        lines = ['import os', '']
+        for c in range(self.classes):
+            lines.append(f'class Generated{index}x{c}:')
+            lines.append(f'    """{self._docstring(rng)}"""')
+            for m in range(self.methods):
+                params = ', '.join(['self'] + self._params(rng))
+                lines.append('')
+                lines.append(f'    def {rng.choice(WORDS)}_{m}({params}):')
+                lines.append(f'        """{self._docstring(rng)}"""')
+                lines.append(f'        return os.path.join(str({m}), str({c}))')
+            lines.append('')
+        return '\n'.join(lines) + '\n'
+
+    def _java(self, rng, index):
+        lines = ['package generated;', '']
+        for c in range(self.classes):
+            lines.append(f'/** {self._docstring(rng)} */')
+            lines.append(f'{"public " if c == 0 else ""}class Generated{index}x{c} {{')
+            for m in range(self.methods):
+                params = ', '.join(f'String {p}' for p in self._params(rng))
+                lines.append(f'    /** {self._docstring(rng)} */')
+                lines.append(f'    public int {rng.choice(WORDS)}{m}({params}) {{')
+                lines.append(f'        return {m} + {c};')
+                lines.append('    }')
+            lines.append('}')
+            lines.append('')
+        return '\n'.join(lines)
+
+    def _kotlin(self, rng, index):
+        lines = ['package generated', '']
+        for c in range(self.classes):
+            lines.append(f'/** {self._docstring(rng)} */')
+            lines.append(f'class Generated{index}x{c} {{')
+            for m in range(self.methods):
+                params = ', '.join(f'{p}: String' for p in self._params(rng))
+                lines.append(f'    /** {self._docstring(rng)} */')
+                lines.append(f'    fun {rng.choice(WORDS)}{m}({params}): Int {{')
+                lines.append(f'        return {m} + {c}')
+                lines.append('    }')
+            lines.append('}')
+            lines.append('')
+        return '\n'.join(lines)
@@ -1,30 +1,238 @@
+import asyncio
 import os
+import posixpath
 import tempfile
 from zipfile import ZipFile
-import subprocess
+from ..metrics import registry
+from .git import SELECTION_FILES, get_git_fetcher
+from .selection import HEADER_BYTES, VENV_MARKER, FileSelection
+
+SOURCE_EXTENSIONS = ('.py', '.java', '.kt')
+
+class SelectionChanged(Exception):
+    """A .gitignore file or virtual environment changed, so unchanged files may be selected differently."""
+
+def _archive_root(names):
+    """Return the directory holding every file of an archive, such as GitHub's ``repo-main/``, or ''."""
+    roots = set()
+    for name in names:
+        if '__MACOSX' in name:
+            continue
+        root, slash, _ = name.partition('/')
+        if not slash:
+            return ''
+        roots.add(root)
+        if len(roots) > 1:
+            return ''
+    return roots.pop() if roots else ''
 
 class CodebaseExtractor:
-    def __init__(self, path_or_url):
+    def __init__(self, path_or_url, selection=None, commit=None):
         self.path_or_url = path_or_url
-        self.temp_dir = tempfile.mkdtemp()
+        self.selection = selection or FileSelection()
+        self.temp_dir = None
+        self.cached = False
+        self.fetcher = None
+        # The commit of a repository to analyze, resolved from its HEAD unless given.
+        self.commit = commit or ''
         self.file_paths = []
+        self.bytes_extracted = 0
+        # (relative path, reason) of the skipped files, and of the skipped
+        # directories without listing what they contain.
+        self.skipped = []
+        self._directory_reasons = {}
+        # Directories of an archive holding a virtual environment.
+        self._virtualenvs = set()
 
     def extract(self):
         if self.path_or_url.endswith('.zip') and os.path.exists(self.path_or_url):
+            self.temp_dir = tempfile.mkdtemp()
             with ZipFile(self.path_or_url, 'r') as zip_ref:
                 zip_ref.extractall(self.temp_dir)
-        elif self.path_or_url.startswith('http') and 'github.com' in self.path_or_url:
-            subprocess.run(['git', 'clone', self.path_or_url, self.temp_dir], check=True)
+                self.selection.root = _archive_root(zip_ref.namelist())
+        elif self.is_repo_url():
+            self.fetcher = fetcher = get_git_fetcher()
+            self.commit = self.commit or fetcher.resolve(self.path_or_url)
+            self.temp_dir, self.cached = fetcher.fetch(self.path_or_url, self.commit)
         else:
             raise ValueError('Input must be a local zip file or GitHub repo URL')
-        for root, _, files in os.walk(self.temp_dir):
+        return self._collect_files()
+
+    async def aextract(self):
+        """Like ``extract``, running git without blocking the event loop and the file work in a thread."""
+        if self.is_repo_url():
+            self.fetcher = fetcher = get_git_fetcher()
+            self.commit = self.commit or await fetcher.aresolve(self.path_or_url)
+            self.temp_dir, self.cached = await fetcher.afetch(self.path_or_url, self.commit)
+            return await asyncio.to_thread(self._collect_files)
+        return await asyncio.to_thread(self.extract)
+
+    def _collect_files(self):
+        for root, dirs, files in os.walk(self.temp_dir):
+            if '.git' in dirs:
+                dirs.remove('.git')
             if '__MACOSX' in root:
                 continue
+            relative_root = os.path.relpath(root, self.temp_dir).replace(os.sep, '/')
+            if relative_root == '.':
+                relative_root = ''
+            if '.gitignore' in files:
+                with open(os.path.join(root, '.gitignore'), encoding='utf-8', errors='replace') as f:
+                    self.selection.add_gitignore(relative_root, f.read())
+            # Pruned directories aren't walked at all.
+            dirs[:] = [d for d in dirs if not self._skip_directory(
+                posixpath.join(relative_root, d), os.path.exists(os.path.join(root, d, VENV_MARKER)))]
             for f in files:
-                if f.endswith(('.py', '.java', '.kt')):
-                    self.file_paths.append(os.path.join(root, f))
+                if f.endswith(SOURCE_EXTENSIONS):
+                    path = os.path.join(root, f)
+                    if not self._skip_file(posixpath.join(relative_root, f), path):
+                        self.file_paths.append(path)
+                        self.bytes_extracted += os.path.getsize(path)
+        # A stable order keeps the analysis of a commit reproducible.
+        self.file_paths.sort()
+        registry.inc('analysis_extracted_bytes_total', self.bytes_extracted)
         return self.file_paths, self.temp_dir
 
+    def is_repo_url(self):
+        return self.path_or_url.startswith('http') and 'github.com' in self.path_or_url
+
+    def extract_changes(self, since_commit):
+        """Check out only the source files changed since ``since_commit``.
+
+        Returns the paths of the added or modified source files, the relative
+        paths of the deleted ones, and the checkout directory. Changed files
+        are selected as by ``extract``; those it skips count as deleted.
+        Raises ``SelectionChanged`` when the selection of the unchanged files
+        may differ too.
+        """
+        if not self.is_repo_url():
+            raise ValueError('Input must be a GitHub repo URL')
+        fetcher = get_git_fetcher()
+        self.commit = self.commit or fetcher.resolve(self.path_or_url)
+        self.temp_dir = tempfile.mkdtemp()
+        changed, deleted = fetcher.checkout_changes(self.path_or_url, self.temp_dir, since_commit, self.commit)
+        return self._collect_changes(changed, deleted)
+
+    async def aextract_changes(self, since_commit):
+        """Like ``extract_changes``, without blocking the event loop while git runs."""
+        if not self.is_repo_url():
+            raise ValueError('Input must be a GitHub repo URL')
+        fetcher = get_git_fetcher()
+        self.commit = self.commit or await fetcher.aresolve(self.path_or_url)
+        self.temp_dir = tempfile.mkdtemp()
+        changed, deleted = await fetcher.acheckout_changes(self.path_or_url, self.temp_dir, since_commit, self.commit)
+        return await asyncio.to_thread(self._collect_changes, changed, deleted)
+
+    def _collect_changes(self, changed, deleted):
+        if any(posixpath.basename(path) in SELECTION_FILES for path in changed + deleted):
+            raise SelectionChanged()
+        # The selection files of the whole commit are checked out with the changed files.
+        ignore_files = []
+        for root, dirs, files in os.walk(self.temp_dir):
+            if '.git' in dirs:
+                dirs.remove('.git')
+            relative_root = os.path.relpath(root, self.temp_dir).replace(os.sep, '/')
+            if relative_root == '.':
+                relative_root = ''
+            if '.gitignore' in files:
+                ignore_files.append(relative_root)
+            if VENV_MARKER in files:
+                self._virtualenvs.add(relative_root)
+        # Parents first, so that nested .gitignore files can override their rules.
+        for directory in sorted(ignore_files, key=lambda directory: (directory != '', directory.count('/'))):
+            path = os.path.join(self.temp_dir, directory, '.gitignore')
+            with open(path, encoding='utf-8', errors='replace') as f:
+                self.selection.add_gitignore(directory, f.read())
+        self.file_paths = []
+        deleted = list(deleted)
+        for path in changed:
+            if self._skip_in_directories(path) or self._skip_file(path, os.path.join(self.temp_dir, path)):
+                # Its components in the previous run, if it had any, are gone.
+                deleted.append(path)
+            else:
+                self.file_paths.append(os.path.join(self.temp_dir, path))
+        self.file_paths.sort()
+        self.bytes_extracted = sum(os.path.getsize(path) for path in self.file_paths)
+        registry.inc('analysis_extracted_bytes_total', self.bytes_extracted)
+        return self.file_paths, deleted, self.temp_dir
+
+    def extract_sources(self):
+        """Read the source files of a zip archive without writing anything to disk.
+
+        Accepts a path to a zip file or a file object such as an upload, and
+        returns ``(member name, bytes)`` pairs for the supported source files.
+        """
+        archive = self.path_or_url
+        if isinstance(archive, str) and not (archive.endswith('.zip') and os.path.exists(archive)):
+            raise ValueError('Input must be a local zip file or a file object')
+        sources = []
+        with ZipFile(archive, 'r') as zip_ref:
+            members = [info for info in zip_ref.infolist()
+                       if not info.is_dir() and '__MACOSX' not in posixpath.dirname(info.filename)]
+            self.selection.root = _archive_root(info.filename for info in members)
+            self._virtualenvs = {posixpath.dirname(info.filename) for info in members
+                                 if posixpath.basename(info.filename) == VENV_MARKER}
+            # Parents' .gitignore files first, so that nested ones can override their rules.
+            ignore_files = [info for info in members if posixpath.basename(info.filename) == '.gitignore']
+            for info in sorted(ignore_files, key=lambda info: info.filename.count('/')):
+                text = zip_ref.read(info).decode('utf-8', errors='replace')
+                self.selection.add_gitignore(posixpath.dirname(info.filename), text)
+            for info in members:
+                if not info.filename.endswith(SOURCE_EXTENSIONS) or self._skip_in_directories(info.filename):
+                    continue
+                if self._skip(info.filename, lambda path: self.selection.file_reason(path, info.file_size)):
+                    continue
+                data = zip_ref.read(info)
+                if not self._skip(info.filename, lambda path: self.selection.content_reason(data)):
+                    sources.append((info.filename, data))
+        self.bytes_extracted = sum(len(data) for _, data in sources)
+        registry.inc('analysis_extracted_bytes_total', self.bytes_extracted)
+        return sources
+
+    def skipped_counts(self):
+        """Return the number of skipped paths by reason."""
+        counts = {}
+        for _, reason in self.skipped:
+            counts[reason] = counts.get(reason, 0) + 1
+        return counts
+
+    def _skip(self, path, check):
+        reason = check(path)
+        if reason is None:
+            return False
+        self.skipped.append((path, reason))
+        registry.inc('analysis_skipped_files_total', reason=reason)
+        return True
+
+    def _skip_directory(self, path, virtualenv):
+        return self._skip(path, lambda path: self.selection.directory_reason(path, virtualenv))
+
+    def _skip_in_directories(self, path):
+        """Return whether a directory containing ``path`` is skipped, recording each directory once."""
+        parts = path.split('/')[:-1]
+        for i in range(1, len(parts) + 1):
+            directory = '/'.join(parts[:i])
+            if directory not in self._directory_reasons:
+                self._directory_reasons[directory] = self._skip_directory(directory, directory in self._virtualenvs)
+            if self._directory_reasons[directory]:
+                return True
+        return False
+
+    def _skip_file(self, path, disk_path):
+        """Return whether the source file at ``path`` is skipped, reading its header only when needed."""
+        size = os.path.getsize(disk_path)
+        if self._skip(path, lambda path: self.selection.file_reason(path, size)):
+            return True
+        with open(disk_path, 'rb') as f:
+            head = f.read(HEADER_BYTES)
+        return self._skip(path, lambda path: self.selection.content_reason(head))
+
     def cleanup(self):
         import shutil
-        shutil.rmtree(self.temp_dir)
+        # Cached checkouts are shared with other requests.
+        if self.temp_dir and self.cached:
+            self.fetcher.release(self.temp_dir)
+        elif self.temp_dir:
+            shutil.rmtree(self.temp_dir)
+        self.temp_dir = None
+        self.cached = False
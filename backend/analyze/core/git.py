@@ -0,0 +1,325 @@
+import asyncio
+import fcntl
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .selection import VENV_MARKER
+
+SPARSE_PATTERNS = ('*.py', '*.java', '*.kt')
+
+# Files that decide which source files are analyzed: .gitignore files and the
+# markers of virtual environments. They are checked out with the source files.
+SELECTION_FILES = ('.gitignore', VENV_MARKER)
+
+# Part of the names of cached checkouts; bumped when they hold other files, so that older ones aren't reused.
+CHECKOUT_VERSION = 2
+
+
+def run_git(*args, cwd=None):
+    result = subprocess.run(['git', *args], cwd=cwd, check=True, capture_output=True, text=True)
+    return result.stdout.strip()
+
+
+async def arun_git(*args, cwd=None):
+    """Like ``run_git``, without blocking the event loop while git runs."""
+    process = await asyncio.create_subprocess_exec(
+        'git', *args, cwd=cwd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, ['git', *args], stdout.decode(), stderr.decode())
+    return stdout.decode().strip()
+
+
+# The git operations are written as generators that yield the ``(args, cwd)``
+# of each git command and are sent its output, or thrown its error, so the
+# same steps run with blocking subprocesses or on an event loop.
+
+def _run_steps(steps):
+    try:
+        args, cwd = next(steps)
+        while True:
+            try:
+                output = run_git(*args, cwd=cwd)
+            except Exception as e:
+                args, cwd = steps.throw(e)
+            else:
+                args, cwd = steps.send(output)
+    except StopIteration as stop:
+        return stop.value
+
+
+async def _arun_steps(steps):
+    try:
+        args, cwd = next(steps)
+        while True:
+            try:
+                output = await arun_git(*args, cwd=cwd)
+            except Exception as e:
+                args, cwd = steps.throw(e)
+            else:
+                args, cwd = steps.send(output)
+    except StopIteration as stop:
+        return stop.value
+
+
+def _sparse_pattern(path):
+    # Anchor the pattern to the exact path and escape gitignore special characters.
+    return '/' + re.sub(r'([*?\[\]\\!#])', r'\\\1', path)
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            try:
+                total += os.path.getsize(os.path.join(root, f))
+            except OSError:
+                pass
+    return total
+
+
+class GitFetcher:
+    """Checks out the source files of a git repository at a single commit.
+
+    The checkout is shallow, blobless and sparse, so only the blobs of the
+    supported source files and of the ``SELECTION_FILES`` are downloaded. With a ``cache_dir`` checkouts are
+    kept keyed by repository URL and commit SHA, and the least recently used
+    ones are evicted once they take up more than ``max_bytes``.
+
+    A cached checkout returned by ``fetch`` is leased until ``release``: a
+    lease file next to it, named after the process, keeps other requests and
+    processes from evicting it while it is analyzed. Leases of processes that
+    died are removed by the next eviction.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=1024 * 1024 * 1024):
+        self.cache_dir = str(cache_dir) if cache_dir else None
+        self.max_bytes = max_bytes
+        # checkout path -> the lease files this fetcher holds on it
+        self.leases = {}
+
+    def resolve(self, url, ref='HEAD'):
+        return _run_steps(self._resolve(url, ref))
+
+    async def aresolve(self, url, ref='HEAD'):
+        return await _arun_steps(self._resolve(url, ref))
+
+    def checkout(self, url, dest, sha):
+        return _run_steps(self._checkout(url, dest, sha))
+
+    def checkout_changes(self, url, dest, old_sha, new_sha):
+        """Check out only the source files changed between two commits.
+
+        Returns the relative paths of the added or modified source files, which
+        are checked out in ``dest`` at ``new_sha`` along with every one of the
+        ``SELECTION_FILES``, and of the deleted ones. Changed selection files
+        are listed too.
+        """
+        return _run_steps(self._checkout_changes(url, dest, old_sha, new_sha))
+
+    async def acheckout_changes(self, url, dest, old_sha, new_sha):
+        return await _arun_steps(self._checkout_changes(url, dest, old_sha, new_sha))
+
+    def fetch(self, url, sha=None):
+        """Check out ``sha`` (the remote HEAD by default) and return ``(path, cached)``.
+
+        Cached checkouts are shared between requests and must not be removed by
+        the caller, who passes them to ``release`` once done with them; uncached
+        ones are temporary directories owned by the caller.
+        """
+        return _run_steps(self._fetch(url, sha))
+
+    async def afetch(self, url, sha=None):
+        return await _arun_steps(self._fetch(url, sha))
+
+    def release(self, path):
+        """Release a lease on the cached checkout ``path``, which may be evicted again once it has none."""
+        leases = self.leases.get(path)
+        if not leases:
+            return
+        lease = leases.pop()
+        if not leases:
+            del self.leases[path]
+        try:
+            os.remove(lease)
+        except OSError:
+            pass
+
+    def _resolve(self, url, ref):
+        output = yield ('ls-remote', url, ref), None
+        if not output:
+            raise ValueError(f'Could not resolve {ref} in {url}')
+        return output.split()[0]
+
+    def _checkout(self, url, dest, sha):
+        yield ('init', '--quiet', dest), None
+        yield ('remote', 'add', 'origin', url), dest
+        yield ('config', 'core.sparseCheckout', 'true'), dest
+        with open(os.path.join(dest, '.git', 'info', 'sparse-checkout'), 'w') as f:
+            f.write('\n'.join(SPARSE_PATTERNS + SELECTION_FILES) + '\n')
+        yield ('fetch', '--quiet', '--depth', '1', '--filter=blob:none', 'origin', sha), dest
+        yield ('checkout', '--quiet', 'FETCH_HEAD'), dest
+
+    def _checkout_changes(self, url, dest, old_sha, new_sha):
+        yield ('init', '--quiet', dest), None
+        yield ('remote', 'add', 'origin', url), dest
+        yield ('config', 'core.sparseCheckout', 'true'), dest
+        yield ('fetch', '--quiet', '--depth', '1', '--filter=blob:none', 'origin', old_sha, new_sha), dest
+        pathspecs = SPARSE_PATTERNS + tuple('*' + name for name in SELECTION_FILES)
+        output = yield ('diff', '--name-status', '--no-renames', '-z', old_sha, new_sha, '--', *pathspecs), dest
+        fields = output.split('\0')
+        changed = []
+        deleted = []
+        for status, path in zip(fields[::2], fields[1::2]):
+            if status == 'D':
+                deleted.append(path)
+            else:
+                changed.append(path)
+        if changed:
+            with open(os.path.join(dest, '.git', 'info', 'sparse-checkout'), 'w') as f:
+                f.write(''.join(_sparse_pattern(path) + '\n' for path in changed))
+                # Without a slash, the patterns match at any depth.
+                f.write(''.join(name + '\n' for name in SELECTION_FILES))
+            yield ('checkout', '--quiet', new_sha), dest
+        return changed, deleted
+
+    def _fetch(self, url, sha):
+        if sha is None:
+            sha = yield from self._resolve(url, 'HEAD')
+        if not self.cache_dir:
+            dest = tempfile.mkdtemp()
+            try:
+                yield from self._checkout(url, dest, sha)
+            except Exception:
+                shutil.rmtree(dest, ignore_errors=True)
+                raise
+            return dest, False
+        entry = self.entry_path(url, sha)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self._locked():
+            if self._lease(entry):
+                self._touch(entry)
+                return entry, True
+        staging = tempfile.mkdtemp(dir=self.cache_dir, prefix='.staging-')
+        try:
+            yield from self._checkout(url, staging, sha)
+            os.rename(staging, entry)
+        except OSError:
+            # Another request finished the same checkout first.
+            shutil.rmtree(staging, ignore_errors=True)
+            if not os.path.isdir(entry):
+                raise
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        with self._locked():
+            if not self._lease(entry):
+                raise FileNotFoundError(f'Checkout {entry} was evicted before it could be used')
+        # Until its size is written the checkout isn't a candidate for eviction.
+        with open(entry + '.size', 'w') as f:
+            f.write(str(_dir_size(entry)))
+        self._evict()
+        return entry, True
+
+    def entry_path(self, url, sha):
+        url_hash = hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f'{url_hash}-{sha}-v{CHECKOUT_VERSION}')
+
+    def _touch(self, entry):
+        try:
+            os.utime(entry + '.size')
+        except OSError:
+            pass
+
+    @contextmanager
+    def _locked(self):
+        """Hold the lock of the cache directory, shared with the other processes using it."""
+        with open(os.path.join(self.cache_dir, '.lock'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _lease(self, entry):
+        """Lease ``entry`` if it is checked out, and return whether it is; called with the lock held."""
+        if not os.path.isdir(entry):
+            return False
+        lease = f'{entry}.lease-{os.getpid()}-{uuid.uuid4().hex}'
+        open(lease, 'w').close()
+        self.leases.setdefault(entry, []).append(lease)
+        return True
+
+    def _evict(self):
+        evicted = []
+        with self._locked():
+            names = os.listdir(self.cache_dir)
+            in_use = set()
+            for name in names:
+                entry, lease, owner = name.partition('.lease-')
+                if not lease:
+                    continue
+                try:
+                    alive = _process_alive(int(owner.split('-')[0]))
+                except ValueError:
+                    alive = False
+                if alive:
+                    in_use.add(os.path.join(self.cache_dir, entry))
+                else:
+                    try:
+                        os.remove(os.path.join(self.cache_dir, name))
+                    except OSError:
+                        pass
+            entries = []
+            for name in names:
+                if not name.endswith('.size'):
+                    continue
+                marker = os.path.join(self.cache_dir, name)
+                try:
+                    with open(marker) as f:
+                        size = int(f.read() or 0)
+                    entries.append((os.path.getmtime(marker), size, marker[:-len('.size')]))
+                except (OSError, ValueError):
+                    continue
+            total = sum(size for _, size, _ in entries)
+            for _, size, entry in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if entry in in_use:
+                    continue
+                # Moved aside under the lock, so that no request leases it from now on.
+                doomed = os.path.join(self.cache_dir, '.evicted-' + uuid.uuid4().hex)
+                try:
+                    os.rename(entry, doomed)
+                    os.remove(entry + '.size')
+                except OSError:
+                    continue
+                evicted.append(doomed)
+                total -= size
+        for doomed in evicted:
+            shutil.rmtree(doomed, ignore_errors=True)
+
+def get_git_fetcher():
+    return GitFetcher(
+        cache_dir=getattr(settings, 'GIT_CACHE_DIR', None),
+        max_bytes=getattr(settings, 'GIT_CACHE_MAX_BYTES', 1024 * 1024 * 1024)
+    )
@@ -0,0 +1,229 @@
+import fnmatch
+import hashlib
+import json
+import posixpath
+import re
+
+from django.conf import settings
+
+# Directories holding third-party code, virtual environments, caches or
+# build output rather than the project's own sources, wherever they are.
+VENDORED_DIRS = {
+    '.venv', 'site-packages', 'dist-packages', 'node_modules', 'bower_components', '.gradle', '.tox', '.nox',
+    '.eggs', '__pycache__', '.mypy_cache', '.pytest_cache', '.idea',
+}
+
+# Names that source packages use too, as in com/acme/build/ or pkg/vendor/:
+# only vendored at the root of the codebase, or anywhere for a directory
+# holding a virtual environment.
+ROOT_VENDORED_DIRS = {'venv', 'env', 'virtualenv', 'vendor', 'third_party', 'third-party', 'build', 'dist', 'target'}
+
+# The file marking a directory as a virtual environment.
+VENV_MARKER = 'pyvenv.cfg'
+
+# Generated sources recognizable from their name, such as protobuf stubs.
+GENERATED_FILES = ('*_pb2.py', '*_pb2_grpc.py')
+
+# Markers that code generators (protoc, Django migrations, OpenAPI and gRPC
+# tools, ...) leave in the comments at the top of the files they write. Only
+# that leading comment block is searched: hand-written code may well mention
+# these phrases in a docstring or a later comment.
+GENERATED_HEADER_RE = re.compile(rb'@generated|DO NOT EDIT|[Aa]uto-?generated|Generated by|Code generated by')
+
+# Bytes at the start of a file checked for a generated-code header.
+HEADER_BYTES = 4096
+
+# Sources with a line longer than this are treated as minified.
+MAX_LINE_LENGTH = 1000
+
+OPTIONS = ('gitignore', 'skip_vendored', 'skip_generated', 'exclude', 'max_file_bytes')
+
+
+def _leading_comments(head):
+    """Return the comment block at the top of a Python, Java or Kotlin file, before its first line of code."""
+    comments = []
+    in_block = False
+    for line in head.split(b'\n'):
+        line = line.strip()
+        if in_block:
+            in_block = b'*/' not in line
+        elif line.startswith(b'/*'):
+            in_block = b'*/' not in line[2:]
+        elif line and not line.startswith((b'#', b'//')):
+            break
+        comments.append(line)
+    return b'\n'.join(comments)
+
+
+def _glob_regex(pattern):
+    """Translate a gitignore glob, where ``*`` stops at slashes and ``**`` doesn't, into a regex."""
+    regex = ''
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith('**/', i):
+            regex += '(?:.*/)?'
+            i += 3
+            continue
+        if pattern.startswith('**', i):
+            regex += '.*'
+            i += 2
+            continue
+        if c == '*':
+            regex += '[^/]*'
+        elif c == '?':
+            regex += '[^/]'
+        elif c == '[' and ']' in pattern[i + 1:]:
+            end = pattern.index(']', i + 1)
+            chars = pattern[i + 1:end].replace('\\', '\\\\')
+            if chars.startswith('!'):
+                chars = '^' + chars[1:]
+            regex += '[' + chars + ']'
+            i = end
+        elif c == '\\' and i + 1 < len(pattern):
+            i += 1
+            regex += re.escape(pattern[i])
+        else:
+            regex += re.escape(c)
+        i += 1
+    return re.compile(regex + r'\Z')
+
+
+def parse_gitignore(text):
+    """Return ``(regex, negated, directories_only)`` rules for the lines of a .gitignore file."""
+    rules = []
+    for line in text.splitlines():
+        line = line.rstrip()
+        if not line or line.startswith('#'):
+            continue
+        negated = line.startswith('!')
+        if negated:
+            line = line[1:]
+        directories_only = line.endswith('/')
+        line = line.rstrip('/')
+        if not line:
+            continue
+        # Patterns without a slash match at any depth, the others from the .gitignore's directory.
+        if '/' not in line:
+            line = '**/' + line
+        rules.append((_glob_regex(line.lstrip('/')), negated, directories_only))
+    return rules
+
+
+class FileSelection:
+    """Decides which files of a codebase are analyzed.
+
+    Skips files matched by the codebase's .gitignore files, vendored and build
+    directories, generated or minified sources, files larger than
+    ``max_file_bytes`` and paths matching the ``exclude`` globs. Each check
+    returns the reason a path is skipped, or None.
+    """
+
+    def __init__(self, gitignore=True, skip_vendored=True, skip_generated=True, exclude=(), max_file_bytes=None):
+        self.gitignore = gitignore
+        self.skip_vendored = skip_vendored
+        self.skip_generated = skip_generated
+        self.exclude = list(getattr(settings, 'ANALYSIS_EXCLUDE', ())) + list(exclude)
+        if max_file_bytes is None:
+            max_file_bytes = getattr(settings, 'ANALYSIS_MAX_FILE_BYTES', 1024 * 1024)
+        self.max_file_bytes = max_file_bytes
+        # (directory, rules) of the .gitignore files seen so far, parents first.
+        self.ignore_files = []
+        # The directory the codebase starts in, e.g. the single top-level directory of an archive.
+        self.root = ''
+
+    @classmethod
+    def from_options(cls, options):
+        """Build a selection from the options of a request, raising ValueError for invalid ones."""
+        if options is None:
+            return cls()
+        if not isinstance(options, dict):
+            raise ValueError('selection must be an object')
+        unknown = set(options) - set(OPTIONS)
+        if unknown:
+            raise ValueError(f"Unknown selection options: {', '.join(sorted(unknown))}")
+        for name in ('gitignore', 'skip_vendored', 'skip_generated'):
+            if not isinstance(options.get(name, True), bool):
+                raise ValueError(f'selection.{name} must be a boolean')
+        exclude = options.get('exclude', [])
+        if not isinstance(exclude, list) or not all(isinstance(p, str) for p in exclude):
+            raise ValueError('selection.exclude must be a list of globs')
+        max_file_bytes = options.get('max_file_bytes')
+        if max_file_bytes is not None and (not isinstance(max_file_bytes, int) or max_file_bytes < 0):
+            raise ValueError('selection.max_file_bytes must be a non-negative integer')
+        return cls(**options)
+
+    def options(self):
+        """Return the settings of this selection, e.g. to tell apart results of different selections."""
+        return {
+            'gitignore': self.gitignore,
+            'skip_vendored': self.skip_vendored,
+            'skip_generated': self.skip_generated,
+            'exclude': self.exclude,
+            'max_file_bytes': self.max_file_bytes,
+        }
+
+    def key(self):
+        """Return a hash of ``options``: two runs with the same key analyzed the same files of a commit."""
+        return hashlib.sha256(json.dumps(self.options(), sort_keys=True).encode('utf-8')).hexdigest()
+
+    def add_gitignore(self, directory, text):
+        """Apply the rules of the .gitignore file in ``directory``, relative to the codebase root."""
+        if self.gitignore:
+            self.ignore_files.append((directory, parse_gitignore(text)))
+
+    def _ignored(self, path, is_directory):
+        ignored = False
+        for directory, rules in self.ignore_files:
+            if directory and not path.startswith(directory + '/'):
+                continue
+            relative = path[len(directory) + 1:] if directory else path
+            # As in git, the last matching rule wins.
+            for regex, negated, directories_only in rules:
+                if (is_directory or not directories_only) and regex.match(relative):
+                    ignored = not negated
+        return ignored
+
+    def _excluded(self, path):
+        return any(fnmatch.fnmatchcase(path, pattern) for pattern in self.exclude)
+
+    def directory_reason(self, path, virtualenv=False):
+        """Return why the directory at ``path`` is skipped with everything in it, or None.
+
+        ``virtualenv`` tells whether the directory holds a ``VENV_MARKER``.
+        """
+        if self._ignored(path, True):
+            return 'gitignore'
+        if self.skip_vendored:
+            parent, name = posixpath.split(path)
+            if name in VENDORED_DIRS or virtualenv:
+                return 'vendored'
+            if name in ROOT_VENDORED_DIRS and parent == self.root:
+                return 'vendored'
+        if self._excluded(path) or self._excluded(path + '/'):
+            return 'excluded'
+        return None
+
+    def file_reason(self, path, size):
+        """Return why the file at ``path`` is skipped judging by its path and size, or None."""
+        if self._ignored(path, False):
+            return 'gitignore'
+        if self._excluded(path):
+            return 'excluded'
+        if self.max_file_bytes and size > self.max_file_bytes:
+            return 'too_large'
+        name = posixpath.basename(path)
+        if self.skip_generated and any(fnmatch.fnmatchcase(name, pattern) for pattern in GENERATED_FILES):
+            return 'generated'
+        return None
+
+    def content_reason(self, head):
+        """Return 'generated' when the first ``HEADER_BYTES`` of a file look generated or minified."""
+        if not self.skip_generated:
+            return None
+        head = head[:HEADER_BYTES]
+        if GENERATED_HEADER_RE.search(_leading_comments(head)):
+            return 'generated'
+        if any(len(line) > MAX_LINE_LENGTH for line in head.split(b'\n')):
+            return 'generated'
+        return None
@@ -0,0 +1,172 @@
+import time
+
+from asgiref.sync import sync_to_async
+
+from .metrics import registry
+
+
+class Stage:
+    """Times one pipeline stage and builds its start and end events."""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+
+    def running(self):
+        return {'event': 'stage', 'stage': self.name, 'status': 'running'}
+
+    def done(self, **info):
+        seconds = time.perf_counter() - self.started
+        registry.observe('analysis_stage_seconds', seconds, stage=self.name)
+        info['seconds'] = round(seconds, 3)
+        return {'event': 'stage', 'stage': self.name, 'status': 'done', **info}
+
+
+def run_events(events, on_stage=None):
+    """Run a pipeline event generator to completion and return its questions.
+
+    Stage events are reported as ``on_stage(stage, status, info)``.
+    """
+    while True:
+        try:
+            event = next(events)
+        except StopIteration as stop:
+            return stop.value
+        if on_stage and event['event'] == 'stage':
+            info = {k: v for k, v in event.items() if k not in ('event', 'stage', 'status')}
+            on_stage(event['stage'], event['status'], info)
+
+
+async def arun_events(events, on_stage=None):
+    """Like ``run_events`` for an async iterator of events, returning the questions it streamed."""
+    questions = []
+    async for event in events:
+        if event['event'] == 'question':
+            questions.append(event['question'])
+        elif on_stage and event['event'] == 'stage':
+            info = {k: v for k, v in event.items() if k not in ('event', 'stage', 'status')}
+            on_stage(event['stage'], event['status'], info)
+    return questions
+
+
+# Besides events, the pipeline generators yield the steps that wait on git or
+# on the LLM: ``Extract`` and ``Generate``. ``iter_steps`` runs them with
+# blocking calls, while ``aiter_steps`` awaits them on the event loop and
+# advances the generator itself in a thread, so the sync and async pipelines
+# share every stage and only differ in how they wait. The generator is sent
+# the result of each step, or thrown its error.
+
+
+class Extract:
+    """Check out the files of ``extractor``, only those changed since ``since_commit`` when given.
+
+    Results in what ``extract`` or ``extract_changes`` returns.
+    """
+
+    def __init__(self, extractor, since_commit=None):
+        self.extractor = extractor
+        self.since_commit = since_commit
+
+    def run(self):
+        if self.since_commit is None:
+            return self.extractor.extract()
+        return self.extractor.extract_changes(self.since_commit)
+
+    async def arun(self):
+        if self.since_commit is None:
+            return await self.extractor.aextract()
+        return await self.extractor.aextract_changes(self.since_commit)
+
+
+class Generate:
+    """Ask an ``LLMQuestionGenerator`` questions about ``summaries``.
+
+    Each question is streamed as a question event, and the step results in
+    the list of them.
+    """
+
+    def __init__(self, generator, summaries, **options):
+        self.generator = generator
+        self.summaries = summaries
+        self.options = options
+
+    def run(self):
+        return self.generator.iter_generate(self.summaries, **self.options)
+
+    async def arun(self):
+        summaries = self.summaries
+        if not isinstance(summaries, list):
+            # Reading a component store is blocking SQLite work, kept off the event loop.
+            summaries = await sync_to_async(list)(summaries)
+        async for question in self.generator.aiter_generate(summaries, **self.options):
+            yield question
+
+
+def _advance(steps, value, error):
+    # StopIteration can't cross into a coroutine, so it's turned into a flag.
+    try:
+        return False, steps.throw(error) if error is not None else steps.send(value)
+    except StopIteration as stop:
+        return True, stop.value
+
+
+def iter_steps(steps):
+    """Run the steps of a pipeline generator, yielding its events and returning its questions."""
+    value = error = None
+    try:
+        while True:
+            done, step = _advance(steps, value, error)
+            if done:
+                return step
+            value = error = None
+            if isinstance(step, Extract):
+                try:
+                    value = step.run()
+                except Exception as e:
+                    error = e
+            elif isinstance(step, Generate):
+                value = []
+                try:
+                    for question in step.run():
+                        value.append(question)
+                        yield {'event': 'question', 'question': question}
+                except Exception as e:
+                    error = e
+            else:
+                yield step
+    finally:
+        # Also reached when a streaming client disconnects, to clean up after the steps.
+        steps.close()
+
+
+async def aiter_steps(steps):
+    """Like ``iter_steps``, as an async generator of events that doesn't block the event loop.
+
+    Each step of the generator runs through ``sync_to_async``, in the thread
+    Django keeps for the request, so parsing and database work don't block
+    other requests.
+    """
+    value = error = None
+    try:
+        while True:
+            done, step = await sync_to_async(_advance)(steps, value, error)
+            if done:
+                return
+            value = error = None
+            if isinstance(step, Extract):
+                try:
+                    value = await step.arun()
+                except Exception as e:
+                    error = e
+            elif isinstance(step, Generate):
+                value = []
+                try:
+                    async for question in step.arun():
+                        value.append(question)
+                        yield {'event': 'question', 'question': question}
+                except Exception as e:
+                    error = e
+            else:
+                yield step
+    finally:
+        await sync_to_async(steps.close)()
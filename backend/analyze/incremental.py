@@ -0,0 +1,83 @@
+import heapq
+import os
+import subprocess
+from itertools import groupby
+
+from .analysis.code_analyzer import ANALYZER_VERSION
+from .analysis.parallel import iter_analyze_files
+from .analysis.records import ComponentRecord
+from .core.codebase import SelectionChanged
+from .events import Extract, Stage
+from .models import AnalysisRun
+
+
+def find_previous_run(source, selection):
+    """Return the latest stored run of ``source`` that recorded its commit, with files picked by ``selection``.
+
+    A run of another selection analyzed other files, and one of another
+    ``ANALYZER_VERSION`` extracted other components, so reusing their
+    components wouldn't give the result of a full analysis.
+    """
+    return (AnalysisRun.objects.filter(repository__source=source, selection=selection.key(),
+                                       analyzer_version=ANALYZER_VERSION)
+            .exclude(commit='')
+            .order_by('-created_at', '-id')
+            .first())
+
+
+def iter_analyze_changes(extractor, previous_run):
+    """Fetch only the files changed since ``previous_run``.
+
+    Yields the events and the ``Extract`` step of the extract stage, and
+    returns the components of the new commit as a ``ChangedComponents``, or
+    None when the previous commit can't be compared with the new one, e.g.
+    after a force push, or when a change may select other files.
+    """
+    stage = Stage('extract')
+    yield stage.running()
+    try:
+        files, deleted, temp_dir = yield Extract(extractor, previous_run.commit)
+    except (subprocess.CalledProcessError, SelectionChanged):
+        extractor.cleanup()
+        return None
+    yield stage.done(files=len(files), deleted=len(deleted), bytes=extractor.bytes_extracted,
+                     skipped=extractor.skipped_counts(), incremental=True)
+    return ChangedComponents(previous_run, files, deleted, temp_dir)
+
+
+class ChangedComponents:
+    """The components of a new commit, one list per file, analyzing only the changed files.
+
+    The stored components of the other files are reused from the previous run.
+    Iterating matches a full analysis of the new commit: files come in path
+    order, each with its components in their own order. Runs store their
+    components in file order, so both sources are merged lazily.
+    """
+
+    def __init__(self, previous_run, files, deleted, temp_dir):
+        self.previous_run = previous_run
+        self.files = files
+        self.temp_dir = temp_dir
+        self.stale = {os.path.relpath(path, temp_dir) for path in files}
+        self.stale.update(deleted)
+        stored = set(previous_run.components.values_list('file', flat=True).distinct())
+        self.reused_files = len(stored - self.stale)
+        self.reused = 0
+
+    def __len__(self):
+        return len(self.files) + self.reused_files
+
+    def __iter__(self):
+        analyzed = zip((os.path.relpath(path, self.temp_dir) for path in self.files),
+                       iter_analyze_files(self.files, temp_dir=self.temp_dir))
+        for _, components in heapq.merge(analyzed, self._reused(), key=lambda group: group[0]):
+            yield components
+
+    def _reused(self):
+        stored = self.previous_run.components.order_by('id').iterator()
+        for file, group in groupby(stored, key=lambda c: c.file):
+            if file in self.stale:
+                continue
+            components = [ComponentRecord.from_model(c) for c in group]
+            self.reused += len(components)
+            yield file, components
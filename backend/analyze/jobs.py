@@ -0,0 +1,109 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .core.selection import FileSelection
+from .models import AnalysisBatch, AnalysisJob
+from .pipeline import analyze_sources, analyze_url
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'ANALYSIS_JOB_WORKERS', 2),
+                thread_name_prefix='analysis-job'
+            )
+    return _executor
+
+
+class JobProgress:
+    """Stage callback that records the progress of a job in the database."""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.stages = {}
+
+    def __call__(self, stage, status, info):
+        self.stages[stage] = {'status': status, **info}
+        _update_job(self.job_id, stage=stage, stages=self.stages)
+
+
+def _update_job(job_id, retries=5, **fields):
+    # SQLite can report the table as locked while a status poll is reading it.
+    for attempt in range(retries):
+        try:
+            return AnalysisJob.objects.filter(pk=job_id).update(updated_at=timezone.now(), **fields)
+        except OperationalError:
+            if attempt == retries - 1:
+                raise
+            time.sleep(0.05 * (attempt + 1))
+
+
+def _run_job(job_id, func, args, kwargs):
+    close_old_connections()
+    try:
+        _update_job(job_id, status=AnalysisJob.RUNNING)
+        try:
+            questions = func(*args, on_stage=JobProgress(job_id), **kwargs)
+        except Exception as e:
+            _update_job(job_id, status=AnalysisJob.FAILED, error=str(e))
+        else:
+            _update_job(job_id, status=AnalysisJob.SUCCEEDED, result=questions)
+    finally:
+        connection.close()
+
+
+def _submit(source, func, *args, batch=None, **kwargs):
+    job = AnalysisJob.objects.create(source=source[:255], batch=batch)
+    # Only hand the job to a worker once its row is visible to other connections.
+    transaction.on_commit(lambda: get_executor().submit(_run_job, job.pk, func, args, kwargs))
+    return job
+
+
+def submit_url_job(url, use_llm=False, focus=None, openai_api_key=None, use_cache=True, selection=None):
+    return _submit(url, analyze_url, url, use_llm=use_llm, focus=focus, openai_api_key=openai_api_key,
+                   use_cache=use_cache, selection=selection)
+
+
+def submit_sources_job(name, sources, use_llm=False, focus=None, openai_api_key=None, use_cache=True, skipped=None):
+    return _submit(name, analyze_sources, name, sources, use_llm=use_llm, focus=focus,
+                   openai_api_key=openai_api_key, use_cache=use_cache, skipped=skipped)
+
+
+def submit_batch(urls=(), archives=(), use_llm=False, focus=None, openai_api_key=None, use_cache=True,
+                 selection=None):
+    """Submit one job per distinct repository URL and archive, grouped in a batch.
+
+    ``archives`` are ``(name, content hash, sources, skipped)`` tuples and
+    ``selection`` the file selection options of the URLs. A
+    repeated URL, or an archive with the same content as an earlier one,
+    shares the job of its first occurrence. The jobs run on the shared job
+    pool; files found in several codebases are parsed once through the parse
+    cache, which is keyed by content. Returns the batch and the job of each
+    item, URLs first.
+    """
+    batch = AnalysisBatch.objects.create()
+    jobs = {}
+    items = []
+    for url in urls:
+        if url not in jobs:
+            # Each repository gets its own selection, which collects its .gitignore rules.
+            jobs[url] = _submit(url, analyze_url, url, batch=batch, use_llm=use_llm, focus=focus,
+                                openai_api_key=openai_api_key, use_cache=use_cache,
+                                selection=None if selection is None else FileSelection.from_options(selection))
+        items.append(jobs[url])
+    for name, digest, sources, skipped in archives:
+        if digest not in jobs:
+            jobs[digest] = _submit(name, analyze_sources, name, sources, batch=batch, use_llm=use_llm, focus=focus,
+                                   openai_api_key=openai_api_key, use_cache=use_cache, skipped=skipped)
+        items.append(jobs[digest])
+    return batch, items
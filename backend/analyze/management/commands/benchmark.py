@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...benchmarks.runner import (
+    BASELINE_PATH, SIZES, STAGES, compare, load_baseline, run_benchmarks, save_baseline, synthetic_codebase,
+)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the analysis pipeline on a synthetic codebase and compare it with the saved baseline.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', choices=sorted(SIZES), default='small')
+        parser.add_argument('--files', type=int)
+        parser.add_argument('--classes', type=int, help='Classes per file')
+        parser.add_argument('--methods', type=int, help='Methods per class')
+        parser.add_argument('--docstring-words', type=int)
+        parser.add_argument('--languages', help='Comma-separated subset of python,java,kotlin')
+        parser.add_argument('--stage', action='append', choices=STAGES, help='Only run this stage (repeatable)')
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--baseline', default=BASELINE_PATH)
+        parser.add_argument('--tolerance', type=float, default=0.5,
+                            help='Allowed slowdown or memory growth over the baseline, as a fraction')
+        parser.add_argument('--save-baseline', action='store_true', help='Record this run as the baseline')
+
+    def handle(self, *args, **options):
+        languages = options['languages'].split(',') if options['languages'] else None
+        codebase = synthetic_codebase(
+            options['size'], files=options['files'], classes=options['classes'], methods=options['methods'],
+            docstring_words=options['docstring_words'], languages=languages
+        )
+        report = run_benchmarks(codebase, repeat=options['repeat'], stages=options['stage'] or STAGES)
+        self.stdout.write(f"{report['options']['files']} files, {report['components']} components")
+        for stage, result in report['results'].items():
+            self.stdout.write(f"{stage:<12} {result['seconds']:>9.4f}s {result['peak_bytes'] / 1024 / 1024:>9.1f} MiB")
+
+        baselines = load_baseline(options['baseline'])
+        if options['save_baseline']:
+            baselines[options['size']] = report
+            save_baseline(baselines, options['baseline'])
+            self.stdout.write(f"Saved the {options['size']} baseline to {options['baseline']}")
+            return
+        baseline = baselines.get(options['size'])
+        if not baseline or baseline['options'] != report['options']:
+            self.stdout.write(f"No {options['size']} baseline recorded for these options to compare with")
+            return
+        regressions = compare(report, baseline, tolerance=options['tolerance'])
+        if regressions:
+            raise CommandError('Regressions against the baseline:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
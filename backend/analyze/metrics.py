@@ -0,0 +1,103 @@
+import bisect
+import threading
+
+# Upper bounds in seconds of the stage duration histogram buckets, from a
+# cached parse up to a slow clone or LLM request.
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+METRICS = {
+    'analysis_stage_seconds': ('histogram', 'Duration of analysis pipeline stages.'),
+    'analysis_files_total': ('counter', 'Source files analyzed, by language.'),
+    'analysis_components_total': ('counter', 'Components extracted, by language.'),
+    'analysis_parse_failures_total': ('counter', 'Source files that failed to parse, by language.'),
+    'analysis_parse_fallbacks_total': ('counter', 'Source files analyzed by the fallback extractor, by language and reason.'),
+    'analysis_parse_cache_lookups_total': ('counter', 'Parse cache lookups, by language and result (hit or miss).'),
+    'analysis_skipped_files_total': ('counter', 'Files and directories left out of analysis, by reason.'),
+    'analysis_extracted_bytes_total': ('counter', 'Bytes of source files extracted from archives and repositories.'),
+}
+
+
+class MetricsRegistry:
+    """In-process counters and histograms rendered in the Prometheus text format.
+
+    Recording a value is a dict update under a lock, cheap enough to leave on
+    for every request. Each process keeps its own values.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        index = bisect.bisect_left(STAGE_BUCKETS, value)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                # One count per bucket plus +Inf, then the sum of the observed values.
+                histogram = self.histograms[key] = [0] * (len(STAGE_BUCKETS) + 1) + [0.0]
+            histogram[index] += 1
+            histogram[-1] += value
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def render(self):
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = {key: list(values) for key, values in self.histograms.items()}
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'counter':
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f'{name}{_labels(labels)} {_number(value)}')
+                continue
+            for (metric, labels), values in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(STAGE_BUCKETS + ('+Inf',), values):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_labels(labels + (("le", str(bound)),))} {cumulative}')
+                lines.append(f'{name}_sum{_labels(labels)} {_number(values[-1])}')
+                lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in labels)
+    return '{' + pairs + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class ServerTiming:
+    """Stage callback collecting stage durations for a ``Server-Timing`` response header."""
+
+    def __init__(self):
+        self.stages = []
+
+    def __call__(self, stage, status, info):
+        if status == 'done':
+            self.stages.append((stage, info['seconds']))
+
+    def header(self):
+        return ', '.join(f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in self.stages)
+
+
+registry = MetricsRegistry()
@@ -1,6 +1,49 @@
+import uuid
+
 from django.db import models
 
+class Repository(models.Model):
+    source = models.CharField(max_length=255, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.source
+
+    class Meta:
+        verbose_name = "Repository"
+        verbose_name_plural = "Repositories"
+
+class AnalysisRun(models.Model):
+    repository = models.ForeignKey(Repository, related_name='runs', on_delete=models.CASCADE)
+    commit = models.CharField(max_length=64, blank=True)
+    # FileSelection.key() of the selection the run's files were picked with.
+    selection = models.CharField(max_length=64, blank=True)
+    # The ANALYZER_VERSION the run's components were extracted with.
+    analyzer_version = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # The serialized CrossReferenceIndex of the run's components.
+    xref = models.BinaryField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Run {self.pk} of {self.repository}"
+
+    def to_dict(self):
+        return {
+            'id': self.pk,
+            'repository': self.repository.source,
+            'commit': self.commit,
+            'created_at': self.created_at.isoformat(),
+        }
+
+    class Meta:
+        verbose_name = "Analysis run"
+        verbose_name_plural = "Analysis runs"
+        indexes = [
+            models.Index(fields=['repository', 'created_at']),
+        ]
+
 class Component(models.Model):
+    run = models.ForeignKey(AnalysisRun, related_name='components', on_delete=models.CASCADE, null=True)
     name = models.CharField(max_length=255)
     type = models.CharField(max_length=50)
     file = models.CharField(max_length=255)
@@ -8,15 +51,37 @@ class Component(models.Model):
     lineno = models.IntegerField()
     docstring = models.TextField(blank=True, null=True)
     parameters = models.JSONField(blank=True, null=True)
+    references = models.JSONField(blank=True, null=True)
+    # The component's id in the cross-reference index of its run.
+    symbol = models.IntegerField(blank=True, null=True)
 
     def __str__(self):
         return f"{self.type}: {self.name} ({self.file}:{self.lineno})"
 
+    def to_dict(self):
+        return {
+            'id': self.pk,
+            'type': self.type,
+            'name': self.name,
+            'file': self.file,
+            'full_name': self.full_name,
+            'lineno': self.lineno,
+            'docstring': self.docstring,
+            'parameters': self.parameters,
+            'references': self.references,
+        }
+
     class Meta:
         verbose_name = "Component"
         verbose_name_plural = "Components"
+        indexes = [
+            models.Index(fields=['run', 'file']),
+            models.Index(fields=['run', 'symbol']),
+            models.Index(fields=['full_name']),
+        ]
 
 class Question(models.Model):
+    run = models.ForeignKey(AnalysisRun, related_name='questions', on_delete=models.CASCADE, null=True)
     question = models.TextField()
     answer = models.TextField()
     difficulty = models.CharField(max_length=32)
@@ -26,6 +91,89 @@ class Question(models.Model):
     def __str__(self):
         return f"{self.difficulty.capitalize()} Q: {self.question[:40]}..."
 
+    def to_dict(self):
+        return {
+            'question': self.question,
+            'answer': self.answer,
+            'difficulty': self.difficulty,
+            'component': self.component,
+            'type': self.type,
+        }
+
     class Meta:
         verbose_name = "Question"
         verbose_name_plural = "Questions"
+        indexes = [
+            models.Index(fields=['difficulty']),
+        ]
+
+class AnalysisBatch(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Batch {self.id}"
+
+    def to_dict(self):
+        jobs = list(self.jobs.order_by('created_at'))
+        counts = {}
+        for job in jobs:
+            counts[job.status] = counts.get(job.status, 0) + 1
+        finished = counts.get(AnalysisJob.SUCCEEDED, 0) + counts.get(AnalysisJob.FAILED, 0)
+        return {
+            'id': str(self.id),
+            'status': 'done' if finished == len(jobs) else 'running',
+            'counts': counts,
+            'created_at': self.created_at.isoformat(),
+            'jobs': [job.to_dict() for job in jobs],
+        }
+
+    class Meta:
+        verbose_name = "Analysis batch"
+        verbose_name_plural = "Analysis batches"
+
+class AnalysisJob(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    batch = models.ForeignKey(AnalysisBatch, related_name='jobs', on_delete=models.CASCADE, null=True, blank=True)
+    source = models.CharField(max_length=255)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    stage = models.CharField(max_length=32, blank=True)
+    stages = models.JSONField(default=dict)
+    result = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Job {self.id} ({self.status}): {self.source}"
+
+    def to_dict(self):
+        data = {
+            'id': str(self.id),
+            'source': self.source,
+            'status': self.status,
+            'stage': self.stage,
+            'stages': self.stages,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat(),
+        }
+        if self.status == self.SUCCEEDED:
+            data['questions'] = self.result
+        if self.status == self.FAILED:
+            data['error'] = self.error
+        return data
+
+    class Meta:
+        verbose_name = "Analysis job"
+        verbose_name_plural = "Analysis jobs"
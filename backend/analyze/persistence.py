@@ -0,0 +1,130 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+
+from .analysis.code_analyzer import ANALYZER_VERSION
+from .analysis.xref import CrossReferenceBuilder
+from .models import AnalysisRun, Component, Question, Repository
+from .store import ComponentStore
+
+
+def _batches(items, batch_size):
+    items = iter(items)
+    while True:
+        batch = list(islice(items, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class RunWriter:
+    """Stores the components of one analysis of ``source`` as they are produced.
+
+    Components are inserted with ``bulk_create`` in batches of ``batch_size``
+    so that only one batch of model instances exists at a time. The run only
+    gets its commit when ``finish`` stores the questions, so an unfinished run
+    is never used as the base of an incremental analysis; ``discard`` deletes
+    a run that failed.
+
+    Components are numbered in the order they are added, which makes their
+    symbols in the cross-reference index returned by ``build_index``. The
+    index is built from ``store`` when the components are also added to a
+    ``store.ComponentStore``, rather than from a copy kept in memory.
+    Otherwise the symbol table is kept in memory until it holds more than
+    ``spill_size`` components, and then moved to a ``ComponentStore`` of its
+    own, so that memory stays bounded however large the codebase.
+    """
+
+    def __init__(self, source, batch_size=None, store=None, spill_size=None):
+        if batch_size is None:
+            batch_size = getattr(settings, 'ANALYSIS_PERSIST_BATCH_SIZE', 1000)
+        if spill_size is None:
+            spill_size = getattr(settings, 'ANALYSIS_SYMBOL_TABLE_SPILL', 20000)
+        self.batch_size = batch_size
+        self.spill_size = spill_size
+        self.spilled = None
+        self.pending = []
+        self.stored = 0
+        self.added = 0
+        self.store = store
+        self.xref = CrossReferenceBuilder(store)
+        self.index = None
+        repository, _ = Repository.objects.get_or_create(source=source[:255])
+        self.run = AnalysisRun.objects.create(repository=repository)
+
+    def add(self, components):
+        """Queue ``components`` for storage and return the symbol of the first one."""
+        symbol = self.added
+        self.added += len(components)
+        if self.store is None:
+            self.xref.add(components)
+            if self.spilled is None and len(self.xref) > self.spill_size:
+                self._spill()
+        self.pending += components
+        while len(self.pending) >= self.batch_size:
+            self._flush(self.pending[:self.batch_size])
+            self.pending = self.pending[self.batch_size:]
+        return symbol
+
+    def build_index(self):
+        """Resolve the references of every component added into a ``CrossReferenceIndex``."""
+        self.index = self.xref.build()
+        self.xref = None
+        self._close_spilled()
+        return self.index
+
+    @transaction.atomic
+    def finish(self, questions, commit='', selection=''):
+        self._flush(self.pending)
+        self.pending = []
+        for batch in _batches(questions, self.batch_size):
+            Question.objects.bulk_create([
+                Question(
+                    run=self.run,
+                    question=q.get('question', ''),
+                    answer=q.get('answer', ''),
+                    difficulty=q.get('difficulty', ''),
+                    component=q.get('component', ''),
+                    type=q.get('type', '')
+                )
+                for q in batch
+            ])
+        if self.xref is not None:
+            self.build_index()
+        self.run.xref = self.index.to_bytes()
+        self.run.commit = commit
+        self.run.selection = selection
+        self.run.analyzer_version = ANALYZER_VERSION
+        self.run.save(update_fields=['commit', 'selection', 'analyzer_version', 'xref'])
+        return self.run
+
+    def discard(self):
+        self._close_spilled()
+        self.run.delete()
+
+    def _spill(self):
+        self.spilled = ComponentStore(getattr(settings, 'ANALYSIS_COMPONENT_STORE_DIR', None), terms=False)
+        self.spilled.add_symbols(self.xref.symbols)
+        self.xref = CrossReferenceBuilder(self.spilled)
+
+    def _close_spilled(self):
+        if self.spilled is not None:
+            self.spilled.close()
+            self.spilled = None
+
+    def _flush(self, components):
+        if components:
+            Component.objects.bulk_create([
+                c.to_model(run=self.run, symbol=self.stored + i) for i, c in enumerate(components)
+            ])
+            self.stored += len(components)
+
+
+@transaction.atomic
+def save_run(source, components, questions, commit='', batch_size=None):
+    """Store the components and questions of one analysis of ``source``."""
+    writer = RunWriter(source, batch_size=batch_size)
+    for batch in _batches(components, writer.batch_size):
+        writer.add(batch)
+    return writer.finish(questions, commit=commit)
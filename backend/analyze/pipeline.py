@@ -0,0 +1,232 @@
+from django.conf import settings
+
+from .analysis.parallel import iter_analyze_files
+from .core.codebase import CodebaseExtractor
+from .events import Extract, Generate, Stage, aiter_steps, arun_events, iter_steps, run_events
+from .incremental import ChangedComponents, iter_analyze_changes, find_previous_run
+from .persistence import RunWriter
+from .store import ComponentStore
+from .summarization.summarizer import ComponentSummarizer
+from .questions.question_generator import ComponentSelector, LLMQuestionGenerator
+from .questions.question_generator import RuleBasedQuestionGenerator
+
+# The pipeline is written as generators of progress events, so the same code
+# serves callers that just want the questions (run_events) and the streaming
+# endpoints. Events are dicts with an 'event' key:
+#   {'event': 'stage', 'stage': ..., 'status': 'running' | 'done', ...counters}
+#   {'event': 'progress', 'stage': 'analyze', 'done': n, 'total': m}
+#   {'event': 'question', 'question': {...}}
+# The stages themselves are the ``_*_steps`` generators, which also yield the
+# steps waiting on git or the LLM; the sync generators run them with
+# ``iter_steps`` and return the list of generated questions, the async ones
+# with ``aiter_steps``.
+
+
+class NoSourceFilesError(ValueError):
+    pass
+
+
+def iter_analyze_codebase(files, temp_dir, **options):
+    return (yield from iter_steps(_components_steps(iter_analyze_files(files, temp_dir=temp_dir), len(files),
+                                                    **options)))
+
+
+def iter_analyze_components(groups, total, **options):
+    """Summarize, store and ask questions about ``groups``, the component lists of ``total`` files.
+
+    A stored run records its ``commit`` and the key of the file ``selection``
+    of the repository, which make it a base for incremental analyses.
+
+    The files are consumed in one pass: each file's components are summarized
+    and handed to the question selection as soon as they are analyzed, and
+    stored in batches, so memory doesn't grow with the codebase. Only LLM
+    generation keeps every summary, since they all go into its prompt, focus
+    search the matching components and the cross-reference index what it
+    resolves references with. When ``ANALYSIS_COMPONENT_STORE`` is 'disk',
+    they all read the components from a ``ComponentStore`` on disk instead.
+    """
+    return (yield from iter_steps(_components_steps(groups, total, **options)))
+
+
+async def aiter_analyze_components(groups, total, **options):
+    """Like ``iter_analyze_components``, as an async generator of events.
+
+    Parsing and database work are advanced off the event loop, and LLM
+    questions come from the async OpenAI client, so one process can serve
+    many analyses that are mostly waiting on git or the LLM.
+    """
+    async for event in aiter_steps(_components_steps(groups, total, **options)):
+        yield event
+
+
+def _components_steps(groups, total, use_llm=False, focus=None, openai_api_key=None, source=None, commit='',
+                      use_cache=True, selection=''):
+    store = ComponentStore.from_settings()
+    writer = RunWriter(source, store=store) if source and _persist_results() else None
+    try:
+        selected, xref = yield from _iter_analyze(groups, total, writer, use_llm, focus, store)
+
+        stage = Stage('generate')
+        yield stage.running()
+        if use_llm:
+            llm_gen = LLMQuestionGenerator(openai_api_key=openai_api_key)
+            questions = yield Generate(llm_gen, selected, focus=focus, use_cache=use_cache)
+        else:
+            questions = []
+            for question in RuleBasedQuestionGenerator.questions(selected, xref):
+                questions.append(question)
+                yield {'event': 'question', 'question': question}
+        yield stage.done(questions=len(questions))
+
+        if writer is not None:
+            yield from _iter_persist(writer, questions, commit, selection)
+        return questions
+    except BaseException:
+        # Also reached when a streaming client disconnects and the steps are closed.
+        if writer is not None:
+            writer.discard()
+        raise
+    finally:
+        if store is not None:
+            store.close()
+
+
+def _iter_analyze(groups, total, writer, use_llm, focus, store=None):
+    """Run the analyze stage and return what question generation needs.
+
+    That is every summary for the LLM, or the components picked by a
+    ``ComponentSelector`` for the rule-based questions, and the cross-reference
+    index of the components when they are stored, None otherwise. Summaries
+    then have the ``symbol`` of their component in the index.
+
+    With a ``store``, components are only written to it while files are
+    analyzed, and summarized when read back for question generation, which
+    picks the same components as from memory.
+    """
+    stage = Stage('analyze')
+    yield stage.running()
+    # About a hundred progress events at most, however large the codebase.
+    step = max(1, total // 100)
+    selector = None if use_llm else ComponentSelector(focus, store=store)
+    summaries = []
+    count = 0
+    for done, components in enumerate(groups, 1):
+        count += len(components)
+        symbol = writer.add(components) if writer is not None else None
+        if store is not None:
+            store.add(components)
+        else:
+            for summary in ComponentSummarizer.iter_summarize(components):
+                if symbol is not None:
+                    summary['symbol'] = symbol
+                    symbol += 1
+                if selector is not None:
+                    selector.add(summary)
+                else:
+                    summaries.append(summary)
+        if done % step == 0 or done == total:
+            yield {'event': 'progress', 'stage': 'analyze', 'done': done, 'total': total}
+    if store is not None:
+        store.flush()
+        if selector is not None:
+            for summary in store:
+                selector.add(summary)
+        else:
+            summaries = store
+    info = {'reused': groups.reused} if isinstance(groups, ChangedComponents) else {}
+    xref = writer.build_index() if writer is not None else None
+    yield stage.done(files=total, components=count, **info)
+    return (summaries if selector is None else selector.selected()), xref
+
+
+def _iter_persist(writer, questions, commit, selection):
+    stage = Stage('persist')
+    yield stage.running()
+    run = writer.finish(questions, commit=commit, selection=selection)
+    yield stage.done(run=run.pk)
+
+
+def iter_analyze_sources(name, sources, skipped=None, **options):
+    return (yield from iter_steps(_sources_steps(name, sources, skipped, **options)))
+
+
+async def aiter_analyze_sources(name, sources, skipped=None, **options):
+    async for event in aiter_steps(_sources_steps(name, sources, skipped, **options)):
+        yield event
+
+
+def _sources_steps(name, sources, skipped, **options):
+    # The archive is read while handling the upload, so extraction is already done;
+    # ``skipped`` are the extractor's skipped_counts().
+    stage = Stage('extract')
+    yield stage.running()
+    yield stage.done(files=len(sources), bytes=sum(len(data) for _, data in sources), skipped=skipped or {})
+    return (yield from _components_steps(iter_analyze_files(sources), len(sources), source=name, **options))
+
+
+def iter_analyze_url(url, incremental=None, selection=None, sha=None, **options):
+    """Analyze the repository at ``url``, at commit ``sha`` if it was already resolved.
+
+    When the repository was analyzed before with the same file ``selection``,
+    only the files changed since the previously analyzed commit are fetched
+    and parsed, unless ``incremental`` is False.
+    """
+    return (yield from iter_steps(_url_steps(url, incremental, selection, sha, **options)))
+
+
+async def aiter_analyze_url(url, incremental=None, selection=None, sha=None, **options):
+    """Like ``iter_analyze_url``, as an async generator of events that runs git without blocking."""
+    async for event in aiter_steps(_url_steps(url, incremental, selection, sha, **options)):
+        yield event
+
+
+def _url_steps(url, incremental, selection, sha, **options):
+    if incremental is None:
+        incremental = getattr(settings, 'ANALYSIS_INCREMENTAL', True)
+    extractor = CodebaseExtractor(url, selection, commit=sha)
+    options['selection'] = extractor.selection.key()
+    try:
+        previous_run = None
+        if incremental and _persist_results() and extractor.is_repo_url():
+            previous_run = find_previous_run(url, extractor.selection)
+        if previous_run is not None:
+            changes = yield from iter_analyze_changes(extractor, previous_run)
+            if changes is not None:
+                if not len(changes):
+                    raise NoSourceFilesError('No files')
+                return (yield from _components_steps(changes, len(changes), source=url, commit=extractor.commit,
+                                                     **options))
+        stage = Stage('extract')
+        yield stage.running()
+        files, temp_dir = yield Extract(extractor)
+        yield stage.done(files=len(files), bytes=extractor.bytes_extracted, skipped=extractor.skipped_counts())
+        if not files:
+            raise NoSourceFilesError('No files')
+        return (yield from _components_steps(iter_analyze_files(files, temp_dir=temp_dir), len(files), source=url,
+                                             commit=extractor.commit, **options))
+    finally:
+        extractor.cleanup()
+
+
+def analyze_codebase(files, temp_dir, on_stage=None, **options):
+    return run_events(iter_analyze_codebase(files, temp_dir, **options), on_stage)
+
+
+def analyze_sources(name, sources, on_stage=None, **options):
+    return run_events(iter_analyze_sources(name, sources, **options), on_stage)
+
+
+def analyze_url(url, on_stage=None, **options):
+    return run_events(iter_analyze_url(url, **options), on_stage)
+
+
+async def aanalyze_sources(name, sources, on_stage=None, **options):
+    return await arun_events(aiter_analyze_sources(name, sources, **options), on_stage)
+
+
+async def aanalyze_url(url, on_stage=None, **options):
+    return await arun_events(aiter_analyze_url(url, **options), on_stage)
+
+
+def _persist_results():
+    return getattr(settings, 'ANALYSIS_PERSIST_RESULTS', True)
@@ -0,0 +1,52 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class LLMResponseCache:
+    """Caches LLM response texts keyed by a hash of the model, prompt and sampling parameters.
+
+    Backed by one of Django's caches (``LLM_CACHE_ALIAS``), whose ``TIMEOUT``
+    and ``MAX_ENTRIES`` bound how long and how many responses are kept. Hits
+    and misses are counted in the same cache so all workers share them.
+    """
+
+    HITS_KEY = 'llm-cache:hits'
+    MISSES_KEY = 'llm-cache:misses'
+
+    def __init__(self, alias=None):
+        self.cache = caches[alias or getattr(settings, 'LLM_CACHE_ALIAS', 'default')]
+
+    @staticmethod
+    def make_key(request):
+        payload = json.dumps(request, sort_keys=True, separators=(',', ':'))
+        return 'llm-response:' + hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        value = self.cache.get(key)
+        self._count(self.MISSES_KEY if value is None else self.HITS_KEY)
+        return value
+
+    def set(self, key, value):
+        self.cache.set(key, value)
+
+    def stats(self):
+        counts = self.cache.get_many([self.HITS_KEY, self.MISSES_KEY])
+        hits = counts.get(self.HITS_KEY, 0)
+        misses = counts.get(self.MISSES_KEY, 0)
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / lookups if lookups else 0.0,
+        }
+
+    def _count(self, key):
+        # Counters never expire; add() only succeeds for the first worker to count.
+        if not self.cache.add(key, 1, timeout=None):
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                self.cache.set(key, 1, timeout=None)
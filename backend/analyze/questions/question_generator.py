@@ -1,8 +1,94 @@
+import asyncio
 import os
-import openai
 import re
 import json
 import random
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from ..search.inverted_index import FocusRanker
+from .llm_cache import LLMResponseCache
+
+class ComponentSelector:
+    """Picks the components to ask about in a single pass over their summaries.
+
+    Without a focus, a uniform random sample of ``pool_size`` candidates is
+    kept with reservoir sampling. With a focus, the components matching it are
+    ranked as they go by, and the sample is only used when none match. Out of
+    the candidates, ``size`` components as different from each other as
+    possible are picked with maximal marginal relevance over TF-IDF vectors of
+    their names, parameters and docstrings, so that overloads and similarly
+    named helpers don't all get asked about. Either way only the candidates,
+    not every component, are held in memory. Given a ``store.ComponentStore``
+    holding the components, the focus is searched in the store instead of
+    keeping the matches.
+    """
+
+    def __init__(self, focus=None, size=10, pool_size=None, diversity=None, store=None):
+        if pool_size is None:
+            pool_size = getattr(settings, 'ANALYSIS_QUESTION_POOL', 1000)
+        if diversity is None:
+            diversity = getattr(settings, 'ANALYSIS_QUESTION_DIVERSITY', 0.5)
+        self.size = size
+        self.pool_size = max(pool_size, size)
+        self.diversity = diversity
+        self.seen = 0
+        self.sample = []
+        self.focus = focus
+        self.store = store
+        self.ranker = FocusRanker(focus) if focus and store is None else None
+
+    def add(self, component):
+        self.seen += 1
+        if len(self.sample) < self.pool_size:
+            self.sample.append(component)
+        else:
+            index = random.randrange(self.seen)
+            if index < self.pool_size:
+                self.sample[index] = component
+        if self.ranker is not None:
+            self.ranker.add(component)
+
+    def selected(self):
+        if self.focus:
+            if self.store is not None:
+                best = self.store.search(self.focus, self.pool_size)
+            else:
+                best = self.ranker.top(self.pool_size)
+            if best:
+                # The best matches are the most relevant, decreasing with their rank.
+                return self._diverse(best, [1 - rank / len(best) for rank in range(len(best))])
+        # Random relevance still varies the questions between runs, as the shuffle used to.
+        return self._diverse(self.sample, [random.random() for _ in self.sample])
+
+    def _diverse(self, candidates, relevance):
+        if len(candidates) <= self.size:
+            selected = list(candidates)
+            random.shuffle(selected)
+            return selected
+        # NumPy is only imported once questions are picked, keeping it out of the startup time.
+        from ..search.diversity import TfidfMatrix, select_diverse
+        picked = select_diverse(TfidfMatrix.from_components(candidates), self.size, relevance, self.diversity)
+        return [candidates[i] for i in picked]
+
+
+# The cross-reference relations answering how a component interacts with others.
+INTERACTIONS = (
+    ('calls', 'calls'),
+    ('called_by', 'is called by'),
+    ('bases', 'inherits from'),
+    ('subclasses', 'is inherited by'),
+    ('overrides', 'overrides'),
+    ('overridden_by', 'is overridden by'),
+    ('imported_by', 'is imported by'),
+)
+
+# Most components named per relation in an answer.
+INTERACTIONS_SHOWN = 5
+
 
 class RuleBasedQuestionGenerator:
     @staticmethod
@@ -13,10 +99,37 @@ class RuleBasedQuestionGenerator:
 
     @staticmethod
     def generate(components, focus=None):
-        if focus:
-            filtered = [c for c in components if focus.lower() in (c['docstring'] or '').lower() or focus.lower() in c['name'].lower()]
-            if filtered:
-                components = filtered
+        selector = ComponentSelector(focus)
+        for c in components:
+            selector.add(c)
+        return RuleBasedQuestionGenerator.questions(selector.selected())
+
+    @staticmethod
+    def _interactions(c, xref):
+        """Describe who ``c`` calls, inherits, overrides and is used by, or return None when that's unknown."""
+        if xref is not None and c.get('symbol') is not None:
+            related = [(label, [xref.names[s] for s in xref.neighbors(c['symbol'], relation)])
+                       for relation, label in INTERACTIONS]
+        else:
+            # Not resolved against the codebase: the outgoing references as the analyzer found them.
+            references = c.get('references') or {}
+            related = [(label, [ref.split('.', 1)[1] if ref.split('.', 1)[0] in ('self', 'super', '*') else ref
+                                for ref in references.get(relation, ())])
+                       for relation, label in INTERACTIONS if relation in ('calls', 'bases')]
+        parts = []
+        for label, names in related:
+            if names:
+                shown = ', '.join(f'`{name}`' for name in names[:INTERACTIONS_SHOWN])
+                if len(names) > INTERACTIONS_SHOWN:
+                    shown += f' and {len(names) - INTERACTIONS_SHOWN} more'
+                parts.append(f'{label} {shown}')
+        if not parts:
+            return None
+        return f"The {c['type']} `{RuleBasedQuestionGenerator._name_with_file(c)}` " + '; '.join(parts) + '.'
+
+    @staticmethod
+    def questions(components, xref=None):
+        """Ask template questions about ``components``, answering how they interact from ``xref`` when given."""
         questions = []
         templates = [
             ('beginner', 'What is the purpose of the {type} `{name_updated}`?',
@@ -26,7 +139,6 @@ class RuleBasedQuestionGenerator:
             ('advanced', 'How could the {type} `{name_updated}` be optimized or improved?',
              'Potential optimizations for `{name_updated}` could include refactoring, improving efficiency, or enhancing documentation.')
         ]
-        random.shuffle(components)
         idx = 0
         while len(questions) < 10 and components:
             c = components[idx % len(components)]
@@ -34,6 +146,8 @@ class RuleBasedQuestionGenerator:
             name_with_file = RuleBasedQuestionGenerator._name_with_file(c)
             q = t[1].format(**c, name_updated=name_with_file)
             a = t[2].format(**c, name_updated=name_with_file)
+            if t[0] == 'intermediate':
+                a = RuleBasedQuestionGenerator._interactions(c, xref) or a
             questions.append({
                 'question': q,
                 'answer': a,
@@ -45,25 +159,227 @@ class RuleBasedQuestionGenerator:
         return questions[:10]
 
 class LLMQuestionGenerator:
-    def __init__(self, openai_api_key=None):
+    model = "gpt-4o-mini"
+
+    def __init__(self, openai_api_key=None, cache=None, base_url=None, chunk_token_budget=None, max_concurrency=None,
+                 duplicate_similarity=None):
         if openai_api_key is None:
             openai_api_key = os.getenv('OPENAI_API_KEY')
         if not openai_api_key:
             raise ValueError('OpenAI API key not provided. Set OPENAI_API_KEY environment variable or pass as argument.')
-        self.client = openai.Client(api_key=openai_api_key)
+        # Imported here so that workers never asked for LLM questions don't pay for loading openai.
+        import openai
+        self.client = openai.Client(api_key=openai_api_key, base_url=base_url)
+        self.openai_api_key = openai_api_key
+        self.base_url = base_url
+        self._async_client = None
+        self.cache = cache if cache is not None else LLMResponseCache()
+        if chunk_token_budget is None:
+            chunk_token_budget = getattr(settings, 'LLM_CHUNK_TOKEN_BUDGET', 8000)
+        if max_concurrency is None:
+            max_concurrency = getattr(settings, 'LLM_MAX_CONCURRENCY', 4)
+        if duplicate_similarity is None:
+            duplicate_similarity = getattr(settings, 'LLM_DUPLICATE_SIMILARITY', 0.85)
+        self.chunk_token_budget = chunk_token_budget
+        self.max_concurrency = max_concurrency
+        self.duplicate_similarity = duplicate_similarity
 
-    def generate(self, components, focus=None):
-        summaries = [f"- {c['summary']}" for c in components]
-        codebase_summary = '\n'.join(summaries)
+    def generate(self, components, focus=None, use_cache=True, count=10):
+        requests = self._requests(components, focus, count)
+        if len(requests) == 1:
+            results = [self._request(requests[0], use_cache)]
+        else:
+            # Map: ask for a share of the questions about each chunk, at most max_concurrency at a time.
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                results = list(executor.map(lambda request: self._request(request, use_cache), requests))
+        return self._collect(results, count)
+
+    def iter_generate(self, components, focus=None, use_cache=True, count=10):
+        """Like ``generate``, but yield each question as soon as the model has written it."""
+        requests = self._requests(components, focus, count)
+        if len(requests) > 1:
+            # Chunked questions are only merged once every chunk has answered.
+            yield from self.generate(components, focus=focus, use_cache=use_cache, count=count)
+            return
+        key = self.cache.make_key(requests[0])
+        content = self.cache.get(key) if use_cache else None
+        questions = self._parse_questions(content) if content is not None else None
+        if questions is not None:
+            yield from self._collect([(content, questions)], count)
+            return
+        stream = StreamedQuestions(self, count)
+        for event in self.client.responses.create(stream=True, **requests[0]):
+            yield from stream.feed(event)
+        content, questions = stream.response()
+        if questions is not None:
+            self.cache.set(key, content)
+        yield from stream.rest()
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            import openai
+            self._async_client = openai.AsyncClient(api_key=self.openai_api_key, base_url=self.base_url)
+        return self._async_client
+
+    async def agenerate(self, components, focus=None, use_cache=True, count=10):
+        """Like ``generate``, with the requests made by the async client."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def request(request):
+            async with semaphore:
+                return await self._arequest(request, use_cache)
+
+        results = await asyncio.gather(*(request(r) for r in self._requests(components, focus, count)))
+        return self._collect(results, count)
+
+    async def aiter_generate(self, components, focus=None, use_cache=True, count=10):
+        """Like ``iter_generate``, streaming the response with the async client."""
+        requests = self._requests(components, focus, count)
+        if len(requests) > 1:
+            for question in await self.agenerate(components, focus=focus, use_cache=use_cache, count=count):
+                yield question
+            return
+        key = self.cache.make_key(requests[0])
+        content = await sync_to_async(self.cache.get)(key) if use_cache else None
+        questions = self._parse_questions(content) if content is not None else None
+        if questions is not None:
+            for question in self._collect([(content, questions)], count):
+                yield question
+            return
+        stream = StreamedQuestions(self, count)
+        async for event in await self.async_client.responses.create(stream=True, **requests[0]):
+            for question in stream.feed(event):
+                yield question
+        content, questions = stream.response()
+        if questions is not None:
+            await sync_to_async(self.cache.set)(key, content)
+        for question in stream.rest():
+            yield question
+
+    def _build_prompt(self, codebase_summary, focus, count):
         focus_str = f" Focus on the concept: {focus}." if focus else ""
-        prompt = (
-            f"You are an expert Python interviewer. Given the following codebase summary, generate a list of 10 technical interview questions with detailed answers."
+        return (
+            f"You are an expert Python interviewer. Given the following codebase summary, generate a list of {count} technical interview questions with detailed answers."
             f"Each question should be classified as beginner, intermediate, or advanced, and should be specific to the codebase."
             f"{focus_str}\n\nCodebase summary:\n{codebase_summary}\n\n"
             "Return the result as a JSON array of objects with fields: question, answer, difficulty (beginner/intermediate/advanced)."
         )
-        response = self.client.responses.create(
-            model="gpt-4o-mini",
+
+    def _requests(self, components, focus, count):
+        """Build the requests for ``count`` questions: one per chunk of the summaries, each asking for a share."""
+        summaries = [f"- {c['summary']}" for c in components]
+        chunks = self._chunk(summaries, self.chunk_token_budget) or [[]]
+        per_chunk = -(-count // len(chunks))
+        return [self._build_request(self._build_prompt('\n'.join(chunk), focus, per_chunk)) for chunk in chunks]
+
+    def _request(self, request, use_cache):
+        """Return the response text for ``request`` and its parsed questions, or None if it didn't parse."""
+        key = self.cache.make_key(request)
+        content = self.cache.get(key) if use_cache else None
+        cached = content is not None
+        if not cached:
+            response = self.client.responses.create(**request)
+            content = response.output[0].content[0].text.strip()
+        questions = self._parse_questions(content)
+        # Only responses that parsed are worth serving again.
+        if questions is not None and not cached:
+            self.cache.set(key, content)
+        return content, questions
+
+    async def _arequest(self, request, use_cache):
+        key = self.cache.make_key(request)
+        content = await sync_to_async(self.cache.get)(key) if use_cache else None
+        cached = content is not None
+        if not cached:
+            response = await self.async_client.responses.create(**request)
+            content = response.output[0].content[0].text.strip()
+        questions = self._parse_questions(content)
+        if questions is not None and not cached:
+            await sync_to_async(self.cache.set)(key, content)
+        return content, questions
+
+    def _collect(self, results, count):
+        """Turn the ``(content, questions)`` answer to each request into at most ``count`` questions."""
+        if len(results) == 1:
+            content, questions = results[0]
+            if questions is None:
+                return self._failed(content)
+            return list(islice(self._unique(questions), count))
+        # Reduce: drop duplicates and pick round-robin across chunks so every part of the codebase is covered.
+        return self._merge([questions or [] for _, questions in results], count, self._duplicates())
+
+    @staticmethod
+    def _failed(content):
+        return [{
+            'question': 'Failed to parse LLM response.',
+            'answer': content,
+            'difficulty': 'advanced'
+        }]
+
+    @staticmethod
+    def _estimate_tokens(text):
+        # Roughly four characters per token for English text and code identifiers.
+        return len(text) // 4 + 1
+
+    @classmethod
+    def _chunk(cls, summaries, token_budget):
+        chunks = []
+        current = []
+        tokens = 0
+        for summary in summaries:
+            summary_tokens = cls._estimate_tokens(summary)
+            if current and tokens + summary_tokens > token_budget:
+                chunks.append(current)
+                current = []
+                tokens = 0
+            current.append(summary)
+            tokens += summary_tokens
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _duplicates(self):
+        # NumPy is only imported once an LLM has answered, keeping it out of the startup time.
+        from ..search.diversity import NearDuplicateFilter
+        return NearDuplicateFilter(self.duplicate_similarity)
+
+    def _unique(self, questions, seen=None):
+        """Yield the questions that aren't near-duplicates of an earlier one, e.g. the same question reworded."""
+        if seen is None:
+            seen = self._duplicates()
+        for q in questions:
+            if not isinstance(q, dict) or seen.add(str(q.get('question', ''))):
+                yield q
+
+    @staticmethod
+    def _merge(results, count, seen):
+        results = [[q for q in questions if isinstance(q, dict) and q.get('question')] for questions in results]
+        # Deduplicate in round-robin order, so that a question asked about several chunks is kept in the first.
+        kept = set()
+        for depth in range(max((len(questions) for questions in results), default=0)):
+            for i, questions in enumerate(results):
+                if depth < len(questions) and seen.add(str(questions[depth]['question'])):
+                    kept.add((i, depth))
+        unique = [[q for depth, q in enumerate(questions) if (i, depth) in kept] for i, questions in enumerate(results)]
+        merged = []
+        depth = 0
+        while len(merged) < count:
+            candidates = [questions[depth] for questions in unique if depth < len(questions)]
+            if not candidates:
+                break
+            remaining = count - len(merged)
+            if len(candidates) > remaining:
+                # Spread the last picks evenly over the chunks rather than taking the first ones.
+                step = len(candidates) / remaining
+                candidates = [candidates[int(i * step)] for i in range(remaining)]
+            merged += candidates
+            depth += 1
+        return merged
+
+    def _build_request(self, prompt):
+        return dict(
+            model=self.model,
             input=[
                 {
                     "role": "system",
@@ -95,7 +411,9 @@ class LLMQuestionGenerator:
             max_output_tokens=2000,
             top_p=1
         )
-        content = response.output[0].content[0].text.strip()
+
+    @staticmethod
+    def _parse_questions(content):
         match = re.search(r'\[.*\]', content, re.DOTALL)
         if match:
             json_str = match.group(0)
@@ -104,9 +422,90 @@ class LLMQuestionGenerator:
         try:
             questions = json.loads(json_str)
         except Exception:
-            questions = [{
-                'question': 'Failed to parse LLM response.',
-                'answer': content,
-                'difficulty': 'advanced'
-            }]
+            return None
+        # A single question object, without the surrounding array.
+        if isinstance(questions, dict):
+            questions = [questions]
+        return questions if isinstance(questions, list) else None
+
+
+class QuestionStreamParser:
+    """Incrementally parses the objects of a JSON array as its text arrives.
+
+    ``feed`` returns the objects completed by the new text. Anything before the
+    opening bracket, such as a markdown code fence, is ignored.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.buffer = []
+
+    def feed(self, text):
+        completed = []
+        for char in text:
+            if not self.started:
+                self.started = char == '['
+                continue
+            if self.depth:
+                self.buffer.append(char)
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == '{':
+                if not self.depth:
+                    self.buffer = [char]
+                self.depth += 1
+            elif char == '}' and self.depth:
+                self.depth -= 1
+                if not self.depth:
+                    try:
+                        completed.append(json.loads(''.join(self.buffer)))
+                    except ValueError:
+                        pass
+        return completed
+
+
+class StreamedQuestions:
+    """The questions of one streamed response, without near-duplicates and at most ``count`` of them.
+
+    ``feed`` returns the questions completed by a response event. Once the
+    stream has ended, ``response`` returns its text and parsed questions, and
+    ``rest`` the questions to yield if none could be streamed.
+    """
+
+    def __init__(self, generator, count):
+        self.generator = generator
+        self.count = count
+        self.parser = QuestionStreamParser()
+        self.seen = generator._duplicates()
+        self.parts = []
+        self.streamed = 0
+        self.content = self.questions = None
+
+    def feed(self, event):
+        if event.type != 'response.output_text.delta':
+            return []
+        self.parts.append(event.delta)
+        questions = list(islice(self.generator._unique(self.parser.feed(event.delta), self.seen),
+                                self.count - self.streamed))
+        self.streamed += len(questions)
         return questions
+
+    def response(self):
+        self.content = ''.join(self.parts).strip()
+        self.questions = self.generator._parse_questions(self.content)
+        return self.content, self.questions
+
+    def rest(self):
+        if self.streamed:
+            return []
+        return self.generator._collect([(self.content, self.questions)], self.count)
@@ -0,0 +1,54 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .analysis.code_analyzer import ANALYZER_VERSION
+
+
+class ResultCache:
+    """Caches whole analysis responses keyed by what was analyzed and how.
+
+    A repository is identified by its URL and resolved commit SHA and an
+    upload by a hash of its content, so a cached result never goes stale;
+    the request options that change the questions are part of the key.
+    Each result is stored with its ETag, a hash of the result itself: a
+    result computed again, e.g. with other random or LLM questions, gets
+    another one. Backed by one of Django's caches
+    (``ANALYSIS_RESULT_CACHE_ALIAS``).
+    """
+
+    def __init__(self, alias=None):
+        self.cache = caches[alias or getattr(settings, 'ANALYSIS_RESULT_CACHE_ALIAS', 'results')]
+
+    @staticmethod
+    def make_key(source, version, **options):
+        payload = json.dumps({'source': source, 'version': version, 'analyzer': ANALYZER_VERSION, **options},
+                             sort_keys=True, separators=(',', ':'))
+        return 'analysis-result-v2:' + hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def etag(result):
+        body = json.dumps(result, sort_keys=True, separators=(',', ':'))
+        return '"' + hashlib.sha256(body.encode('utf-8')).hexdigest()[:32] + '"'
+
+    def get(self, key):
+        """Return the cached result of ``key`` and its ETag, or None."""
+        entry = self.cache.get(key)
+        return (entry['result'], entry['etag']) if entry is not None else None
+
+    def set(self, key, result):
+        """Cache ``result`` under ``key`` and return its ETag."""
+        etag = self.etag(result)
+        self.cache.set(key, {'result': result, 'etag': etag})
+        return etag
+
+
+def content_hash(uploaded_file):
+    """Return the SHA-256 of an uploaded file, leaving it ready to be read again."""
+    digest = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
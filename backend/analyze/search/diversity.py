@@ -0,0 +1,173 @@
+import math
+import re
+from itertools import chain
+
+import numpy as np
+
+from .inverted_index import FIELD_WEIGHTS, TOKEN_RE
+
+# Words, the runs of characters tokens are found in, and the NUL that
+# separates the documents of a field so that many documents are tokenized in
+# one call.
+WORD_RE = re.compile(r'[A-Za-z0-9]+|\x00')
+
+# Documents tokenized at once, bounding the memory of the words listed in one call.
+CHUNK_DOCUMENTS = 4096
+
+
+def _field_text(value):
+    if isinstance(value, (list, tuple)):
+        return ' '.join(map(str, value))
+    return str(value) if value else ''
+
+
+class Vocabulary:
+    """Maps the tokens of texts to column ids, the same tokens as those of inverted_index.
+
+    Texts are split into words with a simple regex, and each distinct word is
+    only split into its tokens, e.g. ``loadConfig`` into ``load`` and
+    ``config``, the first time it is seen.
+    """
+
+    def __init__(self):
+        # Column 0 is the document separator, which no token maps to.
+        self.tokens = {'\x00': 0}
+        self.words = {'\x00': (0,)}
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def ids(self, texts):
+        """Return the token ids of ``texts`` and the index of the text each of them is in."""
+        text = '\x00'.join(texts)
+        if text.count('\x00') != len(texts) - 1:
+            text = '\x00'.join(t.replace('\x00', ' ') for t in texts)
+        words = WORD_RE.findall(text)
+        for word in set(words).difference(self.words):
+            self.words[word] = tuple(self.tokens.setdefault(token.lower(), len(self.tokens))
+                                     for token in TOKEN_RE.findall(word))
+        ids = np.fromiter(chain.from_iterable(map(self.words.__getitem__, words)), dtype=np.int64)
+        separators = ids == 0
+        # A token belongs to the text of the separators before it.
+        return ids[~separators], np.cumsum(separators)[~separators]
+
+
+class TfidfMatrix:
+    """L2-normalized TF-IDF vectors of documents, as a sparse matrix.
+
+    The non-zero entries are kept as flat ``rows``, ``columns`` and ``values``
+    arrays sorted by row, with ``indptr`` giving where each row starts, so the
+    similarities of one document to all the others are a couple of vectorized
+    operations over those arrays.
+    """
+
+    def __init__(self, rows, columns, values, shape):
+        self.rows = rows
+        self.columns = columns
+        self.values = values
+        self.shape = shape
+        self.indptr = np.searchsorted(rows, np.arange(shape[0] + 1))
+
+    @classmethod
+    def from_fields(cls, fields, count, vocabulary=None):
+        """Build the matrix of ``count`` documents from ``(weight, texts)`` pairs, one text per document."""
+        if vocabulary is None:
+            vocabulary = Vocabulary()
+        rows, columns, weights = [], [], []
+        for weight, texts in fields:
+            for start in range(0, count, CHUNK_DOCUMENTS) or [0]:
+                ids, documents = vocabulary.ids(texts[start:start + CHUNK_DOCUMENTS])
+                rows.append(documents + start)
+                columns.append(ids)
+                weights.append(np.full(len(ids), weight, dtype=np.float32))
+        rows, columns, weights = np.concatenate(rows), np.concatenate(columns), np.concatenate(weights)
+        # Sum the weights of each (document, token) pair, sorted by document.
+        keys, inverse = np.unique(rows * len(vocabulary) + columns, return_inverse=True)
+        frequencies = np.bincount(inverse, weights=weights)
+        return cls.from_frequencies(keys // len(vocabulary), keys % len(vocabulary), frequencies,
+                                    (count, len(vocabulary)))
+
+    @classmethod
+    def from_frequencies(cls, rows, columns, frequencies, shape):
+        """Build the matrix from the weighted frequency of each (document, token) pair, sorted by document."""
+        count, size = shape
+        document_frequencies = np.bincount(columns, minlength=size)
+        idf = np.log((1 + count) / (1 + document_frequencies)) + 1
+        values = frequencies * idf[columns]
+        norms = np.sqrt(np.bincount(rows, weights=values * values, minlength=count))
+        values /= norms[rows]
+        return cls(rows, columns, values, shape)
+
+    @classmethod
+    def from_components(cls, components, field_weights=FIELD_WEIGHTS):
+        """Build the matrix of component summaries from the same fields and weights as focus search."""
+        fields = []
+        for field, weight in field_weights.items():
+            texts = [c.get(field) for c in components]
+            # Most fields are strings or None, and parameters lists, converted without a call for each.
+            fields.append((weight, [t if t.__class__ is str else ' '.join(map(str, t)) if t.__class__ is list
+                                    else _field_text(t) for t in texts]))
+        return cls.from_fields(fields, len(components))
+
+    @classmethod
+    def from_texts(cls, texts):
+        return cls.from_fields([(1.0, [_field_text(text) for text in texts])], len(texts))
+
+    def similarities(self, index):
+        """Return the cosine similarity of every document to document ``index``."""
+        start, end = self.indptr[index], self.indptr[index + 1]
+        vector = np.zeros(self.shape[1])
+        vector[self.columns[start:end]] = self.values[start:end]
+        return np.bincount(self.rows, weights=self.values * vector[self.columns], minlength=self.shape[0])
+
+
+def select_diverse(matrix, count, relevance=None, diversity=0.5):
+    """Pick ``count`` documents with maximal marginal relevance and return their indexes, in order.
+
+    Each pick is the document maximizing ``(1 - diversity) * relevance -
+    diversity * similarity``, the similarity being to the closest document
+    picked so far. ``relevance`` defaults to the same for every document.
+    """
+    size = matrix.shape[0]
+    relevance = np.zeros(size) if relevance is None else np.asarray(relevance, dtype=float)
+    closest = np.zeros(size)
+    picked = []
+    for _ in range(min(count, size)):
+        scores = (1 - diversity) * relevance - diversity * closest
+        scores[picked] = -math.inf
+        index = int(np.argmax(scores))
+        picked.append(index)
+        np.maximum(closest, matrix.similarities(index), out=closest)
+    return picked
+
+
+class NearDuplicateFilter:
+    """Drops texts too similar to one already kept, e.g. reworded questions of an LLM.
+
+    The vocabulary and the token frequencies of the kept texts are kept
+    between calls, so each text is only tokenized once, and checking one is
+    a reweighting of the kept frequencies with the updated IDF.
+    """
+
+    def __init__(self, threshold=0.8):
+        self.threshold = threshold
+        self.kept = []
+        self.vocabulary = Vocabulary()
+        self.rows = np.zeros(0, dtype=np.int64)
+        self.columns = np.zeros(0, dtype=np.int64)
+        self.frequencies = np.zeros(0)
+
+    def add(self, text):
+        """Return whether ``text`` is kept, i.e. its similarity to every kept text is below the threshold."""
+        columns, frequencies = np.unique(self.vocabulary.ids([text])[0], return_counts=True)
+        rows = np.full(len(columns), len(self.kept))
+        rows, columns = np.concatenate((self.rows, rows)), np.concatenate((self.columns, columns))
+        frequencies = np.concatenate((self.frequencies, frequencies))
+        if self.kept:
+            matrix = TfidfMatrix.from_frequencies(rows, columns, frequencies,
+                                                  (len(self.kept) + 1, len(self.vocabulary)))
+            if matrix.similarities(len(self.kept))[:-1].max() >= self.threshold:
+                return False
+        self.kept.append(text)
+        self.rows, self.columns, self.frequencies = rows, columns, frequencies
+        return True
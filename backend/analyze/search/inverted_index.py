@@ -0,0 +1,126 @@
+import heapq
+import math
+import re
+
+# Splits identifiers and prose into words: snake_case on the underscores,
+# camelCase and PascalCase on the case changes (keeping acronyms such as the
+# HTTP in HTTPServer together), and digits apart from letters.
+TOKEN_RE = re.compile(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+')
+
+# How much a match in each field counts towards a component's score.
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'full_name': 2.0,
+    'parameters': 1.0,
+    'docstring': 1.0,
+}
+
+# BM25 term frequency saturation and document length normalization.
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text):
+    return [token.lower() for token in TOKEN_RE.findall(text or '')]
+
+
+def term_frequencies(component):
+    """Return the field-weighted frequency of each token of ``component`` and their total weight."""
+    frequencies = {}
+    length = 0.0
+    for field, weight in FIELD_WEIGHTS.items():
+        value = component.get(field)
+        if isinstance(value, (list, tuple)):
+            value = ' '.join(str(v) for v in value)
+        for token in tokenize(value):
+            frequencies[token] = frequencies.get(token, 0.0) + weight
+            length += weight
+    return frequencies, length
+
+
+def inverse_document_frequencies(document_frequencies, count):
+    return {term: math.log(1 + (count - df + 0.5) / (df + 0.5)) for term, df in document_frequencies.items()}
+
+
+def bm25(terms, length, idf, average_length):
+    """Score a document with the field-weighted ``{term: frequency}`` of the query terms it contains."""
+    norm = K1 * (1 - B + B * length / average_length)
+    return sum(idf[term] * frequency * (K1 + 1) / (frequency + norm) for term, frequency in terms.items())
+
+
+def _best(matches, document_frequencies, count, average_length, limit):
+    """Rank ``(key, {term: frequency}, length)`` matches with BM25 and return the best ``limit`` keys.
+
+    Only the matches containing the most query terms are ranked, so a query
+    such as ``my_func`` isn't answered with everything named ``my``.
+    """
+    if not matches:
+        return []
+    idf = inverse_document_frequencies(document_frequencies, count)
+    coverage = max(len(terms) for _, terms, _ in matches)
+    scored = []
+    for key, terms, length in matches:
+        if len(terms) < coverage:
+            continue
+        scored.append((-bm25(terms, length, idf, average_length), key))
+    # Ties keep the order of the keys.
+    return [key for _, key in heapq.nsmallest(limit, scored)]
+
+
+class FocusRanker:
+    """Ranks components against a query in a single pass, without indexing them.
+
+    Components are added one at a time and only the ones containing a query
+    term are kept, with the counts BM25 needs, so memory grows with the
+    number of matches rather than with the codebase. The tokens of a field
+    are only lowercased and counted when a query term occurs in its text;
+    for the other fields, only their number is needed, for the average
+    document length.
+
+    This replaces an inverted index of every component: each analysis ranks
+    its components against a single focus, known before they stream by, so
+    an index would only ever be looked up once and would hold every
+    component in memory. ``store.ComponentStore`` keeps an FTS5 index
+    instead, for components that don't fit in memory.
+    """
+
+    def __init__(self, query):
+        self.terms = set(tokenize(query))
+        # Finds the fields that may contain a query term, longest first so that no term hides another.
+        alternatives = '|'.join(re.escape(term) for term in sorted(self.terms, key=len, reverse=True))
+        self.pattern = re.compile(alternatives, re.IGNORECASE) if self.terms else None
+        self.count = 0
+        self.total_length = 0.0
+        self.document_frequencies = {}
+        self.matches = []
+        self.components = []
+
+    def add(self, component):
+        self.count += 1
+        terms = {}
+        length = 0.0
+        for field, weight in FIELD_WEIGHTS.items():
+            value = component.get(field)
+            if not value:
+                continue
+            if isinstance(value, (list, tuple)):
+                value = ' '.join(str(v) for v in value)
+            tokens = TOKEN_RE.findall(value)
+            length += weight * len(tokens)
+            if self.pattern is not None and self.pattern.search(value):
+                for token in tokens:
+                    token = token.lower()
+                    if token in self.terms:
+                        terms[token] = terms.get(token, 0.0) + weight
+        self.total_length += length
+        if terms:
+            for term in terms:
+                self.document_frequencies[term] = self.document_frequencies.get(term, 0) + 1
+            self.matches.append((len(self.components), terms, length))
+            self.components.append(component)
+
+    def top(self, limit=10):
+        """Return up to ``limit`` of the added components matching the query, best first."""
+        average_length = self.total_length / self.count if self.count else 0.0
+        best = _best(self.matches, self.document_frequencies, self.count, average_length, limit)
+        return [self.components[i] for i in best]
@@ -0,0 +1,234 @@
+import heapq
+import json
+import os
+import posixpath
+import sqlite3
+import tempfile
+from functools import lru_cache
+
+from django.conf import settings
+
+from .analysis.records import ComponentRecord
+from .analysis.xref import module_names
+from .search.inverted_index import bm25, inverse_document_frequencies, term_frequencies, tokenize
+from .summarization.summarizer import ComponentSummarizer
+
+_COLUMNS = 'symbol, type, name, file, full_name, lineno, docstring, parameters, refs'
+
+# Symbol table lookups kept in memory while the cross-reference index is built. References mostly
+# resolve to components of the same file or package, so a small cache holds nearly every repeated one.
+_LOOKUP_CACHE_SIZE = 4096
+
+# Most variables SQLite accepts in one statement on older versions.
+_MAX_VARIABLES = 999
+
+
+def _json(value):
+    return None if value is None else json.dumps(value, separators=(',', ':'))
+
+
+class ComponentStore:
+    """The components of one analysis, spilled to a SQLite database on disk.
+
+    For codebases whose components don't fit in memory: components are
+    written in batches of ``batch_size`` as the files are analyzed, and
+    iterating over the store reads them back in analysis order as the
+    summaries ``ComponentSummarizer`` makes of them, with their ``symbol``.
+    The tokens of their names, parameters and docstrings are indexed with
+    FTS5 so that ``search`` only reads the components matching a focus; it
+    ranks them exactly as ``FocusRanker`` does. The store also has the
+    lookups of ``xref.SymbolTable``, to build the cross-reference index from.
+
+    The database is a temporary file in ``directory``, deleted by ``close``.
+    Without ``terms``, nothing is indexed for ``search``, for a store only
+    used as the symbol table of the cross-reference index.
+    """
+
+    def __init__(self, directory=None, batch_size=1000, terms=True):
+        fd, self.path = tempfile.mkstemp(prefix='components-', suffix='.sqlite3', dir=directory)
+        os.close(fd)
+        self.batch_size = batch_size
+        self.terms = terms
+        self.pending = []
+        self.count = 0
+        # Summed in the order FocusRanker sums it, so that the average is the same to the last bit.
+        self.total_length = 0.0
+        # The steps of an async analysis run in worker threads, one at a time.
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        # The data only lives as long as the analysis, so there is nothing to recover after a crash.
+        self.conn.execute('PRAGMA journal_mode=OFF')
+        self.conn.execute('PRAGMA synchronous=OFF')
+        self.conn.execute(
+            'CREATE TABLE components (symbol INTEGER PRIMARY KEY, type TEXT, name TEXT, file TEXT, directory TEXT, '
+            'full_name TEXT, method TEXT, lineno INTEGER, docstring TEXT, parameters TEXT, refs TEXT)'
+        )
+        self.conn.execute('CREATE TABLE modules (name TEXT, file TEXT, PRIMARY KEY (name, file)) WITHOUT ROWID')
+        self.conn.execute('CREATE TABLE bases (symbol INTEGER PRIMARY KEY, bases TEXT)')
+        # Contentless: only the index is stored, its rowids being the symbols.
+        self.conn.execute("CREATE VIRTUAL TABLE terms USING fts5(tokens, content='', detail=none)")
+        self.find = lru_cache(_LOOKUP_CACHE_SIZE)(self._find)
+        self.component = lru_cache(_LOOKUP_CACHE_SIZE)(self._component)
+        self.module_files = lru_cache(_LOOKUP_CACHE_SIZE)(self._module_files)
+
+    @classmethod
+    def from_settings(cls):
+        """Return a store if ``ANALYSIS_COMPONENT_STORE`` asks for components on disk, else None."""
+        if getattr(settings, 'ANALYSIS_COMPONENT_STORE', 'memory') != 'disk':
+            return None
+        return cls(getattr(settings, 'ANALYSIS_COMPONENT_STORE_DIR', None))
+
+    def __len__(self):
+        return self.count
+
+    def add(self, components):
+        """Add the component records of one file; the first component added gets symbol 0, the next 1 and so on."""
+        for component in components:
+            tokens = ''
+            if self.terms:
+                frequencies, length = term_frequencies({
+                    'name': component.name,
+                    'full_name': component.full_name,
+                    'parameters': component.parameters,
+                    'docstring': component.docstring,
+                })
+                self.total_length += length
+                tokens = ' '.join(frequencies)
+            self.pending.append((self.count, component, tokens))
+            self.count += 1
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def add_symbols(self, symbols):
+        """Add the components of an ``xref.SymbolTable``, with only what resolving references needs."""
+        for _, file, kind, full_name, references in symbols.components():
+            self.add([ComponentRecord(type=kind, name=full_name.rsplit('.', 1)[-1], file=file, full_name=full_name,
+                                      lineno=None, docstring=None, parameters=None, references=references)])
+
+    def flush(self):
+        if not self.pending:
+            return
+        rows = []
+        modules = set()
+        for symbol, c, _ in self.pending:
+            method = c.full_name.rsplit('.', 1)[-1] if c.type == 'function' else None
+            rows.append((symbol, c.type, c.name, c.file, posixpath.dirname(c.file), c.full_name, method, c.lineno,
+                         c.docstring, _json(c.parameters), _json(c.references)))
+            modules.update((name, c.file) for name in module_names(c.file))
+        with self.conn:
+            self.conn.execute('BEGIN')
+            self.conn.executemany('INSERT INTO components VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            self.conn.executemany('INSERT OR IGNORE INTO modules VALUES (?, ?)', modules)
+            self.conn.executemany('INSERT INTO terms (rowid, tokens) VALUES (?, ?)',
+                                  [(symbol, tokens) for symbol, _, tokens in self.pending if tokens])
+        self.pending = []
+
+    def __iter__(self):
+        """Yield the summary of every component, in analysis order."""
+        self.flush()
+        return map(self._summary, self.conn.execute(f'SELECT {_COLUMNS} FROM components ORDER BY symbol'))
+
+    def search(self, query, limit=10):
+        """Return the summaries of up to ``limit`` components matching ``query``, best first, like ``FocusRanker.top``."""
+        self.flush()
+        terms = set(tokenize(query))
+        document_frequencies = {}
+        for term in terms:
+            found, = self.conn.execute('SELECT count(*) FROM terms WHERE terms MATCH ?', (f'"{term}"',)).fetchone()
+            if found:
+                document_frequencies[term] = found
+        if not document_frequencies:
+            return []
+        idf = inverse_document_frequencies(document_frequencies, self.count)
+        average_length = self.total_length / self.count
+        match = ' OR '.join(f'"{term}"' for term in document_frequencies)
+        rows = self.conn.execute(
+            f'SELECT {_COLUMNS} FROM components WHERE symbol IN (SELECT rowid FROM terms WHERE terms MATCH ?) '
+            'ORDER BY symbol', (match,)
+        )
+        # The best ``limit`` components for each number of query terms they contain, as
+        # (score, -symbol) so that ties go to the first component, like FocusRanker's.
+        best = {}
+        for row in rows:
+            frequencies, length = term_frequencies(self._summary(row))
+            found = {term: frequencies[term] for term in terms if term in frequencies}
+            heap = best.setdefault(len(found), [])
+            item = (bm25(found, length, idf, average_length), -row[0])
+            if len(heap) < limit:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+        symbols = [-symbol for _, symbol in sorted(best[max(best)], reverse=True)]
+        return self.summaries(symbols)
+
+    def summaries(self, symbols):
+        """Return the summaries of the components ``symbols``, in that order."""
+        found = {}
+        for start in range(0, len(symbols), _MAX_VARIABLES):
+            batch = symbols[start:start + _MAX_VARIABLES]
+            placeholders = ', '.join('?' * len(batch))
+            for row in self.conn.execute(f'SELECT {_COLUMNS} FROM components WHERE symbol IN ({placeholders})', batch):
+                found[row[0]] = self._summary(row)
+        return [found[symbol] for symbol in symbols]
+
+    def close(self):
+        self.conn.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _summary(row):
+        symbol, kind, name, file, full_name, lineno, docstring, parameters, references = row
+        record = ComponentRecord(type=kind, name=name, file=file, full_name=full_name, lineno=lineno,
+                                 docstring=docstring, parameters=parameters and json.loads(parameters),
+                                 references=references and json.loads(references))
+        summary, = ComponentSummarizer.summarize([record])
+        summary['symbol'] = symbol
+        return summary
+
+    # The lookups of xref.SymbolTable.
+
+    def prepare(self):
+        self.flush()
+        for columns in ('file, full_name', 'directory, full_name', 'full_name', 'method'):
+            name = 'components_' + columns.replace(', ', '_')
+            self.conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON components ({columns})')
+
+    def components(self):
+        for symbol, file, kind, full_name, references in self.conn.execute(
+                'SELECT symbol, file, type, full_name, refs FROM components ORDER BY symbol'):
+            yield symbol, file, kind, full_name, references and json.loads(references)
+
+    def _component(self, symbol):
+        return self.conn.execute('SELECT file, type, full_name FROM components WHERE symbol = ?', (symbol,)).fetchone()
+
+    def _find(self, file, full_name):
+        return self.conn.execute('SELECT min(symbol) FROM components WHERE file = ? AND full_name = ?',
+                                 (file, full_name)).fetchone()[0]
+
+    def _symbols(self, where, *params):
+        return [row[0] for row in self.conn.execute(
+            f'SELECT symbol FROM components WHERE {where} ORDER BY symbol LIMIT 2', params)]
+
+    def in_directory(self, directory, full_name):
+        return self._symbols('directory = ? AND full_name = ?', directory, full_name)
+
+    def named(self, full_name):
+        return self._symbols('full_name = ?', full_name)
+
+    def methods(self, name):
+        return self._symbols('method = ?', name)
+
+    def _module_files(self, module):
+        return tuple(row[0] for row in self.conn.execute('SELECT file FROM modules WHERE name = ?', (module,)))
+
+    def set_bases(self, symbol, bases):
+        self.conn.execute('INSERT OR REPLACE INTO bases VALUES (?, ?)', (symbol, _json(bases)))
+
+    def get_bases(self, symbol):
+        row = self.conn.execute('SELECT bases FROM bases WHERE symbol = ?', (symbol,)).fetchone()
+        return json.loads(row[0]) if row else ()
+
+    def names(self):
+        return (row[0] for row in self.conn.execute('SELECT full_name FROM components ORDER BY symbol'))
@@ -1,7 +1,11 @@
 class ComponentSummarizer:
     @staticmethod
     def summarize(components):
-        summaries = []
+        return list(ComponentSummarizer.iter_summarize(components))
+
+    @staticmethod
+    def iter_summarize(components):
+        """Yield the summary of each component as it is consumed."""
         for c in components:
             if c.type == 'function' and c.parameters:
                 if isinstance(c.parameters, list):
@@ -13,16 +17,17 @@ class ComponentSummarizer:
                 summary = f"{c.type.capitalize()} '{c.name}' in {c.file} (line {c.lineno}): "
             if c.docstring:
                 summary += c.docstring.split('\n')[0]
-            summaries.append({
+            yield {
                 'type': c.type,
                 'name': c.name,
+                'full_name': getattr(c, 'full_name', None) or c.name,
                 'docstring': c.docstring,
                 'file': c.file,
                 'lineno': c.lineno,
                 'parameters': c.parameters,
+                'references': getattr(c, 'references', None),
                 'summary': summary
-            })
-        return summaries
+            }
 
     @staticmethod
     def save_to_file(summaries, filename='summaries.txt'):
@@ -0,0 +1,44 @@
+from django.test import TestCase
+import io
+import zipfile
+from ..analysis.code_analyzer import CodeAnalyzer
+from ..benchmarks.runner import STAGES, compare, run_benchmarks
+from ..benchmarks.synthetic import SyntheticCodebase
+
+
+class TestSyntheticCodebase(TestCase):
+    def test_generation_is_deterministic(self):
+        first = list(SyntheticCodebase(files=6, seed=3).sources())
+        second = list(SyntheticCodebase(files=6, seed=3).sources())
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, list(SyntheticCodebase(files=6, seed=4).sources()))
+
+    def test_every_language_parses_to_the_requested_shape(self):
+        codebase = SyntheticCodebase(files=3, classes=2, methods=4)
+        analyzer = CodeAnalyzer()
+        for name, data in codebase.sources():
+            components = analyzer.analyze_source(name, data)
+            self.assertEqual(len([c for c in components if c.type == 'class']), 2, name)
+            self.assertEqual(len([c for c in components if c.type == 'function']), 8, name)
+
+    def test_zip_contains_every_file(self):
+        codebase = SyntheticCodebase(files=5)
+        with zipfile.ZipFile(io.BytesIO(codebase.zip())) as zf:
+            self.assertEqual(zf.namelist(), [name for name, _ in codebase.sources()])
+
+
+class TestBenchmarkRunner(TestCase):
+    def test_reports_every_stage(self):
+        report = run_benchmarks(SyntheticCodebase(files=3, classes=1, methods=2), repeat=1)
+        self.assertEqual(report['components'], 9)
+        self.assertEqual(tuple(report['results']), STAGES)
+        for result in report['results'].values():
+            self.assertGreaterEqual(result['seconds'], 0)
+            self.assertGreater(result['peak_bytes'], 0)
+
+    def test_compare_flags_regressions_beyond_tolerance(self):
+        baseline = {'results': {'analyze': {'seconds': 1.0, 'peak_bytes': 10 * 1024 * 1024}}}
+        within = {'results': {'analyze': {'seconds': 1.2, 'peak_bytes': 10 * 1024 * 1024}}}
+        slower = {'results': {'analyze': {'seconds': 2.0, 'peak_bytes': 20 * 1024 * 1024}}}
+        self.assertEqual(compare(within, baseline, tolerance=0.5), [])
+        self.assertEqual(len(compare(slower, baseline, tolerance=0.5)), 2)
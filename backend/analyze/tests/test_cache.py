@@ -0,0 +1,55 @@
+from django.test import TestCase
+import os
+import tempfile
+from ..analysis.cache import ParseCache
+from ..analysis.code_analyzer import CodeAnalyzer
+
+class TestParseCache(TestCase):
+    def test_hits_and_misses(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = ParseCache(os.path.join(tmpdir, 'cache.sqlite3'))
+            key = ParseCache.make_key(b'class A: pass', 'python', 1)
+            self.assertIsNone(cache.get(key))
+            cache.set(key, [{'type': 'class', 'name': 'A'}])
+            self.assertEqual(cache.get(key), [{'type': 'class', 'name': 'A'}])
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+            self.assertNotEqual(key, ParseCache.make_key(b'class A: pass', 'python', 2))
+            cache.close()
+
+    def test_replacing_an_entry_counts_its_size_once(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = ParseCache(os.path.join(tmpdir, 'cache.sqlite3'))
+            cache.set('key', [{'docstring': 'a' * 100}])
+            cache.set('key', [{'docstring': os.urandom(300).hex()}])
+            self.assertEqual(cache.total_bytes, cache._stored_bytes())
+            cache.close()
+
+    def test_evicts_least_recently_used(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = ParseCache(os.path.join(tmpdir, 'cache.sqlite3'))
+            records = [{'docstring': os.urandom(300).hex()}]
+            cache.set('first', records)
+            cache.max_bytes = int(cache.total_bytes * 2.5)
+            cache.set('second', records)
+            cache.get('first')
+            cache.set('third', records)
+            self.assertIsNotNone(cache.get('first'))
+            self.assertIsNone(cache.get('second'))
+            self.assertIsNotNone(cache.get('third'))
+            self.assertLessEqual(cache.total_bytes, cache.max_bytes)
+            cache.close()
+
+    def test_analyzer_reuses_cached_components(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = ParseCache(os.path.join(tmpdir, 'cache.sqlite3'))
+            for name in ('a.py', 'b.py'):
+                with open(os.path.join(tmpdir, name), 'w') as f:
+                    f.write('class Foo:\n    def bar(self, x):\n        """Bar."""\n')
+            analyzer = CodeAnalyzer(temp_dir=tmpdir, cache=cache)
+            first = analyzer.analyze(os.path.join(tmpdir, 'a.py'))
+            second = analyzer.analyze(os.path.join(tmpdir, 'b.py'))
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+            self.assertEqual([c.file for c in second], ['b.py', 'b.py'])
+            self.assertEqual([(c.full_name, c.lineno, c.docstring, c.parameters) for c in first],
+                             [(c.full_name, c.lineno, c.docstring, c.parameters) for c in second])
+            cache.close()
@@ -1,18 +1,8 @@
 from django.test import TestCase
-from unittest.mock import patch
 import textwrap
 from ..analysis.code_analyzer import CodeAnalyzer
 
-class DummyComponent:
-    def __init__(self, **kwargs):
-        self.__dict__.update(kwargs)
-    def __getitem__(self, item):
-        return getattr(self, item)
-    def __contains__(self, item):
-        return hasattr(self, item)
-
 class TestCodeAnalyzer(TestCase):
-    @patch('analyze.analysis.code_analyzer.Component', DummyComponent)
     def test_analyze_python_class_and_function(self):
         import tempfile
         code = textwrap.dedent('''
@@ -36,3 +26,25 @@ class TestCodeAnalyzer(TestCase):
         self.assertTrue(any('test class' in (c.docstring or '') for c in components))
         self.assertTrue(any('Function docstring' in (c.docstring or '') for c in components))
 
+    def test_analyze_python_qualified_names_and_parameters(self):
+        import tempfile
+        code = textwrap.dedent('''
+            class Outer:
+                class Inner:
+                    async def method(self, a, /, b, *, c):
+                        pass
+            try:
+                def fallback(x):
+                    def helper(y):
+                        pass
+            except ImportError:
+                pass
+        ''')
+        with tempfile.NamedTemporaryFile('w+', suffix='.py', delete=False) as f:
+            f.write(code)
+            f.flush()
+            analyzer = CodeAnalyzer(temp_dir=f.name.rsplit('/', 1)[0])
+            components = analyzer.analyze(f.name)
+        by_name = {c.full_name: c for c in components}
+        self.assertEqual(list(by_name), ['Outer', 'Outer.Inner', 'Outer.Inner.method', 'fallback', 'fallback.helper'])
+        self.assertEqual(by_name['Outer.Inner.method'].parameters, ['self', 'a', 'b', 'c'])
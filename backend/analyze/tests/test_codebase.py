@@ -1,10 +1,12 @@
 from django.test import TestCase
 from unittest.mock import patch, Mock
+import io
 import os
 import tempfile
 import zipfile
 import shutil
 from ..core.codebase import CodebaseExtractor
+from ..core.selection import FileSelection
 
 class TestCodebaseExtractor(TestCase):
     def test_extract_zip(self):
@@ -26,3 +28,114 @@ class TestCodebaseExtractor(TestCase):
         with self.assertRaises(ValueError):
             CodebaseExtractor('not_a_zip_or_github').extract()
 
+    def test_extract_sources_in_memory(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as zf:
+            zf.writestr('repo/foo.py', 'def foo():\n    pass\n')
+            zf.writestr('repo/Bar.java', 'class Bar {}\n')
+            zf.writestr('repo/logo.png', b'\x89PNG')
+            zf.writestr('__MACOSX/repo/._foo.py', b'\x00')
+        buffer.seek(0)
+        with patch('tempfile.mkdtemp') as mkdtemp:
+            sources = CodebaseExtractor(buffer).extract_sources()
+        mkdtemp.assert_not_called()
+        self.assertEqual(sources, [('repo/foo.py', b'def foo():\n    pass\n'), ('repo/Bar.java', b'class Bar {}\n')])
+
+    def test_extract_sources_skips_unselected_files(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as zf:
+            zf.writestr('repo/.gitignore', 'scratch/\n*.local.py\n!keep.local.py\n')
+            zf.writestr('repo/app/main.py', 'def main():\n    pass\n')
+            zf.writestr('repo/app/keep.local.py', 'x = 1\n')
+            zf.writestr('repo/app/tmp.local.py', 'x = 1\n')
+            zf.writestr('repo/scratch/notes.py', 'x = 1\n')
+            zf.writestr('repo/venv/lib/site.py', 'x = 1\n')
+            zf.writestr('repo/venv/lib/os.py', 'x = 1\n')
+            zf.writestr('repo/app/api_pb2.py', 'x = 1\n')
+            zf.writestr('repo/app/migration.py', '# Generated by Django 5.1\nx = 1\n')
+            zf.writestr('repo/app/Min.java', 'class Min {' + ' ' * 1200 + '}\n')
+            zf.writestr('repo/app/big.py', 'x = 1\n' * 300)
+            zf.writestr('repo/docs/conf.py', 'x = 1\n')
+        buffer.seek(0)
+        selection = FileSelection(exclude=['repo/docs/*'], max_file_bytes=1500)
+        extractor = CodebaseExtractor(buffer, selection)
+        sources = extractor.extract_sources()
+        self.assertEqual([name for name, _ in sources], ['repo/app/main.py', 'repo/app/keep.local.py'])
+        self.assertEqual(sorted(extractor.skipped), [
+            ('repo/app/Min.java', 'generated'),
+            ('repo/app/api_pb2.py', 'generated'),
+            ('repo/app/big.py', 'too_large'),
+            ('repo/app/migration.py', 'generated'),
+            ('repo/app/tmp.local.py', 'gitignore'),
+            ('repo/docs', 'excluded'),
+            ('repo/scratch', 'gitignore'),
+            ('repo/venv', 'vendored'),
+        ])
+        self.assertEqual(extractor.skipped_counts(), {'gitignore': 2, 'vendored': 1, 'generated': 3,
+                                                      'too_large': 1, 'excluded': 1})
+
+    def test_extract_prunes_skipped_directories(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            zip_path = os.path.join(tmpdir, 'test.zip')
+            with zipfile.ZipFile(zip_path, 'w') as zf:
+                zf.writestr('.gitignore', '/out\n')
+                zf.writestr('src/foo.py', 'def foo():\n    pass\n')
+                zf.writestr('src/.gitignore', 'gen_*.py\n')
+                zf.writestr('src/gen_models.py', 'x = 1\n')
+                zf.writestr('out/foo.py', 'x = 1\n')
+                zf.writestr('node_modules/pkg/setup.py', 'x = 1\n')
+            extractor = CodebaseExtractor(zip_path, FileSelection(skip_vendored=False))
+            files, temp_dir = extractor.extract()
+            try:
+                self.assertEqual([os.path.relpath(f, temp_dir) for f in files],
+                                 ['node_modules/pkg/setup.py', 'src/foo.py'])
+                self.assertEqual(extractor.skipped_counts(), {'gitignore': 2})
+            finally:
+                shutil.rmtree(temp_dir)
+
+    def test_vendored_names_inside_sources_are_kept(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as zf:
+            zf.writestr('repo-main/build/Gen.java', 'class Gen {}\n')
+            zf.writestr('repo-main/src/com/acme/build/Builder.java', 'class Builder {}\n')
+            zf.writestr('repo-main/pkg/vendor/client.py', 'x = 1\n')
+            zf.writestr('repo-main/tools/env/pyvenv.cfg', 'home = /usr/bin\n')
+            zf.writestr('repo-main/tools/env/lib/helper.py', 'x = 1\n')
+        buffer.seek(0)
+        extractor = CodebaseExtractor(buffer)
+        sources = extractor.extract_sources()
+        self.assertEqual([name for name, _ in sources],
+                         ['repo-main/src/com/acme/build/Builder.java', 'repo-main/pkg/vendor/client.py'])
+        self.assertEqual(sorted(extractor.skipped), [('repo-main/build', 'vendored'),
+                                                     ('repo-main/tools/env', 'vendored')])
+        with tempfile.TemporaryDirectory() as tmpdir:
+            zip_path = os.path.join(tmpdir, 'test.zip')
+            with open(zip_path, 'wb') as f:
+                f.write(buffer.getvalue())
+            extractor = CodebaseExtractor(zip_path)
+            files, temp_dir = extractor.extract()
+            try:
+                self.assertEqual([os.path.relpath(f, temp_dir) for f in files],
+                                 ['repo-main/pkg/vendor/client.py', 'repo-main/src/com/acme/build/Builder.java'])
+                self.assertEqual(extractor.skipped_counts(), {'vendored': 2})
+            finally:
+                shutil.rmtree(temp_dir)
+
+    def test_generated_markers_only_count_in_the_leading_comments(self):
+        selection = FileSelection()
+        for head in (b'# -*- coding: utf-8 -*-\n# Generated by the protocol buffer compiler.  DO NOT EDIT!\n',
+                     b'/*\n * Copyright 2024\n *\n * Code generated by openapi-generator.\n */\npackage api;\n',
+                     b'// @generated\npackage api\n'):
+            self.assertEqual(selection.content_reason(head), 'generated', head)
+        for head in (b'"""Helpers for the auto-generated API docs. DO NOT EDIT the output by hand."""\n',
+                     b'package tools;\n// Generated by the build when missing.\nclass Stub {}\n',
+                     b'import os\n\n# Generated by Django migrations are skipped elsewhere.\n'):
+            self.assertIsNone(selection.content_reason(head), head)
+
+    def test_selection_options(self):
+        selection = FileSelection.from_options({'skip_generated': False, 'exclude': ['docs/*']})
+        self.assertFalse(selection.skip_generated)
+        self.assertEqual(selection.exclude, ['docs/*'])
+        for options in ([], {'unknown': 1}, {'exclude': 'docs/*'}, {'gitignore': 'no'}, {'max_file_bytes': -1}):
+            with self.assertRaises(ValueError):
+                FileSelection.from_options(options)
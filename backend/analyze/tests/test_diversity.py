@@ -0,0 +1,92 @@
+from django.test import TestCase
+from unittest.mock import patch
+import numpy as np
+import random
+from ..questions.question_generator import ComponentSelector, LLMQuestionGenerator
+from ..search import diversity
+from ..search.diversity import NearDuplicateFilter, TfidfMatrix, select_diverse
+
+WORDS = ['get', 'set', 'user', 'config', 'load', 'parse', 'http', 'request', 'cache', 'file', 'path', 'token']
+
+
+def _function(name, parameters=None, docstring=None):
+    return {'type': 'function', 'name': name, 'full_name': name, 'parameters': parameters, 'docstring': docstring,
+            'file': 'mod.py', 'lineno': 1}
+
+
+class TestTfidfMatrix(TestCase):
+    def test_similarities_are_cosines(self):
+        matrix = TfidfMatrix.from_texts(['load user config', 'loadUserConfig', 'parse http request', ''])
+        similarities = matrix.similarities(0)
+        self.assertAlmostEqual(similarities[0], 1.0)
+        self.assertAlmostEqual(similarities[1], 1.0)
+        self.assertEqual(similarities[2], 0.0)
+        self.assertEqual(similarities[3], 0.0)
+
+    def test_chunked_build_matches_one_chunk(self):
+        texts = [' '.join(random.Random(i).choices(WORDS, k=4)) for i in range(50)]
+        whole = TfidfMatrix.from_texts(texts)
+        with patch.object(diversity, 'CHUNK_DOCUMENTS', 7):
+            chunked = TfidfMatrix.from_texts(texts)
+        for name in ('rows', 'columns', 'values'):
+            self.assertTrue(np.allclose(getattr(chunked, name), getattr(whole, name)), name)
+
+    def test_incremental_duplicate_filter_matches_a_rebuilt_matrix(self):
+        rng = random.Random(1)
+        texts = [' '.join(rng.choices(WORDS, k=3)) for _ in range(30)]
+        seen = NearDuplicateFilter(0.7)
+        for text in texts:
+            kept = list(seen.kept)
+            similarities = TfidfMatrix.from_texts(kept + [text]).similarities(len(kept))[:-1] if kept else [0]
+            self.assertEqual(seen.add(text), max(similarities) < 0.7, text)
+
+    def test_mmr_skips_near_duplicates(self):
+        components = [_function('load_config', ['path']), _function('load_config', ['path', 'encoding']),
+                      _function('load_config', ['stream']), _function('parse_request', ['body']),
+                      _function('render_template', ['name'])]
+        picked = select_diverse(TfidfMatrix.from_components(components), 3, relevance=[1.0, 0.9, 0.8, 0.1, 0.0])
+        self.assertEqual(picked, [0, 3, 4])
+        # Without diversity, only relevance counts.
+        picked = select_diverse(TfidfMatrix.from_components(components), 3, relevance=[1.0, 0.9, 0.8, 0.1, 0.0],
+                                diversity=0.0)
+        self.assertEqual(picked, [0, 1, 2])
+
+
+class TestDiverseSelection(TestCase):
+    def test_overloads_do_not_crowd_out_other_components(self):
+        random.seed(2)
+        selector = ComponentSelector(size=5)
+        for i in range(40):
+            selector.add(_function('convert', [f'value: Type{i}']))
+        for name in ('load_config', 'parse_request', 'render_template', 'send_email'):
+            selector.add(_function(name, ['x']))
+        names = [c['name'] for c in selector.selected()]
+        self.assertEqual(names.count('convert'), 1)
+        self.assertEqual(len(set(names)), 5)
+
+    def test_llm_rewordings_are_dropped(self):
+        seen = NearDuplicateFilter(0.85)
+        self.assertTrue(seen.add('What does the load_config function do?'))
+        self.assertFalse(seen.add('What does the function load_config do?'))
+        self.assertTrue(seen.add('What does the parse_request function do?'))
+        self.assertEqual(seen.kept, ['What does the load_config function do?',
+                                     'What does the parse_request function do?'])
+        merged = LLMQuestionGenerator._merge([
+            [{'question': 'How is the cache invalidated?'}, {'question': 'What does func0 do?'}],
+            [{'question': 'How is the cache invalidated ?'}, {'question': 'What does func1 do?'}],
+        ], 10, NearDuplicateFilter(0.85))
+        self.assertEqual([q['question'] for q in merged],
+                         ['How is the cache invalidated?', 'What does func1 do?', 'What does func0 do?'])
+
+    def test_selection_from_100k_components(self):
+        rng = random.Random(0)
+        components = [
+            _function(f'{rng.choice(WORDS)}_{rng.choice(WORDS)}{i % 50}', [f'{rng.choice(WORDS)}: str'],
+                      ' '.join(rng.choices(WORDS, k=5)) if i % 2 else None)
+            for i in range(100_000)
+        ]
+        picked = select_diverse(TfidfMatrix.from_components(components), 10, [rng.random() for _ in components])
+        self.assertEqual(len(set(picked)), 10)
+        # Each pick is the least similar to the earlier ones, so no two share both name words and parameter.
+        signatures = [(components[i]['name'].rstrip('0123456789'), components[i]['parameters'][0]) for i in picked]
+        self.assertEqual(len(set(signatures)), 10)
@@ -0,0 +1,105 @@
+from django.test import TestCase
+import textwrap
+from ..analysis import fallback
+from ..analysis.code_analyzer import CodeAnalyzer
+
+JAVA = textwrap.dedent('''
+    package demo;
+    /** Not a { brace */
+    public class Service<T> extends Base implements Runnable {
+        private static final String S = "class Fake { void no() {} }";
+        private int count = compute(3);
+        public Service(int n) { this.count = n; }
+        @Override
+        public void run() { if (ready) { start(); } }
+        public static <K, V> Map<K, List<V>> group(final List<V> items, @Nullable Function<V, K> key, int[] ids) {
+            return null;
+        }
+    }
+''')
+
+KOTLIN = textwrap.dedent('''
+    package demo
+    // class Commented
+    data class Point(val x: Int, val y: Int = 0)
+    class Service<T>(private val repo: Repo<T>) : Base(repo) {
+        /* fun hidden() */
+        fun load(id: Long, vararg names: String): List<T> { val s = "fun raw() {"; return emptyList() }
+        suspend fun <R> String.shout(times: Int): String = this
+    }
+''')
+
+NESTED = {
+    'Outer.java': textwrap.dedent('''
+        package demo;
+        interface Shape { double area(); }
+        enum Color { RED, GREEN; String hex() { return ""; } }
+        public class Outer {
+            void a() {}
+            class Inner { void b() {} interface Callback { void c(); } }
+            enum Mode { X; void d() {} }
+        }
+    '''),
+    'Outer.kt': textwrap.dedent('''
+        package demo
+        interface Shape { fun area(): Double }
+        enum class Color { RED; fun hex(): String = "" }
+        object Registry { fun get(): Int = 1 }
+        class Outer {
+            fun a() {}
+            class Inner { fun b() {} }
+            companion object { fun c() {} }
+        }
+    '''),
+}
+
+
+class TestFallbackExtractor(TestCase):
+    def test_java(self):
+        self.assertEqual(fallback.extract(JAVA, 'java'), [
+            ('class', 'Service', 'Service', 4, None),
+            ('function', 'run', 'Service.run', 9, []),
+            ('function', 'group', 'Service.group', 10, ['List items', 'Function key', 'int[] ids']),
+        ])
+
+    def test_kotlin(self):
+        self.assertEqual(fallback.extract(KOTLIN, 'kotlin'), [
+            ('class', 'Point', 'Point', 4, None),
+            ('class', 'Service', 'Service', 5, None),
+            ('function', 'load', 'Service.load', 7, ['id: Long', 'names: String']),
+            ('function', 'shout', 'Service.shout', 8, ['times: Int']),
+        ])
+
+    def test_kinds_and_names_match_the_full_parsers(self):
+        for path, source in NESTED.items():
+            parsed = CodeAnalyzer().analyze_source(path, source.encode())
+            scanned = CodeAnalyzer(max_parse_bytes=1).analyze_source(path, source.encode())
+            self.assertEqual([(c.type, c.full_name, c.lineno) for c in scanned],
+                             [(c.type, c.full_name, c.lineno) for c in parsed], path)
+
+
+class TestParseBudgets(TestCase):
+    def test_full_parse_within_budget(self):
+        analyzer = CodeAnalyzer()
+        components = analyzer.analyze_source('Service.java', JAVA.encode())
+        self.assertIsNone(analyzer.last_fallback)
+        self.assertEqual([c.full_name for c in components], ['Service', 'Service.run', 'Service.group'])
+
+    def test_large_file_uses_fallback(self):
+        analyzer = CodeAnalyzer(max_parse_bytes=100)
+        components = analyzer.analyze_source('src/Service.kt', KOTLIN.encode())
+        self.assertEqual(analyzer.last_fallback, 'size')
+        self.assertEqual([c.full_name for c in components], ['Point', 'Service', 'Service.load', 'Service.shout'])
+        self.assertEqual(components[0].file, 'src/Service.kt')
+
+    def test_slow_parse_uses_fallback(self):
+        analyzer = CodeAnalyzer(parse_timeout=1e-9)
+        components = analyzer.analyze_source('Service.java', JAVA.encode())
+        self.assertEqual(analyzer.last_fallback, 'timeout')
+        self.assertEqual([c.full_name for c in components], ['Service', 'Service.run', 'Service.group'])
+
+    def test_parse_error_uses_fallback(self):
+        analyzer = CodeAnalyzer()
+        components = analyzer.analyze_source('Broken.java', b'class Broken { void ok() {} int }')
+        self.assertEqual(analyzer.last_fallback, 'error')
+        self.assertEqual([c.full_name for c in components], ['Broken', 'Broken.ok'])
@@ -0,0 +1,112 @@
+from django.test import TestCase
+from unittest.mock import patch
+import asyncio
+import os
+import shutil
+import subprocess
+import tempfile
+from ..core.git import GitFetcher
+
+def _git(*args, cwd=None):
+    subprocess.run(['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com', *args],
+                   cwd=cwd, check=True, capture_output=True)
+
+def make_bare_repo(tmpdir, files):
+    """Create a bare repository with one commit of ``files`` and return its file:// URL."""
+    work = os.path.join(tmpdir, 'work')
+    os.makedirs(work)
+    _git('init', '--quiet', work)
+    for path, content in files.items():
+        full_path = os.path.join(work, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'w') as f:
+            f.write(content)
+    _git('add', '.', cwd=work)
+    _git('commit', '--quiet', '-m', 'Initial commit', cwd=work)
+    bare = os.path.join(tmpdir, 'repo.git')
+    _git('clone', '--quiet', '--bare', work, bare)
+    _git('config', 'uploadpack.allowFilter', 'true', cwd=bare)
+    return 'file://' + bare
+
+class TestGitFetcher(TestCase):
+    files = {'pkg/foo.py': 'def foo():\n    pass\n', 'src/Bar.kt': 'class Bar\n', 'assets/logo.png': 'PNG'}
+
+    def _checked_out(self, path):
+        found = []
+        for root, dirs, files in os.walk(path):
+            if '.git' in dirs:
+                dirs.remove('.git')
+            found += [os.path.relpath(os.path.join(root, f), path) for f in files]
+        return sorted(found)
+
+    def test_sparse_checkout_without_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            url = make_bare_repo(tmpdir, self.files)
+            path, cached = GitFetcher().fetch(url)
+            try:
+                self.assertFalse(cached)
+                self.assertEqual(self._checked_out(path), ['pkg/foo.py', 'src/Bar.kt'])
+            finally:
+                shutil.rmtree(path)
+
+    def test_async_checkout_matches_sync(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            url = make_bare_repo(tmpdir, self.files)
+            fetcher = GitFetcher()
+            sha = asyncio.run(fetcher.aresolve(url))
+            self.assertEqual(sha, fetcher.resolve(url))
+            path, cached = asyncio.run(fetcher.afetch(url, sha))
+            try:
+                self.assertFalse(cached)
+                self.assertEqual(self._checked_out(path), ['pkg/foo.py', 'src/Bar.kt'])
+            finally:
+                shutil.rmtree(path)
+
+    def test_async_failed_checkout_is_cleaned_up(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fetcher = GitFetcher(cache_dir=os.path.join(tmpdir, 'cache'))
+            with self.assertRaises(subprocess.CalledProcessError):
+                asyncio.run(fetcher.afetch('file://' + os.path.join(tmpdir, 'missing.git'), '0' * 40))
+            self.assertEqual(os.listdir(os.path.join(tmpdir, 'cache')), ['.lock'])
+
+    def test_cached_commit_skips_checkout(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            url = make_bare_repo(tmpdir, self.files)
+            fetcher = GitFetcher(cache_dir=os.path.join(tmpdir, 'cache'))
+            sha = fetcher.resolve(url)
+            path, cached = fetcher.fetch(url, sha)
+            self.assertTrue(cached)
+            with patch.object(GitFetcher, '_checkout') as checkout:
+                self.assertEqual(fetcher.fetch(url, sha), (path, True))
+            checkout.assert_not_called()
+            self.assertEqual(self._checked_out(path), ['pkg/foo.py', 'src/Bar.kt'])
+
+    def test_evicts_least_recently_used_checkout(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            first = make_bare_repo(os.path.join(tmpdir, 'first'), self.files)
+            second = make_bare_repo(os.path.join(tmpdir, 'second'), self.files)
+            fetcher = GitFetcher(cache_dir=os.path.join(tmpdir, 'cache'), max_bytes=1)
+            first_path, _ = fetcher.fetch(first)
+            fetcher.release(first_path)
+            second_path, _ = fetcher.fetch(second)
+            self.assertFalse(os.path.exists(first_path))
+            self.assertTrue(os.path.isdir(second_path))
+
+    def test_leased_checkout_is_not_evicted(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            first = make_bare_repo(os.path.join(tmpdir, 'first'), self.files)
+            second = make_bare_repo(os.path.join(tmpdir, 'second'), self.files)
+            third = make_bare_repo(os.path.join(tmpdir, 'third'), self.files)
+            cache_dir = os.path.join(tmpdir, 'cache')
+            fetcher = GitFetcher(cache_dir=cache_dir, max_bytes=1)
+            first_path, _ = fetcher.fetch(first)
+            # Another request, in this process or another one, is still analyzing the first checkout.
+            second_path, _ = GitFetcher(cache_dir=cache_dir, max_bytes=1).fetch(second)
+            self.assertTrue(os.path.isdir(first_path))
+            # A lease left behind by a process that died doesn't keep a checkout forever.
+            fetcher.release(first_path)
+            open(f'{first_path}.lease-{2 ** 22 + 1}-stale', 'w').close()
+            GitFetcher(cache_dir=cache_dir, max_bytes=1).fetch(third)
+            self.assertFalse(os.path.exists(first_path))
+            self.assertTrue(os.path.isdir(second_path))
+            self.assertFalse([name for name in os.listdir(cache_dir) if name.startswith('.evicted-')])
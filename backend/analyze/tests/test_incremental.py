@@ -0,0 +1,170 @@
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
+from unittest.mock import patch
+import os
+import tempfile
+from ..core.codebase import CodebaseExtractor
+from ..core.selection import FileSelection
+from ..models import AnalysisRun
+from ..pipeline import aanalyze_url, analyze_url
+from .test_git import _git, make_bare_repo
+
+def _components(run):
+    return [(c.file, c.type, c.full_name, c.lineno, c.docstring, c.parameters)
+            for c in run.components.order_by('id')]
+
+@override_settings(ANALYSIS_CACHE_PATH=None, GIT_CACHE_DIR=None)
+@patch.object(CodebaseExtractor, 'is_repo_url', return_value=True)
+class TestIncrementalAnalysis(TestCase):
+    def test_matches_full_analysis_of_new_commit(self, _):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            url = make_bare_repo(tmpdir, {
+                'pkg/a.py': 'class A:\n    pass\n',
+                'pkg/b.py': 'def b(x):\n    pass\n',
+                'src/C.java': 'class C { void run(int n) {} }\n',
+            })
+            analyze_url(url)
+            work = os.path.join(tmpdir, 'work')
+            with open(os.path.join(work, 'pkg/a.py'), 'w') as f:
+                f.write('class A:\n    def method(self):\n        """New method."""\n')
+            with open(os.path.join(work, 'pkg/d.py'), 'w') as f:
+                f.write('def d():\n    pass\n')
+            os.remove(os.path.join(work, 'pkg/b.py'))
+            _git('add', '-A', cwd=work)
+            _git('commit', '--quiet', '-m', 'Change', cwd=work)
+            _git('push', '--quiet', os.path.join(tmpdir, 'repo.git'), 'HEAD', cwd=work)
+
+            stages = {}
+            analyze_url(url, on_stage=lambda stage, status, info: stages.__setitem__(stage, info))
+            incremental_run = AnalysisRun.objects.latest('id')
+            analyze_url(url, incremental=False)
+            full_run = AnalysisRun.objects.latest('id')
+
+        self.assertTrue(stages['extract']['incremental'])
+        self.assertEqual((stages['extract']['files'], stages['extract']['deleted']), (2, 1))
+        self.assertEqual(stages['analyze']['reused'], 2)
+        self.assertEqual(incremental_run.commit, full_run.commit)
+        self.assertEqual(_components(incremental_run), _components(full_run))
+        self.assertEqual([c[2] for c in _components(full_run)], ['A', 'A.method', 'd', 'C', 'C.run'])
+
+    def test_async_pipeline_matches_sync(self, _):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            url = make_bare_repo(tmpdir, {'pkg/a.py': 'class A:\n    pass\n', 'src/C.java': 'class C { void run() {} }\n'})
+            questions = async_to_sync(aanalyze_url)(url)
+            first_run = AnalysisRun.objects.latest('id')
+            work = os.path.join(tmpdir, 'work')
+            with open(os.path.join(work, 'pkg/d.py'), 'w') as f:
+                f.write('def d():\n    pass\n')
+            _git('add', '-A', cwd=work)
+            _git('commit', '--quiet', '-m', 'Change', cwd=work)
+            _git('push', '--quiet', os.path.join(tmpdir, 'repo.git'), 'HEAD', cwd=work)
+
+            stages = {}
+            async_to_sync(aanalyze_url)(url, on_stage=lambda stage, status, info: stages.__setitem__(stage, info))
+            incremental_run = AnalysisRun.objects.latest('id')
+            analyze_url(url, incremental=False)
+            full_run = AnalysisRun.objects.latest('id')
+
+        self.assertEqual(len(questions), first_run.questions.count())
+        self.assertEqual([c[2] for c in _components(first_run)], ['A', 'C', 'C.run'])
+        self.assertTrue(stages['extract']['incremental'])
+        self.assertEqual(stages['analyze']['reused'], 3)
+        self.assertEqual(_components(incremental_run), _components(full_run))
+
+    def test_async_pipeline_falls_back_to_a_full_analysis(self, _):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            url = make_bare_repo(tmpdir, {'pkg/a.py': 'class A:\n    pass\n', 'pkg/b.py': 'class B:\n    pass\n'})
+            async_to_sync(aanalyze_url)(url)
+            work = os.path.join(tmpdir, 'work')
+            with open(os.path.join(work, '.gitignore'), 'w') as f:
+                f.write('b.py\n')
+            _git('add', '-A', cwd=work)
+            _git('commit', '--quiet', '-m', 'Ignore b', cwd=work)
+            _git('push', '--quiet', os.path.join(tmpdir, 'repo.git'), 'HEAD', cwd=work)
+            stages = {}
+            async_to_sync(aanalyze_url)(url, on_stage=lambda stage, status, info: stages.__setitem__(stage, info))
+        self.assertNotIn('incremental', stages['extract'])
+        self.assertEqual([c[2] for c in _components(AnalysisRun.objects.latest('id'))], ['A'])
+
+    def test_runs_of_another_selection_are_not_reused(self, _):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            url = make_bare_repo(tmpdir, {
+                'pkg/a.py': 'class A:\n    pass\n',
+                'pkg/b.py': 'class B:\n    pass\n',
+            })
+            analyze_url(url, selection=FileSelection(exclude=['pkg/b.py']))
+            work = os.path.join(tmpdir, 'work')
+            with open(os.path.join(work, 'pkg/c.py'), 'w') as f:
+                f.write('class C:\n    pass\n')
+            _git('add', '-A', cwd=work)
+            _git('commit', '--quiet', '-m', 'Change', cwd=work)
+            _git('push', '--quiet', os.path.join(tmpdir, 'repo.git'), 'HEAD', cwd=work)
+
+            stages = {}
+            analyze_url(url, on_stage=lambda stage, status, info: stages.__setitem__(stage, info))
+            default_run = AnalysisRun.objects.latest('id')
+            # The same custom selection can build on its own earlier run.
+            analyze_url(url, selection=FileSelection(exclude=['pkg/b.py']),
+                        on_stage=lambda stage, status, info: stages.__setitem__(stage, info))
+            custom_run = AnalysisRun.objects.latest('id')
+
+        self.assertEqual([c[2] for c in _components(default_run)], ['A', 'B', 'C'])
+        self.assertTrue(stages['extract']['incremental'])
+        self.assertEqual([c[2] for c in _components(custom_run)], ['A', 'C'])
+
+    def test_changed_files_are_selected_like_a_full_analysis(self, _):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            url = make_bare_repo(tmpdir, {
+                '.gitignore': 'scratch/\n',
+                'pkg/a.py': 'class A:\n    pass\n',
+            })
+            analyze_url(url)
+            work = os.path.join(tmpdir, 'work')
+            for path, source in (('scratch/tmp.py', 'class Tmp:\n    pass\n'),
+                                 ('pkg/gen.py', '# Generated by a tool. DO NOT EDIT.\nclass Gen:\n    pass\n'),
+                                 ('pkg/b.py', 'class B:\n    pass\n')):
+                os.makedirs(os.path.dirname(os.path.join(work, path)), exist_ok=True)
+                with open(os.path.join(work, path), 'w') as f:
+                    f.write(source)
+            # A file that becomes generated loses the components it had.
+            with open(os.path.join(work, 'pkg/a.py'), 'w') as f:
+                f.write('# Generated by a tool. DO NOT EDIT.\nclass A:\n    pass\n')
+            _git('add', '-f', '-A', cwd=work)
+            _git('commit', '--quiet', '-m', 'Change', cwd=work)
+            _git('push', '--quiet', os.path.join(tmpdir, 'repo.git'), 'HEAD', cwd=work)
+
+            stages = {}
+            analyze_url(url, on_stage=lambda stage, status, info: stages.__setitem__(stage, info))
+            incremental_run = AnalysisRun.objects.latest('id')
+            analyze_url(url, incremental=False)
+            full_run = AnalysisRun.objects.latest('id')
+
+        self.assertTrue(stages['extract']['incremental'])
+        self.assertEqual(stages['extract']['skipped'], {'gitignore': 1, 'generated': 2})
+        self.assertEqual([c[2] for c in _components(full_run)], ['B'])
+        self.assertEqual(_components(incremental_run), _components(full_run))
+
+    def test_full_analysis_when_the_selection_files_or_analyzer_change(self, _):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            url = make_bare_repo(tmpdir, {'pkg/a.py': 'class A:\n    pass\n', 'pkg/b.py': 'class B:\n    pass\n'})
+            analyze_url(url)
+            work = os.path.join(tmpdir, 'work')
+            with open(os.path.join(work, '.gitignore'), 'w') as f:
+                f.write('b.py\n')
+            _git('add', '-A', cwd=work)
+            _git('commit', '--quiet', '-m', 'Ignore b', cwd=work)
+            _git('push', '--quiet', os.path.join(tmpdir, 'repo.git'), 'HEAD', cwd=work)
+            stages = {}
+            analyze_url(url, on_stage=lambda stage, status, info: stages.__setitem__(stage, info))
+            self.assertNotIn('incremental', stages['extract'])
+            self.assertEqual([c[2] for c in _components(AnalysisRun.objects.latest('id'))], ['A'])
+
+            AnalysisRun.objects.update(analyzer_version=0)
+            with open(os.path.join(work, 'pkg/c.py'), 'w') as f:
+                f.write('class C:\n    pass\n')
+            _git('add', '-A', cwd=work)
+            _git('commit', '--quiet', '-m', 'Add c', cwd=work)
+            _git('push', '--quiet', os.path.join(tmpdir, 'repo.git'), 'HEAD', cwd=work)
+            stages = {}
+            analyze_url(url, on_stage=lambda stage, status, info: stages.__setitem__(stage, info))
+            self.assertNotIn('incremental', stages['extract'])
@@ -0,0 +1,42 @@
+from django.test import TestCase
+from ..questions.question_generator import RuleBasedQuestionGenerator
+from ..search.inverted_index import FocusRanker, tokenize
+
+
+def _component(name, full_name=None, docstring=None, parameters=None, type='function'):
+    return {'type': type, 'name': name, 'full_name': full_name or name, 'docstring': docstring,
+            'parameters': parameters, 'file': 'mod.py', 'lineno': 1}
+
+
+class TestTokenize(TestCase):
+    def test_splits_identifiers(self):
+        self.assertEqual(tokenize('parse_json2'), ['parse', 'json', '2'])
+        self.assertEqual(tokenize('HTTPServer.handleRequest'), ['http', 'server', 'handle', 'request'])
+        self.assertEqual(tokenize('Reads the *config* file.'), ['reads', 'the', 'config', 'file'])
+
+
+def _top(components, query):
+    ranker = FocusRanker(query)
+    for component in components:
+        ranker.add(component)
+    return ranker.top()
+
+
+class TestFocusRanker(TestCase):
+    def test_ranks_name_matches_above_docstring_mentions(self):
+        components = [
+            _component('load', docstring='Load the settings; see ConfigParser for the format.'),
+            _component('ConfigParser', type='class', docstring='Parses configuration files.'),
+            _component('save', docstring='Unrelated.'),
+            _component('parse_config', full_name='ConfigParser.parse_config', parameters=['self', 'path']),
+        ]
+        names = [c['name'] for c in _top(components, 'config parser')]
+        self.assertEqual(names, ['ConfigParser', 'parse_config', 'load'])
+        self.assertEqual(_top(components, 'missing'), [])
+
+    def test_focus_selects_matching_components(self):
+        components = [_component(f'func_{i}', docstring='Does something.') for i in range(500)]
+        components.append(_component('tokenize_source', docstring='Split source into tokens.'))
+        questions = RuleBasedQuestionGenerator.generate(components, focus='tokenize')
+        self.assertEqual({q['component'] for q in questions}, {'tokenize_source'})
+        self.assertEqual(len(questions), 10)
@@ -0,0 +1,89 @@
+from django.test import TransactionTestCase, override_settings
+import os
+import tempfile
+import time
+from unittest.mock import patch
+from ..analysis.code_analyzer import CodeAnalyzer
+from ..models import AnalysisJob
+from .test_views import _zip_upload
+
+@override_settings(ANALYSIS_CACHE_PATH=None)
+class TestAnalysisJobs(TransactionTestCase):
+    def _wait_for(self, job_id, timeout=10):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            data = self.client.get(f'/analyze/jobs/{job_id}/').json()
+            if data['status'] in (AnalysisJob.SUCCEEDED, AnalysisJob.FAILED):
+                return data
+            time.sleep(0.05)
+        self.fail(f'Job {job_id} did not finish')
+
+    def test_file_job_reports_stages_and_questions(self):
+        upload = _zip_upload({'pkg/foo.py': 'class Foo:\n    def bar(self):\n        pass\n'})
+        response = self.client.post('/analyze/jobs/file/', {'file': upload})
+        self.assertEqual(response.status_code, 202)
+        data = self._wait_for(response.json()['job_id'])
+        self.assertEqual(data['status'], AnalysisJob.SUCCEEDED)
+        self.assertEqual(len(data['questions']), 10)
+        self.assertEqual(list(data['stages']), ['extract', 'analyze', 'generate', 'persist'])
+        self.assertEqual(data['stages']['analyze']['components'], 2)
+        self.assertTrue(all(stage['status'] == 'done' for stage in data['stages'].values()))
+
+    def test_failed_job_reports_error(self):
+        response = self.client.post('/analyze/jobs/url/', {'url': 'not_a_zip_or_github'},
+                                    content_type='application/json')
+        data = self._wait_for(response.json()['job_id'])
+        self.assertEqual(data['status'], AnalysisJob.FAILED)
+        self.assertIn('GitHub repo URL', data['error'])
+
+    def test_unknown_job(self):
+        response = self.client.get('/analyze/jobs/00000000-0000-0000-0000-000000000000/')
+        self.assertEqual(response.status_code, 404)
+
+    def _wait_for_batch(self, batch_id, timeout=10):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            data = self.client.get(f'/analyze/batches/{batch_id}/').json()
+            if data['status'] == 'done':
+                return data
+            time.sleep(0.05)
+        self.fail(f'Batch {batch_id} did not finish')
+
+    def test_batch_parses_shared_files_once(self):
+        shared = 'class Vendored:\n    def helper(self):\n        pass\n'
+        first = {'lib/shared.py': shared, 'app/main.py': 'def first():\n    pass\n'}
+        second = {'lib/shared.py': shared, 'app/main.py': 'def second():\n    pass\n'}
+        parse = CodeAnalyzer._analyze_source
+        parsed = []
+        def counting_parse(analyzer, language, file_path, data):
+            parsed.append(data)
+            return parse(analyzer, language, file_path, data)
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                override_settings(ANALYSIS_CACHE_PATH=os.path.join(tmpdir, 'cache.sqlite3')), \
+                patch.object(CodeAnalyzer, '_analyze_source', counting_parse):
+            response = self.client.post('/analyze/batches/', {
+                'file': [_zip_upload(first, 'first.zip'), _zip_upload(second, 'second.zip'),
+                         _zip_upload(first, 'again.zip')],
+            })
+            self.assertEqual(response.status_code, 202)
+            items = response.json()['items']
+            data = self._wait_for_batch(response.json()['batch_id'])
+        self.assertEqual([item['source'] for item in items], ['first.zip', 'second.zip', 'again.zip'])
+        self.assertEqual(items[2]['job_id'], items[0]['job_id'])
+        self.assertEqual(data['counts'], {AnalysisJob.SUCCEEDED: 2})
+        self.assertTrue(all(len(job['questions']) == 10 for job in data['jobs']))
+        self.assertEqual(len(parsed), 3)
+
+    def test_batch_reports_failed_items(self):
+        response = self.client.post('/analyze/batches/', {'urls': ['not_a_zip_or_github']},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        data = self._wait_for_batch(response.json()['batch_id'])
+        self.assertEqual(data['counts'], {AnalysisJob.FAILED: 1})
+        self.assertIn('GitHub repo URL', data['jobs'][0]['error'])
+
+    def test_empty_and_unknown_batches(self):
+        response = self.client.post('/analyze/batches/', {'urls': []}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/analyze/batches/00000000-0000-0000-0000-000000000000/')
+        self.assertEqual(response.status_code, 404)
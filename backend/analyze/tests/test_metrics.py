@@ -0,0 +1,63 @@
+from django.core.cache import caches
+import os
+import tempfile
+from django.test import TestCase, override_settings
+from ..analysis.parallel import iter_analyze_files
+from ..metrics import MetricsRegistry, registry
+from .test_views import _zip_upload
+
+
+class TestMetricsRegistry(TestCase):
+    def test_render_prometheus_text_format(self):
+        metrics = MetricsRegistry()
+        metrics.inc('analysis_files_total', language='python')
+        metrics.inc('analysis_files_total', 2, language='python')
+        metrics.observe('analysis_stage_seconds', 0.02, stage='analyze')
+        metrics.observe('analysis_stage_seconds', 3.0, stage='analyze')
+        text = metrics.render()
+        self.assertIn('# TYPE analysis_files_total counter', text)
+        self.assertIn('analysis_files_total{language="python"} 3\n', text)
+        self.assertIn('analysis_stage_seconds_bucket{stage="analyze",le="0.01"} 0\n', text)
+        self.assertIn('analysis_stage_seconds_bucket{stage="analyze",le="0.025"} 1\n', text)
+        self.assertIn('analysis_stage_seconds_bucket{stage="analyze",le="+Inf"} 2\n', text)
+        self.assertIn('analysis_stage_seconds_sum{stage="analyze"} 3.02\n', text)
+        self.assertIn('analysis_stage_seconds_count{stage="analyze"} 2\n', text)
+
+
+@override_settings(ANALYSIS_CACHE_PATH=None)
+class TestInstrumentedViews(TestCase):
+    def setUp(self):
+        registry.reset()
+        caches['results'].clear()
+
+    def test_server_timing_and_metrics(self):
+        upload = _zip_upload({
+            'pkg/foo.py': 'class Foo:\n    def bar(self):\n        pass\n',
+            'pkg/broken.py': 'def broken(:\n',
+            'pkg/Main.java': 'class Main { void run() {} }\n',
+            'pkg/Broken.java': 'class Broken { void ok() {} int }\n',
+        })
+        response = self.client.post('/analyze/file/', {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        stages = [entry.split(';')[0] for entry in response['Server-Timing'].split(', ')]
+        self.assertEqual(stages, ['extract', 'analyze', 'generate', 'persist'])
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode('utf-8')
+        self.assertIn('analysis_files_total{language="python"} 2\n', text)
+        self.assertIn('analysis_files_total{language="java"} 2\n', text)
+        self.assertIn('analysis_parse_failures_total{language="python"} 1\n', text)
+        self.assertIn('analysis_components_total{language="java"} 4\n', text)
+        self.assertIn('analysis_parse_fallbacks_total{language="java",reason="error"} 1\n', text)
+        self.assertIn('analysis_stage_seconds_count{stage="analyze"} 1\n', text)
+
+    def test_parse_cache_lookups(self):
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                override_settings(ANALYSIS_CACHE_PATH=os.path.join(tmpdir, 'cache.sqlite3')):
+            for _ in range(2):
+                list(iter_analyze_files([('a.py', b'def f():\n    pass\n')], threshold=10))
+        text = registry.render()
+        self.assertIn('analysis_parse_cache_lookups_total{language="python",result="miss"} 1\n', text)
+        self.assertIn('analysis_parse_cache_lookups_total{language="python",result="hit"} 1\n', text)
+        self.assertIn('analysis_extracted_bytes_total ', text)
@@ -0,0 +1,76 @@
+from django.apps import apps
+from django.test import TestCase, override_settings
+import os
+import tempfile
+from ..analysis import parallel
+from ..analysis.cache import ParseCache
+from ..analysis.parallel import analyze_files, get_warm_pool, shutdown_warm_pool, start_warm_pool
+
+@override_settings(ANALYSIS_CACHE_PATH=None)
+class TestAnalyzeFiles(TestCase):
+    def _write_files(self, tmpdir, count):
+        files = []
+        for i in range(count):
+            path = os.path.join(tmpdir, f'mod{i}.py')
+            with open(path, 'w') as f:
+                f.write(f'class Class{i}:\n    def method{i}(self, x):\n        pass\n')
+            files.append(path)
+        broken = os.path.join(tmpdir, 'broken.py')
+        with open(broken, 'w') as f:
+            f.write('def broken(:\n')
+        files.insert(count // 2, broken)
+        return files
+
+    def test_parallel_matches_serial_order(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            files = self._write_files(tmpdir, 12)
+            serial = analyze_files(files, temp_dir=tmpdir, workers=1)
+            parallel = analyze_files(files, temp_dir=tmpdir, workers=3, threshold=1)
+        serial_names = [(c.file, c.full_name, c.lineno) for c in serial]
+        parallel_names = [(c.file, c.full_name, c.lineno) for c in parallel]
+        self.assertEqual(serial_names, parallel_names)
+        self.assertEqual(len(parallel_names), 24)
+        self.assertEqual(parallel_names[0], ('mod0.py', 'Class0', 1))
+
+    def test_broken_file_is_isolated(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            files = self._write_files(tmpdir, 2)
+            components = analyze_files(files, temp_dir=tmpdir, workers=2, threshold=1)
+        self.assertEqual([c.full_name for c in components],
+                         ['Class0', 'Class0.method0', 'Class1', 'Class1.method1'])
+
+    def test_worker_cache_hits_are_written_when_the_pool_shuts_down(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'cache.sqlite3')
+            files = self._write_files(tmpdir, 6)
+            with override_settings(ANALYSIS_CACHE_PATH=path):
+                analyze_files(files, temp_dir=tmpdir, workers=1)
+                cache = ParseCache(path)
+                cache.conn.execute('UPDATE entries SET last_used = 0')
+                analyze_files(files, temp_dir=tmpdir, workers=2, threshold=1)
+            unused = cache.conn.execute('SELECT count(*) FROM entries WHERE last_used = 0').fetchone()[0]
+            cache.close()
+        self.assertEqual(unused, 0)
+
+    @override_settings(ANALYSIS_WARM_POOL=True)
+    def test_warm_pool_is_shared_between_analyses(self):
+        self.addCleanup(shutdown_warm_pool)
+        pool = get_warm_pool(workers=2)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            files = self._write_files(tmpdir, 4)
+            serial = analyze_files(files, temp_dir=tmpdir, workers=1)
+            warm = analyze_files(files, temp_dir=tmpdir, workers=2, threshold=1)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            other = analyze_files(self._write_files(tmpdir, 1), temp_dir=tmpdir, workers=2, threshold=1)
+        self.assertIs(get_warm_pool(), pool)
+        self.assertEqual([(c.file, c.full_name) for c in warm], [(c.file, c.full_name) for c in serial])
+        self.assertEqual([c.file for c in other], ['mod0.py', 'mod0.py'])
+
+    @override_settings(ANALYSIS_WARM_POOL=True, ANALYSIS_WORKERS=1)
+    def test_warm_pool_is_only_started_by_the_server(self):
+        self.addCleanup(shutdown_warm_pool)
+        shutdown_warm_pool()
+        apps.get_app_config('analyze').ready()
+        self.assertIsNone(parallel._warm_pool)
+        start_warm_pool()
+        self.assertIsNotNone(parallel._warm_pool)
@@ -0,0 +1,52 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from ..analysis.records import ComponentRecord
+from ..models import Question
+from ..persistence import save_run
+
+def _components(count):
+    return [ComponentRecord(type='function', name=f'func{i}', file=f'mod{i % 2}.py', full_name=f'func{i}',
+                            lineno=i + 1, parameters=['x']) for i in range(count)]
+
+QUESTIONS = [
+    {'question': 'Q1', 'answer': 'A1', 'difficulty': 'beginner', 'component': 'func0', 'type': 'function'},
+    {'question': 'Q2', 'answer': 'A2', 'difficulty': 'advanced'},
+]
+
+class TestSaveRun(TestCase):
+    def test_bulk_creates_in_batches(self):
+        with CaptureQueriesContext(connection) as queries:
+            run = save_run('https://github.com/example/repo', _components(5), QUESTIONS, commit='abc', batch_size=2)
+        component_inserts = [q for q in queries if q['sql'].startswith('INSERT INTO "analyze_component"')]
+        self.assertEqual(len(component_inserts), 3)
+        self.assertEqual(run.components.count(), 5)
+        self.assertEqual(run.questions.count(), 2)
+        self.assertEqual(Question.objects.get(question='Q2').component, '')
+        self.assertEqual(run.repository.source, 'https://github.com/example/repo')
+
+class TestRunViews(TestCase):
+    def setUp(self):
+        self.run = save_run('repo.zip', _components(5), QUESTIONS)
+        save_run('other.zip', _components(1), [])
+
+    def test_runs_filtered_by_repository(self):
+        data = self.client.get('/analyze/runs/', {'repository': 'repo.zip'}).json()
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(data['results'][0]['id'], self.run.pk)
+
+    def test_components_paginated_and_filtered(self):
+        url = f'/analyze/runs/{self.run.pk}/components/'
+        data = self.client.get(url, {'page_size': 2, 'page': 2}).json()
+        self.assertEqual((data['count'], data['page'], data['num_pages']), (5, 2, 3))
+        self.assertEqual([c['name'] for c in data['results']], ['func2', 'func3'])
+        data = self.client.get(url, {'file': 'mod1.py'}).json()
+        self.assertEqual([c['name'] for c in data['results']], ['func1', 'func3'])
+
+    def test_questions_filtered_by_difficulty(self):
+        data = self.client.get(f'/analyze/runs/{self.run.pk}/questions/', {'difficulty': 'advanced'}).json()
+        self.assertEqual([q['question'] for q in data['results']], ['Q2'])
+
+    def test_invalid_page_size(self):
+        response = self.client.get('/analyze/runs/', {'page_size': 'many'})
+        self.assertEqual(response.status_code, 400)
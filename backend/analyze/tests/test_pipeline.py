@@ -0,0 +1,61 @@
+from django.test import TestCase, override_settings
+import random
+import tempfile
+import tracemalloc
+from ..benchmarks.synthetic import SyntheticCodebase
+from ..pipeline import analyze_codebase
+from ..questions.question_generator import ComponentSelector, RuleBasedQuestionGenerator
+
+
+class TestComponentSelector(TestCase):
+    def test_reservoir_sample_is_uniform(self):
+        random.seed(1)
+        counts = [0] * 50
+        for _ in range(2000):
+            selector = ComponentSelector(size=5)
+            for i in range(50):
+                selector.add({'name': f'c{i}'})
+            for component in selector.selected():
+                counts[int(component['name'][1:])] += 1
+        # Each component is picked 2000 * 5 / 50 = 200 times on average.
+        self.assertGreater(min(counts), 140)
+        self.assertLess(max(counts), 260)
+
+    def test_generate_consumes_an_iterator_once(self):
+        components = ({'type': 'function', 'name': f'func_{i}', 'full_name': f'func_{i}', 'docstring': None,
+                       'parameters': None, 'file': 'mod.py', 'lineno': i} for i in range(1000))
+        questions = RuleBasedQuestionGenerator.generate(components)
+        self.assertEqual(len(questions), 10)
+        self.assertEqual(len({q['component'] for q in questions}), 10)
+
+
+@override_settings(ANALYSIS_CACHE_PATH=None, ANALYSIS_PARALLEL_THRESHOLD=10 ** 6)
+class TestStreamingPipeline(TestCase):
+    def _peak(self, paths, tmpdir, **options):
+        tracemalloc.start()
+        try:
+            questions = analyze_codebase(paths, tmpdir, **options)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(len(questions), 10)
+        return peak
+
+    def test_memory_does_not_grow_with_the_codebase(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = SyntheticCodebase(files=1000, classes=2, methods=5, languages=('python',)).write(tmpdir)
+            # Compiling interns every identifier for good; do it once so that only the pipeline is measured.
+            analyze_codebase(paths, tmpdir)
+            small = self._peak(paths[:200], tmpdir)
+            large = self._peak(paths, tmpdir)
+        self.assertLess(large, small * 1.5)
+
+    @override_settings(ANALYSIS_SYMBOL_TABLE_SPILL=1000)
+    def test_memory_stays_bounded_when_storing_the_run(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = SyntheticCodebase(files=1000, classes=2, methods=5, languages=('python',)).write(tmpdir)
+            analyze_codebase(paths, tmpdir, source='repo')
+            small = self._peak(paths[:200], tmpdir, source='repo')
+            large = self._peak(paths, tmpdir, source='repo')
+        # The cross-reference index stored with the run still grows, by a name and a few array entries a component.
+        self.assertLess(large, small * 1.75)
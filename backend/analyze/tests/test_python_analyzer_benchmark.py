@@ -0,0 +1,67 @@
+from django.test import TestCase
+import ast
+import tracemalloc
+from ..analysis.code_analyzer import CodeAnalyzer
+from ..analysis.records import ComponentRecord
+
+
+def _generate_module(classes=100, methods=20):
+    lines = []
+    for i in range(classes):
+        lines.append(f'class Generated{i}(Base):')
+        lines.append(f'    """Generated class {i}."""')
+        for j in range(methods):
+            lines.append(f'    def method_{j}(self, a, b=None, *, flag=False):')
+            lines.append(f'        value = {{"key": [a, b, {j}], "other": (a or b) + {i} * {j}}}')
+            lines.append(f'        return [item for item in value["key"] if item is not None and flag]')
+    return '\n'.join(lines) + '\n'
+
+
+def _two_pass_analyze(tree):
+    # The previous implementation: a parent map over every node plus a second full walk.
+    components = []
+    parent_map = {}
+    for parent in ast.walk(tree):
+        for child in ast.iter_child_nodes(parent):
+            parent_map[child] = parent
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ClassDef):
+            components.append(ComponentRecord(type='class', name=node.name, docstring=ast.get_docstring(node),
+                                              file='generated.py', lineno=node.lineno, full_name=node.name))
+        elif isinstance(node, ast.FunctionDef):
+            parent_class = None
+            parent = parent_map.get(node)
+            while parent:
+                if isinstance(parent, ast.ClassDef):
+                    parent_class = parent.name
+                    break
+                parent = parent_map.get(parent)
+            full_name = f"{parent_class}.{node.name}" if parent_class else node.name
+            components.append(ComponentRecord(type='function', name=node.name, docstring=ast.get_docstring(node),
+                                              file='generated.py', lineno=node.lineno, full_name=full_name,
+                                              parameters=[arg.arg for arg in node.args.args]))
+    return components
+
+
+def _single_pass_analyze(tree):
+    components = []
+    CodeAnalyzer()._visit_python_scope(tree, (), 'generated.py', components, {}, [])
+    return components
+
+
+def _measure(func, *args):
+    # Peak memory is the same from run to run, unlike the wall-clock time of either pass.
+    tracemalloc.start()
+    result = func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak
+
+
+class TestPythonAnalyzerBenchmark(TestCase):
+    def test_single_pass_visitor_uses_less_memory_than_two_pass_walk(self):
+        tree = ast.parse(_generate_module())
+        legacy, legacy_peak = _measure(_two_pass_analyze, tree)
+        current, current_peak = _measure(_single_pass_analyze, tree)
+        self.assertEqual(len(current), len(legacy))
+        self.assertLess(current_peak, legacy_peak)
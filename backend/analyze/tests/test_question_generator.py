@@ -1,4 +1,12 @@
+from django.core.cache import caches
 from django.test import TestCase
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock, patch
+import asyncio
+import json
+import re
+import threading
+import time
 from ..questions import question_generator
 
 class TestRuleBasedQuestionGenerator(TestCase):
@@ -20,3 +28,183 @@ class TestRuleBasedQuestionGenerator(TestCase):
         questions = question_generator.RuleBasedQuestionGenerator.generate(components, focus='my_func')
         self.assertTrue(all('my_func' in q['component'] or 'my_func' in q['question'] for q in questions))
 
+class TestLLMQuestionGenerator(TestCase):
+    summaries = [{'summary': "Class 'MyClass' in foo.py (line 1): A test class."}]
+
+    def setUp(self):
+        caches['llm'].clear()
+        patcher = patch('openai.Client')
+        self.client = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        content = Mock(text='[{"question": "Q?", "answer": "A.", "difficulty": "beginner"}]')
+        self.client.responses.create.return_value = Mock(output=[Mock(content=[content])])
+
+    def test_repeated_prompt_is_served_from_cache(self):
+        generator = question_generator.LLMQuestionGenerator(openai_api_key='test')
+        first = generator.generate(self.summaries, focus='testing')
+        second = generator.generate(self.summaries, focus='testing')
+        self.assertEqual(first, second)
+        self.assertEqual(self.client.responses.create.call_count, 1)
+        generator.generate(self.summaries, focus='other')
+        self.assertEqual(self.client.responses.create.call_count, 2)
+        self.assertEqual(generator.cache.stats(), {'hits': 1, 'misses': 2, 'hit_rate': 1 / 3})
+
+    def test_bypass_cache(self):
+        generator = question_generator.LLMQuestionGenerator(openai_api_key='test')
+        generator.generate(self.summaries)
+        generator.generate(self.summaries, use_cache=False)
+        self.assertEqual(self.client.responses.create.call_count, 2)
+
+    def test_unparseable_response_is_not_cached(self):
+        self.client.responses.create.return_value.output[0].content[0].text = 'Sorry, no JSON here.'
+        generator = question_generator.LLMQuestionGenerator(openai_api_key='test')
+        questions = generator.generate(self.summaries)
+        self.assertEqual(questions[0]['question'], 'Failed to parse LLM response.')
+        generator.generate(self.summaries)
+        self.assertEqual(self.client.responses.create.call_count, 2)
+
+    def test_responses_that_are_not_a_list_of_questions(self):
+        parse = question_generator.LLMQuestionGenerator._parse_questions
+        question = {'question': 'Why?', 'answer': 'Because.', 'difficulty': 'beginner'}
+        self.assertEqual(parse(json.dumps(question)), [question])
+        self.assertIsNone(parse('42'))
+        self.assertIsNone(parse('"just text"'))
+
+class StubResponsesHandler(BaseHTTPRequestHandler):
+    """Answers POST /v1/responses like the OpenAI Responses API, with one question per summary line."""
+
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            server.requests += 1
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        prompt = body['input'][1]['content'][0]['text']
+        count = int(re.search(r'a list of (\d+)', prompt).group(1))
+        names = re.findall(r"^- \w+ '(\w+)", prompt, re.MULTILINE)
+        questions = [{'question': f'What does {name} do?', 'answer': '...', 'difficulty': 'beginner'}
+                     for name in names[:count]]
+        # Every chunk also repeats a generic question that the merge must deduplicate.
+        questions.append({'question': 'What is this codebase about?', 'answer': '...', 'difficulty': 'beginner'})
+        if body.get('stream'):
+            with server.lock:
+                server.in_flight -= 1
+            return self._stream(json.dumps(questions))
+        time.sleep(0.05)
+        data = json.dumps({
+            'id': 'resp_stub', 'object': 'response', 'created_at': 0, 'model': body['model'], 'status': 'completed',
+            'output': [{'type': 'message', 'id': 'msg_stub', 'role': 'assistant', 'status': 'completed',
+                        'content': [{'type': 'output_text', 'text': json.dumps(questions), 'annotations': []}]}],
+            'parallel_tool_calls': False, 'tool_choice': 'auto', 'tools': [],
+        }).encode('utf-8')
+        with server.lock:
+            server.in_flight -= 1
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, text):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        self.server.finished = False
+        for i, start in enumerate(range(0, len(text), 16)):
+            self._send_event('response.output_text.delta', {
+                'item_id': 'msg_stub', 'output_index': 0, 'content_index': 0, 'delta': text[start:start + 16],
+                'sequence_number': i, 'logprobs': [],
+            })
+            time.sleep(0.01)
+        self.server.finished = True
+        self._send_event('response.completed', {'sequence_number': i + 1, 'response': {
+            'id': 'resp_stub', 'object': 'response', 'created_at': 0, 'model': 'stub', 'status': 'completed',
+            'output': [], 'parallel_tool_calls': False, 'tool_choice': 'auto', 'tools': [],
+        }})
+
+    def _send_event(self, event_type, data):
+        data = json.dumps({'type': event_type, **data})
+        self.wfile.write(f'event: {event_type}\ndata: {data}\n\n'.encode('utf-8'))
+
+    def log_message(self, *args):
+        pass
+
+class TestLLMQuestionGeneratorMapReduce(TestCase):
+    def setUp(self):
+        caches['llm'].clear()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubResponsesHandler)
+        self.server.lock = threading.Lock()
+        self.server.in_flight = self.server.max_in_flight = self.server.requests = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base_url = f'http://127.0.0.1:{self.server.server_address[1]}/v1'
+
+    def test_chunks_are_requested_concurrently_and_merged(self):
+        summaries = [{'summary': f"Function 'func{i}(x)' in mod{i}.py (line 1): Does thing {i}."} for i in range(40)]
+        generator = question_generator.LLMQuestionGenerator(
+            openai_api_key='test', base_url=self.base_url, chunk_token_budget=60, max_concurrency=3)
+        chunks = generator._chunk([f"- {s['summary']}" for s in summaries], 60)
+        questions = generator.generate(summaries)
+        self.assertEqual(len(chunks), 10)
+        self.assertEqual(self.server.requests, 10)
+        self.assertLessEqual(self.server.max_in_flight, 3)
+        self.assertGreater(self.server.max_in_flight, 1)
+        texts = [q['question'] for q in questions]
+        self.assertEqual(len(texts), 10)
+        self.assertEqual(len(set(texts)), 10)
+        # The picks are spread over the whole codebase, not just its first chunks.
+        self.assertIn('What does func36 do?', texts)
+
+    def test_small_codebase_uses_a_single_request(self):
+        summaries = [{'summary': "Class 'MyClass' in foo.py (line 1): A test class."}]
+        generator = question_generator.LLMQuestionGenerator(openai_api_key='test', base_url=self.base_url)
+        questions = generator.generate(summaries)
+        self.assertEqual(self.server.requests, 1)
+        self.assertEqual(questions[0]['question'], 'What does MyClass do?')
+
+    def test_streamed_questions_are_yielded_as_they_arrive(self):
+        summaries = [{'summary': f"Function 'func{i}(x)' in mod{i}.py (line 1): Does thing {i}."} for i in range(3)]
+        generator = question_generator.LLMQuestionGenerator(openai_api_key='test', base_url=self.base_url)
+        questions = generator.iter_generate(summaries)
+        first = next(questions)
+        self.assertEqual(first['question'], 'What does func0 do?')
+        self.assertFalse(self.server.finished)
+        rest = list(questions)
+        self.assertEqual(len(rest), 3)
+        # The complete response is cached, so a repeated request doesn't reach the API.
+        self.assertEqual(list(generator.iter_generate(summaries)), [first] + rest)
+        self.assertEqual(self.server.requests, 1)
+
+    def test_streamed_questions_are_capped_at_count(self):
+        summaries = [{'summary': f"Function 'func{i}(x)' in mod{i}.py (line 1): Does thing {i}."} for i in range(3)]
+        generator = question_generator.LLMQuestionGenerator(openai_api_key='test', base_url=self.base_url)
+        streamed = list(generator.iter_generate(summaries, count=2))
+        self.assertEqual([q['question'] for q in streamed], ['What does func0 do?', 'What does func1 do?'])
+        # Served from the cache the second time, and still capped.
+        self.assertEqual(list(generator.iter_generate(summaries, count=2)), streamed)
+        self.assertEqual(generator.generate(summaries, count=2), streamed)
+
+    def test_async_chunks_are_requested_concurrently(self):
+        summaries = [{'summary': f"Function 'func{i}(x)' in mod{i}.py (line 1): Does thing {i}."} for i in range(40)]
+        generator = question_generator.LLMQuestionGenerator(
+            openai_api_key='test', base_url=self.base_url, chunk_token_budget=60, max_concurrency=3)
+        questions = asyncio.run(generator.agenerate(summaries))
+        self.assertEqual(self.server.requests, 10)
+        self.assertLessEqual(self.server.max_in_flight, 3)
+        self.assertGreater(self.server.max_in_flight, 1)
+        self.assertEqual(questions, generator.generate(summaries))
+
+    def test_async_streamed_questions(self):
+        summaries = [{'summary': f"Function 'func{i}(x)' in mod{i}.py (line 1): Does thing {i}."} for i in range(3)]
+        generator = question_generator.LLMQuestionGenerator(openai_api_key='test', base_url=self.base_url)
+
+        async def collect():
+            return [question async for question in generator.aiter_generate(summaries)]
+
+        questions = asyncio.run(collect())
+        self.assertEqual(len(questions), 4)
+        self.assertEqual(questions[0]['question'], 'What does func0 do?')
+        self.assertEqual(list(generator.iter_generate(summaries)), questions)
+        self.assertEqual(self.server.requests, 1)
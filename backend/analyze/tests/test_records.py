@@ -0,0 +1,29 @@
+from django.test import TestCase
+import tracemalloc
+from ..analysis.records import ComponentRecord
+from ..models import Component
+
+FIELDS = dict(type='function', name='method', file='pkg/module.py', full_name='Klass.method',
+              lineno=10, docstring='Does something.', parameters=['self', 'x'])
+
+def _peak(factory, count):
+    tracemalloc.start()
+    items = [factory(**FIELDS) for _ in range(count)]
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+class TestComponentRecord(TestCase):
+    def test_to_model(self):
+        component = ComponentRecord(**FIELDS).to_model()
+        self.assertIsInstance(component, Component)
+        self.assertEqual(component.full_name, 'Klass.method')
+        self.assertEqual(component.parameters, ['self', 'x'])
+        self.assertIsNone(component.pk)
+
+    def test_memory_compared_to_model_instances(self):
+        record_peak = _peak(ComponentRecord, 20000)
+        model_peak = _peak(Component, 20000)
+        self.assertLess(record_peak * 2, model_peak)
+        # Records are slotted, with no instance dict.
+        self.assertFalse(hasattr(ComponentRecord(**FIELDS), '__dict__'))
@@ -0,0 +1,41 @@
+from django.test import SimpleTestCase
+import os
+import re
+import subprocess
+import sys
+from django.conf import settings
+
+# Modules that only some requests need, and that the app must not import at startup.
+HEAVY_MODULES = ('openai', 'javalang', 'kopyt', 'numpy')
+
+IMPORT_TIME_RE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def _import_times(module):
+    """Import ``module`` in a fresh interpreter set up for Django and return ``{name: cumulative µs}``."""
+    code = f'import django; django.setup(); import {module}'
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='backend.settings')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=settings.BASE_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for match in IMPORT_TIME_RE.finditer(result.stderr):
+        times[match.group(4)] = int(match.group(2))
+    return times
+
+
+class TestStartupImports(SimpleTestCase):
+    def test_views_do_not_import_parsers_or_llm_client(self):
+        times = _import_times('analyze.urls')
+        self.assertIn('analyze.views', times)
+        for module in HEAVY_MODULES:
+            self.assertNotIn(module, times)
+
+    def test_parsers_load_on_first_use(self):
+        code = ('import django; django.setup(); import sys; '
+                'from analyze.analysis.code_analyzer import CodeAnalyzer; '
+                "CodeAnalyzer().analyze_source('A.java', b'class A {}'); "
+                "print(sorted(m for m in ('javalang', 'kopyt') if m in sys.modules))")
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='backend.settings')
+        result = subprocess.run([sys.executable, '-c', code], cwd=settings.BASE_DIR, env=env,
+                                capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), "['javalang']")
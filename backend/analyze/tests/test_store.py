@@ -0,0 +1,116 @@
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
+from unittest.mock import patch
+import os
+import random
+import tempfile
+from ..analysis.code_analyzer import CodeAnalyzer
+from ..analysis.xref import RELATIONS, CrossReferenceBuilder
+from ..benchmarks.synthetic import SyntheticCodebase
+from ..persistence import RunWriter
+from ..pipeline import aiter_analyze_components, analyze_codebase
+from ..search.inverted_index import FocusRanker
+from ..store import ComponentStore
+from ..summarization.summarizer import ComponentSummarizer
+
+
+class TestComponentStore(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = SyntheticCodebase(files=60).write(tmpdir)
+            analyzer = CodeAnalyzer(tmpdir)
+            cls.groups = [analyzer.analyze(path) for path in paths]
+
+    def setUp(self):
+        self.store = ComponentStore(batch_size=50)
+        for components in self.groups:
+            self.store.add(components)
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_iteration_and_search_match_memory(self):
+        summaries = [s for components in self.groups for s in ComponentSummarizer.summarize(components)]
+        stored = list(self.store)
+        self.assertEqual([s.pop('symbol') for s in stored], list(range(len(summaries))))
+        self.assertEqual(stored, summaries)
+        for query in ('parse config', 'user request handler', 'cache', 'nothing matches this'):
+            ranker = FocusRanker(query)
+            for summary in summaries:
+                ranker.add(summary)
+            found = self.store.search(query, 10)
+            for summary in found:
+                del summary['symbol']
+            self.assertEqual(found, ranker.top(10), query)
+
+    def test_cross_references_match_memory(self):
+        builder = CrossReferenceBuilder()
+        for components in self.groups:
+            builder.add(components)
+        expected = builder.build()
+        index = CrossReferenceBuilder(self.store).build()
+        self.assertEqual(index.names, expected.names)
+        for relation in RELATIONS:
+            self.assertEqual(index.relations[relation], expected.relations[relation], relation)
+
+    def test_spilled_symbol_table_matches_memory(self):
+        builder = CrossReferenceBuilder()
+        writer = RunWriter('repo.zip', spill_size=100)
+        for components in self.groups:
+            builder.add(components)
+            writer.add(components)
+        self.assertIsNotNone(writer.spilled)
+        path = writer.spilled.path
+        expected = builder.build()
+        index = writer.build_index()
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(index.names, expected.names)
+        for relation in RELATIONS:
+            self.assertEqual(index.relations[relation], expected.relations[relation], relation)
+
+    def test_close_deletes_the_database(self):
+        path = self.store.path
+        self.assertTrue(os.path.exists(path))
+        self.store.close()
+        self.assertFalse(os.path.exists(path))
+
+
+class TestDiskStoreAnalysis(TestCase):
+    def test_questions_match_memory(self):
+        with tempfile.TemporaryDirectory() as tmpdir, tempfile.TemporaryDirectory() as store_dir:
+            paths = SyntheticCodebase(files=40).write(tmpdir)
+            for focus in (None, 'parse request'):
+                results = []
+                for mode in ('memory', 'disk'):
+                    with override_settings(ANALYSIS_COMPONENT_STORE=mode, ANALYSIS_COMPONENT_STORE_DIR=store_dir,
+                                           ANALYSIS_CACHE_PATH=None):
+                        random.seed(3)
+                        results.append(analyze_codebase(paths, tmpdir, focus=focus))
+                self.assertTrue(results[0])
+                self.assertEqual(results[1], results[0], focus)
+            self.assertEqual(os.listdir(store_dir), [])
+
+    def test_async_llm_questions_get_the_summaries_read_off_the_event_loop(self):
+        received = []
+
+        async def aiter_generate(self, components, **options):
+            received.append(components)
+            yield {'question': 'Why?', 'answer': 'Because.', 'difficulty': 'beginner'}
+
+        async def collect(groups):
+            return [event async for event in aiter_analyze_components(groups, len(groups), use_llm=True,
+                                                                       openai_api_key='test')]
+
+        with tempfile.TemporaryDirectory() as tmpdir, tempfile.TemporaryDirectory() as store_dir:
+            paths = SyntheticCodebase(files=5).write(tmpdir)
+            analyzer = CodeAnalyzer(tmpdir)
+            groups = [analyzer.analyze(path) for path in paths]
+            with override_settings(ANALYSIS_COMPONENT_STORE='disk', ANALYSIS_COMPONENT_STORE_DIR=store_dir), \
+                    patch('analyze.pipeline.LLMQuestionGenerator.aiter_generate', aiter_generate):
+                events = async_to_sync(collect)(groups)
+        self.assertIn({'event': 'question', 'question': {'question': 'Why?', 'answer': 'Because.',
+                                                         'difficulty': 'beginner'}}, events)
+        self.assertIsInstance(received[0], list)
+        self.assertEqual(len(received[0]), sum(len(components) for components in groups))
@@ -0,0 +1,137 @@
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+import io
+import json
+from unittest.mock import patch
+import zipfile
+from ..models import AnalysisRun
+from ..result_cache import ResultCache
+
+def _zip_upload(files, name='code.zip'):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zf:
+        for path, content in files.items():
+            # A fixed timestamp keeps archives of the same files identical, as the result cache keys them by content.
+            zf.writestr(zipfile.ZipInfo(path, date_time=(2024, 1, 1, 0, 0, 0)), content)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='application/zip')
+
+@override_settings(ANALYSIS_CACHE_PATH=None)
+class TestAnalyzeFileView(TestCase):
+    def setUp(self):
+        caches['results'].clear()
+
+    def test_file_upload_rule_based(self):
+        upload = _zip_upload({'pkg/foo.py': 'class Foo:\n    def bar(self):\n        pass\n'})
+        response = self.client.post('/analyze/file/', {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        questions = response.json()['questions']
+        self.assertEqual(len(questions), 10)
+        self.assertTrue(any('pkg/foo.py' in q['question'] for q in questions))
+        run = AnalysisRun.objects.get(repository__source='code.zip')
+        self.assertEqual(run.components.count(), 2)
+        self.assertEqual(run.questions.count(), 10)
+
+    def test_file_upload_reports_skipped_files(self):
+        upload = _zip_upload({
+            'pkg/foo.py': 'def foo():\n    pass\n',
+            'pkg/docs.py': 'def docs():\n    pass\n',
+            'venv/lib/six.py': 'def six():\n    pass\n',
+        })
+        response = self.client.post('/analyze/file/', {'file': upload, 'selection': '{"exclude": ["pkg/docs.py"]}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['skipped'], {'vendored': 1, 'excluded': 1})
+        run = AnalysisRun.objects.get(repository__source='code.zip')
+        self.assertEqual(list(run.components.values_list('name', flat=True)), ['foo'])
+
+    def test_file_upload_with_invalid_selection(self):
+        upload = _zip_upload({'pkg/foo.py': 'def foo():\n    pass\n'})
+        response = self.client.post('/analyze/file/', {'file': upload, 'selection': '{"skip": true}'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_async_file_upload(self):
+        upload = _zip_upload({
+            'pkg/foo.py': 'class Foo:\n    def bar(self):\n        pass\n',
+            'venv/lib/six.py': 'def six():\n    pass\n',
+        }, name='async.zip')
+        response = self.client.post('/analyze/async/file/', {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['questions']), 10)
+        self.assertEqual(response.json()['skipped'], {'vendored': 1})
+        self.assertIn('persist;dur=', response['Server-Timing'])
+        run = AnalysisRun.objects.get(repository__source='async.zip')
+        self.assertEqual(run.components.count(), 2)
+        self.assertEqual(run.questions.count(), 10)
+
+    def test_repeated_upload_is_served_from_the_result_cache(self):
+        files = {'pkg/foo.py': 'class Foo:\n    def bar(self):\n        pass\n'}
+        first = self.client.post('/analyze/file/', {'file': _zip_upload(files)})
+        second = self.client.post('/analyze/file/', {'file': _zip_upload(files, name='copy.zip')})
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(AnalysisRun.objects.count(), 1)
+        not_modified = self.client.post('/analyze/async/file/', {'file': _zip_upload(files)},
+                                        HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], first['ETag'])
+
+    def test_result_cache_is_keyed_by_options(self):
+        files = {'pkg/foo.py': 'class Foo:\n    def bar(self):\n        pass\n'}
+        first = self.client.post('/analyze/file/', {'file': _zip_upload(files)})
+        focused = self.client.post('/analyze/file/', {'file': _zip_upload(files), 'focus': 'bar'})
+        self.assertNotEqual(focused['ETag'], first['ETag'])
+        self.assertEqual(AnalysisRun.objects.count(), 2)
+
+    def test_etag_changes_with_a_recomputed_result(self):
+        files = {'pkg/foo.py': 'class Foo:\n    def bar(self):\n        pass\n'}
+        first = self.client.post('/analyze/file/', {'file': _zip_upload(files)})
+        self.assertEqual(first['ETag'], ResultCache.etag(first.json()))
+        changed = [{'question': 'What changed?', 'answer': 'The questions.', 'difficulty': 'beginner'}]
+        with patch('analyze.pipeline.RuleBasedQuestionGenerator.questions', return_value=changed):
+            uncached = self.client.post('/analyze/file/', {'file': _zip_upload(files), 'cache': 'false'})
+        self.assertEqual(uncached.json()['questions'], changed)
+        self.assertNotEqual(uncached['ETag'], first['ETag'])
+        # The client holding the first result gets the recomputed one, not a 304.
+        response = self.client.post('/analyze/file/', {'file': _zip_upload(files)}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), uncached.json())
+        self.assertEqual(response['ETag'], uncached['ETag'])
+
+    def test_file_upload_without_sources(self):
+        upload = _zip_upload({'README.md': '# Nothing to analyze'})
+        response = self.client.post('/analyze/file/', {'file': upload})
+        self.assertEqual(response.status_code, 400)
+
+@override_settings(ANALYSIS_CACHE_PATH=None)
+class TestStreamFileView(TestCase):
+    def test_events_are_streamed_as_ndjson(self):
+        upload = _zip_upload({'pkg/foo.py': 'class Foo:\n    def bar(self):\n        pass\n'})
+        response = self.client.post('/analyze/stream/file/', {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        events = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        stages = [(e['stage'], e['status']) for e in events if e['event'] == 'stage']
+        self.assertEqual(stages[:4], [('extract', 'running'), ('extract', 'done'),
+                                      ('analyze', 'running'), ('analyze', 'done')])
+        self.assertIn({'event': 'progress', 'stage': 'analyze', 'done': 1, 'total': 1}, events)
+        self.assertEqual(len([e for e in events if e['event'] == 'question']), 10)
+        self.assertEqual(events[-1], {'event': 'done', 'questions': 10})
+
+    def test_events_are_streamed_as_sse(self):
+        upload = _zip_upload({'pkg/foo.py': 'def foo():\n    pass\n'})
+        response = self.client.post('/analyze/stream/file/', {'file': upload}, HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(body.startswith('event: stage\ndata: {'))
+        self.assertTrue(body.endswith('event: done\ndata: {"event": "done", "questions": 10}\n\n'))
+
+class TestAnalysisParams(TestCase):
+    def test_non_object_json_body_is_rejected(self):
+        for path in ('/analyze/url/', '/analyze/async/url/', '/analyze/stream/url/', '/analyze/jobs/url/',
+                     '/analyze/batches/'):
+            for body in ('[]', '"x"', '1'):
+                response = self.client.post(path, body, content_type='application/json')
+                self.assertEqual(response.status_code, 400, (path, body))
+                self.assertEqual(response.json(), {'error': 'The request body must be a JSON object'})
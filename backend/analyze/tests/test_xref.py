@@ -0,0 +1,144 @@
+from django.test import TestCase, override_settings
+import tempfile
+import time
+from pathlib import Path
+from ..analysis.code_analyzer import CodeAnalyzer
+from ..analysis.records import ComponentRecord
+from ..analysis.xref import CrossReferenceBuilder, CrossReferenceIndex
+from ..benchmarks.synthetic import SyntheticCodebase
+from ..persistence import save_run
+from ..pipeline import analyze_sources
+
+PYTHON_SOURCES = {
+    'src/shop/base.py': '''
+class Model:
+    def save(self):
+        return validate(self)
+
+    def delete(self):
+        pass
+
+def validate(model):
+    pass
+''',
+    'src/shop/orders.py': '''
+from .base import Model
+from shop import base as b
+
+class Order(Model):
+    def save(self):
+        self.delete()
+        b.validate(self)
+        return super().save()
+
+    def total(self):
+        return self.lines.count()
+''',
+}
+
+JAVA_SOURCES = {
+    'com/shop/util/Money.java': '''
+package com.shop.util;
+public class Money { public static Money of(int cents) { return new Money(); } }
+''',
+    'com/shop/Order.java': '''
+package com.shop;
+import com.shop.util.Money;
+public class Order extends Entity {
+    public Money total() { persist(); return Money.of(0); }
+}
+''',
+    'com/shop/Entity.java': '''
+package com.shop;
+public class Entity { void persist() {} Money total() { return null; } }
+''',
+}
+
+
+def _index(sources):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        analyzer = CodeAnalyzer(tmpdir)
+        builder = CrossReferenceBuilder()
+        for path, source in sources.items():
+            file = Path(tmpdir, path)
+            file.parent.mkdir(parents=True, exist_ok=True)
+            file.write_text(source)
+            builder.add(analyzer.analyze(str(file)))
+    index = CrossReferenceIndex.from_bytes(builder.build().to_bytes())
+
+    def neighbors(full_name, relation):
+        return [index.names[s] for s in index.neighbors(index.names.index(full_name), relation)]
+    return neighbors
+
+
+@override_settings(ANALYSIS_CACHE_PATH=None)
+class TestCrossReferenceIndex(TestCase):
+    def test_python_references(self):
+        neighbors = _index(PYTHON_SOURCES)
+        self.assertEqual(neighbors('Order', 'bases'), ['Model'])
+        self.assertEqual(neighbors('Model', 'subclasses'), ['Order'])
+        # self.delete() is inherited, super().save() skips Order's own save.
+        self.assertEqual(neighbors('Order.save', 'calls'), ['Model.delete', 'validate', 'Model.save'])
+        self.assertEqual(neighbors('Order.save', 'overrides'), ['Model.save'])
+        self.assertEqual(neighbors('validate', 'called_by'), ['Model.save', 'Order.save'])
+        self.assertEqual(neighbors('Model', 'imported_by'), ['Order'])
+        # Calls on attributes of unknown type aren't guessed.
+        self.assertEqual(neighbors('Order.total', 'calls'), [])
+
+    def test_java_references(self):
+        neighbors = _index(JAVA_SOURCES)
+        self.assertEqual(neighbors('Order', 'bases'), ['Entity'])
+        self.assertEqual(neighbors('Order.total', 'calls'), ['Entity.persist', 'Money.of'])
+        self.assertEqual(neighbors('Order.total', 'overrides'), ['Entity.total'])
+        self.assertEqual(neighbors('Money', 'called_by'), ['Money.of'])
+        self.assertEqual(neighbors('Money', 'imported_by'), ['Order.total'])
+
+    def test_build_cost_is_small_next_to_parsing(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = SyntheticCodebase(files=90).write(tmpdir)
+            analyzer = CodeAnalyzer(tmpdir)
+            start = time.perf_counter()
+            groups = [analyzer.analyze(path) for path in paths]
+            parsed = time.perf_counter()
+            builder = CrossReferenceBuilder()
+            for components in groups:
+                builder.add(components)
+            index = builder.build()
+            built = time.perf_counter()
+        self.assertEqual(len(index), sum(len(components) for components in groups))
+        self.assertLess(built - parsed, (parsed - start) / 2)
+
+
+class TestNeighborsView(TestCase):
+    def setUp(self):
+        self.run = save_run('shop.zip', [
+            ComponentRecord(type='class', name='Model', file='base.py', full_name='Model', lineno=1),
+            ComponentRecord(type='function', name='save', file='base.py', full_name='Model.save', lineno=2),
+            ComponentRecord(type='class', name='Order', file='orders.py', full_name='Order', lineno=1,
+                            references={'bases': ['base.Model']}),
+            ComponentRecord(type='function', name='save', file='orders.py', full_name='Order.save', lineno=2,
+                            references={'calls': ['super.save']}),
+        ], [])
+        self.order_save = self.run.components.get(full_name='Order.save')
+
+    def test_neighbors_by_relation(self):
+        url = f'/analyze/runs/{self.run.pk}/components/{self.order_save.pk}/neighbors/'
+        data = self.client.get(url).json()
+        self.assertEqual(data['component']['full_name'], 'Order.save')
+        self.assertEqual([c['full_name'] for c in data['neighbors']['calls']], ['Model.save'])
+        self.assertEqual([c['full_name'] for c in data['neighbors']['overrides']], ['Model.save'])
+        self.assertEqual(data['neighbors']['called_by'], [])
+        data = self.client.get(url, {'relation': 'overrides'}).json()
+        self.assertEqual(list(data['neighbors']), ['overrides'])
+        self.assertEqual(self.client.get(url, {'relation': 'friends'}).status_code, 400)
+        other = save_run('other.zip', [], [])
+        url = f'/analyze/runs/{other.pk}/components/{self.order_save.pk}/neighbors/'
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_interaction_questions_are_answered_from_the_index(self):
+        sources = [('app.py', b'def helper():\n    pass\n\ndef main():\n    helper()\n')]
+        questions = analyze_sources('app.zip', sources)
+        answers = [q['answer'] for q in questions if q['difficulty'] == 'intermediate']
+        self.assertTrue(answers)
+        for answer in answers:
+            self.assertTrue('calls `helper`' in answer or 'is called by `main`' in answer, answer)
@@ -1,7 +1,39 @@
 from django.urls import path
-from .views import analyze_file_view, analyze_url_view
+from .views import (
+    analyze_file_async_view,
+    analyze_file_view,
+    analyze_url_async_view,
+    analyze_url_view,
+    batch_status_view,
+    component_neighbors_view,
+    job_status_view,
+    llm_cache_stats_view,
+    run_components_view,
+    run_questions_view,
+    runs_view,
+    stream_file_view,
+    stream_url_view,
+    submit_batch_view,
+    submit_file_job_view,
+    submit_url_job_view,
+)
 
 urlpatterns = [
     path('url/', analyze_url_view, name='analyze_url_view'),
     path('file/', analyze_file_view, name='analyze_file_view'),
+    path('async/url/', analyze_url_async_view, name='analyze_url_async_view'),
+    path('async/file/', analyze_file_async_view, name='analyze_file_async_view'),
+    path('stream/url/', stream_url_view, name='stream_url_view'),
+    path('stream/file/', stream_file_view, name='stream_file_view'),
+    path('jobs/url/', submit_url_job_view, name='submit_url_job_view'),
+    path('jobs/file/', submit_file_job_view, name='submit_file_job_view'),
+    path('jobs/<uuid:job_id>/', job_status_view, name='job_status_view'),
+    path('batches/', submit_batch_view, name='submit_batch_view'),
+    path('batches/<uuid:batch_id>/', batch_status_view, name='batch_status_view'),
+    path('llm/cache/', llm_cache_stats_view, name='llm_cache_stats_view'),
+    path('runs/', runs_view, name='runs_view'),
+    path('runs/<int:run_id>/components/', run_components_view, name='run_components_view'),
+    path('runs/<int:run_id>/components/<int:component_id>/neighbors/', component_neighbors_view,
+         name='component_neighbors_view'),
+    path('runs/<int:run_id>/questions/', run_questions_view, name='run_questions_view'),
 ]
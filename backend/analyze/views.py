@@ -1,49 +1,116 @@
-from django.http import JsonResponse
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils.http import parse_etags
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-import tempfile
-import os
-import zipfile
-import shutil
 import json
+from .analysis.xref import RELATIONS, CrossReferenceIndex
 from .core.codebase import CodebaseExtractor
-from .analysis.code_analyzer import CodeAnalyzer
-from .summarization.summarizer import ComponentSummarizer
-from .questions.question_generator import LLMQuestionGenerator
-from .questions.question_generator import RuleBasedQuestionGenerator
-
-def _analyze_codebase(files, temp_dir, use_llm=False, focus=None, openai_api_key=None):
-    analyzer = CodeAnalyzer(temp_dir=temp_dir)
-    components = []
-    for file in files:
-        analyzed = analyzer.analyze(file)
-        components += analyzed
-    summaries = ComponentSummarizer.summarize(components)
-    if use_llm:
-        llm_gen = LLMQuestionGenerator(openai_api_key=openai_api_key)
-        questions = llm_gen.generate(summaries, focus=focus)
+from .core.git import get_git_fetcher
+from .core.selection import FileSelection
+from .jobs import submit_batch, submit_sources_job, submit_url_job
+from .metrics import ServerTiming, registry
+from .models import AnalysisBatch, AnalysisJob, AnalysisRun, Component, Question
+from .questions.llm_cache import LLMResponseCache
+from .pipeline import NoSourceFilesError, aanalyze_sources, aanalyze_url, analyze_sources, analyze_url
+from .pipeline import iter_analyze_sources, iter_analyze_url
+from .result_cache import ResultCache, content_hash
+
+MAX_PAGE_SIZE = 500
+
+def _selection(options):
+    """Return the file selection of a request, given as an object or as JSON in a form field."""
+    if options is None:
+        return None
+    if isinstance(options, str):
+        options = json.loads(options)
+    return FileSelection.from_options(options)
+
+def _parse_analysis_params(request):
+    """Parse the analysis options of a request, sent as a JSON body or as a form.
+
+    Returns the request data, the options to pass on to the pipeline and the
+    file selection, None for the default one. Raises ValueError for a
+    malformed body or selection.
+    """
+    if request.content_type in ('multipart/form-data', 'application/x-www-form-urlencoded'):
+        data = request.POST
+        options = {
+            'use_llm': data.get('llm', 'false').lower() == 'true',
+            'focus': data.get('focus'),
+            'use_cache': data.get('cache', 'true').lower() == 'true',
+            'openai_api_key': data.get('openai_api_key'),
+        }
     else:
-        questions = RuleBasedQuestionGenerator.generate(summaries, focus=focus)
-    return questions
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            raise ValueError('The request body must be a JSON object')
+        options = {'use_llm': data.get('llm', False), 'focus': data.get('focus'), 'use_cache': data.get('cache', True)}
+    return data, options, _selection(data.get('selection'))
+
+def _uploaded_file(request):
+    if 'file' not in request.FILES:
+        raise ValueError('Missing file')
+    return request.FILES['file']
+
+class _StageReport(ServerTiming):
+    """Collects the Server-Timing of the stages and what the extract stage reported."""
+
+    def __init__(self):
+        super().__init__()
+        self.extracted = {}
+
+    def __call__(self, stage, status, info):
+        super().__call__(stage, status, info)
+        if stage == 'extract' and status == 'done':
+            self.extracted = info
+
+    def response(self, questions, key=None):
+        """Return the result of the analysis, storing it in the result cache under ``key``."""
+        result = {'questions': questions, 'skipped': self.extracted.get('skipped', {})}
+        response = JsonResponse(result)
+        response['Server-Timing'] = self.header()
+        if key is not None:
+            response['ETag'] = ResultCache().set(key, result)
+        return response
+
+def _result_key(source, version, use_llm, focus, selection):
+    return ResultCache.make_key(source, version, llm=bool(use_llm), focus=focus or None,
+                                selection=(selection or FileSelection()).options())
+
+def _cached_response(request, result, etag):
+    """Serve a cached result, or 304 Not Modified when the client already has it."""
+    etags = parse_etags(request.headers.get('If-None-Match', ''))
+    response = HttpResponseNotModified() if etag in etags or '*' in etags else JsonResponse(result)
+    response['ETag'] = etag
+    return response
 
 @csrf_exempt
 @require_http_methods(["POST"])
 def analyze_url_view(request):
     try:
-        data = json.loads(request.body)
+        data, options, selection = _parse_analysis_params(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    try:
         url = data.get('url')
-        use_llm = data.get('llm', False)
-        focus = data.get('focus')
         if not url:
             return JsonResponse({'error': 'Missing url'}, status=400)
-        extractor = CodebaseExtractor(url)
-        files, temp_dir = extractor.extract()
-        if not files:
-            shutil.rmtree(temp_dir)
-            return JsonResponse({'error': 'No files'}, status=400)
-        questions = _analyze_codebase(files, temp_dir, use_llm=use_llm, focus=focus)
-        shutil.rmtree(temp_dir)
-        return JsonResponse({'questions': questions})
+        # Repositories are cached by commit, so only their HEAD is resolved before serving a cached result.
+        sha = key = None
+        if CodebaseExtractor(url).is_repo_url():
+            sha = get_git_fetcher().resolve(url)
+            key = _result_key(url, sha, options['use_llm'], options['focus'], selection)
+            cached = ResultCache().get(key) if options['use_cache'] else None
+            if cached is not None:
+                return _cached_response(request, *cached)
+        report = _StageReport()
+        questions = analyze_url(url, selection=selection, sha=sha, on_stage=report, **options)
+        return report.response(questions, key)
+    except NoSourceFilesError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
@@ -51,25 +118,297 @@ def analyze_url_view(request):
 @require_http_methods(["POST"])
 def analyze_file_view(request):
     try:
-        use_llm = request.POST.get('llm', 'false').lower() == 'true'
-        focus = request.POST.get('focus')
-        openai_api_key = request.POST.get('openai_api_key')
-        if 'file' not in request.FILES:
-            return JsonResponse({'error': 'Missing file'}, status=400)
-        uploaded_file = request.FILES['file']
-        with tempfile.TemporaryDirectory() as temp_dir:
-            zip_path = os.path.join(temp_dir, uploaded_file.name)
-            with open(zip_path, 'wb+') as dest:
-                for chunk in uploaded_file.chunks():
-                    dest.write(chunk)
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(temp_dir)
-            extractor = CodebaseExtractor(zip_path)
-            files, temp_dir = extractor.extract()
-            if not files:
-                return JsonResponse({'error': 'No files'}, status=400)
-            questions = _analyze_codebase(files, temp_dir, use_llm=use_llm, focus=focus, openai_api_key=openai_api_key)
-        return JsonResponse({'questions': questions})
+        _, options, selection = _parse_analysis_params(request)
+        uploaded_file = _uploaded_file(request)
+        key = _result_key('upload', content_hash(uploaded_file), options['use_llm'], options['focus'], selection)
+        cached = ResultCache().get(key) if options['use_cache'] else None
+        if cached is not None:
+            return _cached_response(request, *cached)
+        extractor = CodebaseExtractor(uploaded_file, selection)
+        sources = extractor.extract_sources()
+        if not sources:
+            return JsonResponse({'error': 'No files'}, status=400)
+        report = _StageReport()
+        questions = analyze_sources(uploaded_file.name, sources, skipped=extractor.skipped_counts(),
+                                    on_stage=report, **options)
+        return report.response(questions, key)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
+# The async views do the same as the views above, but wait for git and the LLM
+# without holding a worker: under ASGI one process serves many of them at once.
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def analyze_url_async_view(request):
+    try:
+        data, options, selection = _parse_analysis_params(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    try:
+        url = data.get('url')
+        if not url:
+            return JsonResponse({'error': 'Missing url'}, status=400)
+        sha = key = None
+        if CodebaseExtractor(url).is_repo_url():
+            sha = await get_git_fetcher().aresolve(url)
+            key = _result_key(url, sha, options['use_llm'], options['focus'], selection)
+            cached = await sync_to_async(ResultCache().get)(key) if options['use_cache'] else None
+            if cached is not None:
+                return _cached_response(request, *cached)
+        report = _StageReport()
+        questions = await aanalyze_url(url, selection=selection, sha=sha, on_stage=report, **options)
+        return await sync_to_async(report.response)(questions, key)
+    except NoSourceFilesError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def analyze_file_async_view(request):
+    try:
+        _, options, selection = _parse_analysis_params(request)
+        uploaded_file = _uploaded_file(request)
+        key = _result_key('upload', await sync_to_async(content_hash)(uploaded_file), options['use_llm'],
+                          options['focus'], selection)
+        cached = await sync_to_async(ResultCache().get)(key) if options['use_cache'] else None
+        if cached is not None:
+            return _cached_response(request, *cached)
+        extractor = CodebaseExtractor(uploaded_file, selection)
+        sources = await sync_to_async(extractor.extract_sources)()
+        if not sources:
+            return JsonResponse({'error': 'No files'}, status=400)
+        report = _StageReport()
+        questions = await aanalyze_sources(uploaded_file.name, sources, skipped=extractor.skipped_counts(),
+                                           on_stage=report, **options)
+        return await sync_to_async(report.response)(questions, key)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+def _stream_events(request, events):
+    """Stream pipeline events as Server-Sent Events, or as NDJSON unless the client asks for SSE."""
+    sse = 'text/event-stream' in request.headers.get('Accept', '')
+
+    def encode(event):
+        data = json.dumps(event)
+        if sse:
+            return f"event: {event['event']}\ndata: {data}\n\n"
+        return data + '\n'
+
+    def stream():
+        try:
+            while True:
+                try:
+                    event = next(events)
+                except StopIteration as stop:
+                    questions = stop.value
+                    break
+                yield encode(event)
+            yield encode({'event': 'done', 'questions': len(questions)})
+        except Exception as e:
+            yield encode({'event': 'error', 'error': str(e)})
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream' if sse else 'application/x-ndjson')
+    response['Cache-Control'] = 'no-cache'
+    # Keep reverse proxies such as nginx from buffering the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def stream_url_view(request):
+    try:
+        data, options, selection = _parse_analysis_params(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    url = data.get('url')
+    if not url:
+        return JsonResponse({'error': 'Missing url'}, status=400)
+    return _stream_events(request, iter_analyze_url(url, selection=selection, **options))
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def stream_file_view(request):
+    try:
+        _, options, selection = _parse_analysis_params(request)
+        uploaded_file = _uploaded_file(request)
+        extractor = CodebaseExtractor(uploaded_file, selection)
+        sources = extractor.extract_sources()
+        if not sources:
+            return JsonResponse({'error': 'No files'}, status=400)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+    return _stream_events(request, iter_analyze_sources(uploaded_file.name, sources,
+                                                        skipped=extractor.skipped_counts(), **options))
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def submit_url_job_view(request):
+    try:
+        data, options, selection = _parse_analysis_params(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    try:
+        url = data.get('url')
+        if not url:
+            return JsonResponse({'error': 'Missing url'}, status=400)
+        job = submit_url_job(url, selection=selection, **options)
+        return JsonResponse({'job_id': str(job.id), 'status': job.status}, status=202)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def submit_file_job_view(request):
+    try:
+        _, options, selection = _parse_analysis_params(request)
+        uploaded_file = _uploaded_file(request)
+        extractor = CodebaseExtractor(uploaded_file, selection)
+        sources = extractor.extract_sources()
+        if not sources:
+            return JsonResponse({'error': 'No files'}, status=400)
+        job = submit_sources_job(uploaded_file.name, sources, skipped=extractor.skipped_counts(), **options)
+        return JsonResponse({'job_id': str(job.id), 'status': job.status}, status=202)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def submit_batch_view(request):
+    """Submit many repository URLs and zip archives at once, as a JSON body or a multipart form."""
+    try:
+        data, options, selection = _parse_analysis_params(request)
+        if data is request.POST:
+            urls, uploads = data.getlist('url'), request.FILES.getlist('file')
+        else:
+            urls, uploads = data.get('urls', []), []
+            if not isinstance(urls, list) or not all(isinstance(url, str) for url in urls):
+                return JsonResponse({'error': 'urls must be a list of strings'}, status=400)
+        # The jobs get the options, each codebase a selection of its own.
+        selection = selection.options() if selection is not None else None
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if not urls and not uploads:
+        return JsonResponse({'error': 'Missing urls or files'}, status=400)
+    max_items = getattr(settings, 'ANALYSIS_BATCH_MAX_ITEMS', 500)
+    if len(urls) + len(uploads) > max_items:
+        return JsonResponse({'error': f'A batch holds at most {max_items} items'}, status=400)
+    try:
+        archives = []
+        extracted = {}
+        for uploaded_file in uploads:
+            digest = content_hash(uploaded_file)
+            if digest not in extracted:
+                # Each codebase gets its own selection, which collects its .gitignore rules.
+                extractor = CodebaseExtractor(uploaded_file, _selection(selection))
+                extracted[digest] = extractor.extract_sources(), extractor.skipped_counts()
+            archives.append((uploaded_file.name, digest, *extracted[digest]))
+        batch, jobs = submit_batch(urls, archives, selection=selection, **options)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+    sources = urls + [uploaded_file.name for uploaded_file in uploads]
+    return JsonResponse({
+        'batch_id': str(batch.id),
+        'items': [{'source': source, 'job_id': str(job.id), 'status': job.status}
+                  for source, job in zip(sources, jobs)],
+    }, status=202)
+
+@require_http_methods(["GET"])
+def batch_status_view(request, batch_id):
+    try:
+        batch = AnalysisBatch.objects.get(pk=batch_id)
+    except AnalysisBatch.DoesNotExist:
+        return JsonResponse({'error': 'Batch not found'}, status=404)
+    return JsonResponse(batch.to_dict())
+
+@require_http_methods(["GET"])
+def job_status_view(request, job_id):
+    try:
+        job = AnalysisJob.objects.get(pk=job_id)
+    except AnalysisJob.DoesNotExist:
+        return JsonResponse({'error': 'Job not found'}, status=404)
+    return JsonResponse(job.to_dict())
+
+def _paginate(request, queryset):
+    page_size = min(int(request.GET.get('page_size', 50)), MAX_PAGE_SIZE)
+    paginator = Paginator(queryset, max(page_size, 1))
+    page = paginator.get_page(request.GET.get('page'))
+    return JsonResponse({
+        'count': paginator.count,
+        'page': page.number,
+        'num_pages': paginator.num_pages,
+        'results': [obj.to_dict() for obj in page],
+    })
+
+@require_http_methods(["GET"])
+def runs_view(request):
+    try:
+        runs = AnalysisRun.objects.select_related('repository').order_by('-created_at', '-id')
+        if request.GET.get('repository'):
+            runs = runs.filter(repository__source=request.GET['repository'])
+        return _paginate(request, runs)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+@require_http_methods(["GET"])
+def run_components_view(request, run_id):
+    try:
+        components = Component.objects.filter(run_id=run_id).order_by('id')
+        for field in ('file', 'full_name', 'type'):
+            if request.GET.get(field):
+                components = components.filter(**{field: request.GET[field]})
+        return _paginate(request, components)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+@require_http_methods(["GET"])
+def component_neighbors_view(request, run_id, component_id):
+    try:
+        component = Component.objects.select_related('run').get(pk=component_id, run_id=run_id)
+    except Component.DoesNotExist:
+        return JsonResponse({'error': 'Component not found'}, status=404)
+    if component.run.xref is None or component.symbol is None:
+        return JsonResponse({'error': 'The run has no cross-reference index'}, status=404)
+    relations = request.GET.getlist('relation') or RELATIONS
+    unknown = set(relations) - set(RELATIONS)
+    if unknown:
+        return JsonResponse({'error': f"Unknown relation: {', '.join(sorted(unknown))}"}, status=400)
+    index = CrossReferenceIndex.from_bytes(component.run.xref)
+    symbols = {relation: index.neighbors(component.symbol, relation) for relation in relations}
+    related = Component.objects.filter(run_id=run_id, symbol__in={s for found in symbols.values() for s in found})
+    by_symbol = {c.symbol: c.to_dict() for c in related}
+    return JsonResponse({
+        'component': component.to_dict(),
+        'neighbors': {relation: [by_symbol[s] for s in found if s in by_symbol] for relation, found in symbols.items()},
+    })
+
+@require_http_methods(["GET"])
+def run_questions_view(request, run_id):
+    try:
+        questions = Question.objects.filter(run_id=run_id).order_by('id')
+        if request.GET.get('difficulty'):
+            questions = questions.filter(difficulty=request.GET['difficulty'])
+        return _paginate(request, questions)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+@require_http_methods(["GET"])
+def llm_cache_stats_view(request):
+    return JsonResponse(LLMResponseCache().stats())
+
+@require_http_methods(["GET"])
+def metrics_view(request):
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
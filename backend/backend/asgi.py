@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_asgi_application()
+
+# Only serving processes import this module, so the warm pool starts here rather than in AppConfig.ready().
+from analyze.analysis.parallel import start_warm_pool
+
+start_warm_pool()
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -84,10 +85,56 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Analysis jobs write from several threads: taking the write lock up front lets SQLite wait for it
+        # with the timeout instead of failing a transaction that started reading.
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 20},
+        # The default in-memory test database reports its tables as locked to concurrent jobs without waiting.
+        # Named after the process, so that concurrent runs and the leftover of an interrupted one don't collide.
+        'TEST': {'NAME': os.path.join(tempfile.gettempdir(), f'beirman-test-{os.getpid()}.sqlite3')},
     }
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+LLM_CACHE_BACKEND = os.getenv('LLM_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+
+LLM_CACHE = {
+    'BACKEND': LLM_CACHE_BACKEND,
+    'LOCATION': os.getenv('LLM_CACHE_LOCATION', 'llm-responses'),
+    # Seconds a cached LLM response is served before the model is asked again.
+    'TIMEOUT': int(os.getenv('LLM_CACHE_TTL', 24 * 60 * 60)),
+}
+if 'redis' not in LLM_CACHE_BACKEND:
+    # Redis bounds its size through its own maxmemory policy instead.
+    LLM_CACHE['OPTIONS'] = {'MAX_ENTRIES': int(os.getenv('LLM_CACHE_MAX_ENTRIES', 1000))}
+
+ANALYSIS_RESULT_CACHE_BACKEND = os.getenv('ANALYSIS_RESULT_CACHE_BACKEND',
+                                          'django.core.cache.backends.locmem.LocMemCache')
+
+ANALYSIS_RESULT_CACHE = {
+    'BACKEND': ANALYSIS_RESULT_CACHE_BACKEND,
+    'LOCATION': os.getenv('ANALYSIS_RESULT_CACHE_LOCATION', 'analysis-results'),
+    # Results are keyed by commit or content hash and never go stale; the TTL only bounds storage.
+    'TIMEOUT': int(os.getenv('ANALYSIS_RESULT_CACHE_TTL', 24 * 60 * 60)),
+}
+if 'redis' not in ANALYSIS_RESULT_CACHE_BACKEND:
+    ANALYSIS_RESULT_CACHE['OPTIONS'] = {'MAX_ENTRIES': int(os.getenv('ANALYSIS_RESULT_CACHE_MAX_ENTRIES', 500))}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'llm': LLM_CACHE,
+    'results': ANALYSIS_RESULT_CACHE,
+}
+
+LLM_CACHE_ALIAS = 'llm'
+
+ANALYSIS_RESULT_CACHE_ALIAS = 'results'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -129,6 +176,90 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Code analysis
+
+# Worker processes used to analyze large codebases in parallel.
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', os.cpu_count() or 1))
+
+# Codebases with fewer files than this are analyzed serially in the request process.
+ANALYSIS_PARALLEL_THRESHOLD = int(os.getenv('ANALYSIS_PARALLEL_THRESHOLD', 200))
+
+# Keep one pool of analysis workers, started with the server and with every parser already imported,
+# instead of starting a pool for each large codebase.
+ANALYSIS_WARM_POOL = os.getenv('ANALYSIS_WARM_POOL', 'False').lower() == 'true'
+
+# SQLite file caching extracted components by file content, in the user's cache directory rather than the source
+# tree. Set to an empty value to disable.
+ANALYSIS_CACHE_PATH = os.getenv(
+    'ANALYSIS_CACHE_PATH',
+    str(Path(os.getenv('XDG_CACHE_HOME') or Path.home() / '.cache') / 'beirman' / 'analysis_cache.sqlite3'),
+)
+
+# Least recently used entries are evicted once the cache grows past this size.
+ANALYSIS_CACHE_MAX_BYTES = int(os.getenv('ANALYSIS_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+# Background worker threads running asynchronous analysis jobs.
+ANALYSIS_JOB_WORKERS = int(os.getenv('ANALYSIS_JOB_WORKERS', 2))
+
+# Components sampled as candidates for the rule-based questions, out of which the most diverse are picked.
+ANALYSIS_QUESTION_POOL = int(os.getenv('ANALYSIS_QUESTION_POOL', 1000))
+
+# Trade-off between relevance (0) and diversity (1) when picking the components to ask about.
+ANALYSIS_QUESTION_DIVERSITY = float(os.getenv('ANALYSIS_QUESTION_DIVERSITY', 0.5))
+
+# Most repository URLs and archives accepted by one batch request.
+ANALYSIS_BATCH_MAX_ITEMS = int(os.getenv('ANALYSIS_BATCH_MAX_ITEMS', 500))
+
+# Store the components and questions of every analysis so past results can be queried.
+ANALYSIS_PERSIST_RESULTS = os.getenv('ANALYSIS_PERSIST_RESULTS', 'True').lower() == 'true'
+
+# Rows inserted per bulk_create call when storing an analysis.
+ANALYSIS_PERSIST_BATCH_SIZE = int(os.getenv('ANALYSIS_PERSIST_BATCH_SIZE', 1000))
+
+# Where the components of an analysis are kept until its questions are generated: 'memory', or 'disk' for a
+# temporary SQLite database, for codebases whose components don't fit in memory.
+ANALYSIS_COMPONENT_STORE = os.getenv('ANALYSIS_COMPONENT_STORE', 'memory')
+
+# Directory of the temporary databases of ANALYSIS_COMPONENT_STORE='disk'; the system temporary directory by default.
+ANALYSIS_COMPONENT_STORE_DIR = os.getenv('ANALYSIS_COMPONENT_STORE_DIR') or None
+
+# Components whose cross-reference symbol table is kept in memory while an analysis is stored; beyond this many,
+# it is moved to a temporary SQLite database in ANALYSIS_COMPONENT_STORE_DIR.
+ANALYSIS_SYMBOL_TABLE_SPILL = int(os.getenv('ANALYSIS_SYMBOL_TABLE_SPILL', 20000))
+
+# Source files larger than this many bytes are left out of the analysis. Set to 0 to keep files of any size.
+ANALYSIS_MAX_FILE_BYTES = int(os.getenv('ANALYSIS_MAX_FILE_BYTES', 1024 * 1024))
+
+# Comma-separated globs of paths, relative to the codebase root, that are never analyzed.
+ANALYSIS_EXCLUDE = [pattern.strip() for pattern in os.getenv('ANALYSIS_EXCLUDE', '').split(',') if pattern.strip()]
+
+# Seconds the Java and Kotlin parsers may spend on one file before the fast fallback
+# extractor is used instead. Set to 0 to disable the time budget.
+ANALYSIS_PARSE_TIMEOUT = float(os.getenv('ANALYSIS_PARSE_TIMEOUT', 5))
+
+# Java and Kotlin files larger than this many bytes skip the full parsers and go straight
+# to the fallback extractor. Set to 0 to parse files of any size.
+ANALYSIS_PARSE_MAX_BYTES = int(os.getenv('ANALYSIS_PARSE_MAX_BYTES', 512 * 1024))
+
+# Re-analyze only the files changed since the last stored analysis of a repository.
+ANALYSIS_INCREMENTAL = os.getenv('ANALYSIS_INCREMENTAL', 'True').lower() == 'true'
+
+# Codebase summaries larger than this many (estimated) tokens are split into chunks that are
+# sent to the LLM separately, and the questions generated for each chunk are merged.
+LLM_CHUNK_TOKEN_BUDGET = int(os.getenv('LLM_CHUNK_TOKEN_BUDGET', 8000))
+
+# Chunk requests sent to the LLM at the same time.
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 4))
+
+# LLM questions whose TF-IDF cosine similarity to an earlier one reaches this are dropped as duplicates.
+LLM_DUPLICATE_SIMILARITY = float(os.getenv('LLM_DUPLICATE_SIMILARITY', 0.85))
+
+# Checkouts of analyzed git repositories, keyed by URL and commit. Set to an empty value to disable.
+GIT_CACHE_DIR = os.getenv('GIT_CACHE_DIR', str(BASE_DIR / 'git_cache'))
+
+# Least recently used checkouts are evicted once the cache grows past this size.
+GIT_CACHE_MAX_BYTES = int(os.getenv('GIT_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+
 # Ignore migrations for now since they are irrelevant for this project
 class DisableMigrations:
     def __contains__(self, item):
@@ -16,8 +16,10 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path,include
+from analyze.views import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('analyze/', include('analyze.urls'))
+    path('analyze/', include('analyze.urls')),
+    path('metrics', metrics_view, name='metrics_view'),
 ]
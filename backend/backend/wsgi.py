@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# Only serving processes import this module, so the warm pool starts here rather than in AppConfig.ready().
+from analyze.analysis.parallel import start_warm_pool
+
+start_warm_pool()